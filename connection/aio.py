@@ -0,0 +1,97 @@
+# aio.py
+# Author: Ian Effendi
+#
+# asyncio counterpart of connection.client.Client, with the same method surface.
+#
+# Uses the PyMongo async API (pymongo >= 4.9) when available, or Motor otherwise.
+# find() returns an async cursor (iterate with `async for`), or with cached=True a coroutine resolving to a
+# list; the other methods are coroutines. Cached reads share the query cache (connection.cache) with Client.
+import inspect
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:
+    from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+
+from connection.cache import cached_find_async, cached_find_one_async, invalidate
+from connection.database import Database
+from connection.client import get_auth_options, get_client_options
+
+logger = logging.getLogger(__name__)
+
+class AsyncClient:
+    """asyncio MongoDB client bound to a default database."""
+
+    def __init__(self, options: Dict[str, Any] = None, database: str = None, client: Any = None, **overrides: Any):
+        if client is None:
+            uri = Database.get_connection_string(get_auth_options(options))
+            client = AsyncMongoClient(uri, **get_client_options(**overrides))
+        self.client = client
+        self.database = database
+
+    async def __aenter__(self) -> 'AsyncClient':
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    def use(self, database: str) -> 'AsyncClient':
+        """
+        Get a view of this client bound to another database. The view shares this client's connection pool.
+        :returns: AsyncClient.
+        """
+        return AsyncClient(client=self.client, database=database)
+
+    def db(self, database: str = None) -> Any:
+        name = database if database else self.database
+        if not name:
+            raise ValueError("No database selected. Call use() or pass database=.")
+        return self.client[name]
+
+    def collection(self, collection: str, database: str = None) -> Any:
+        return self.db(database)[collection]
+
+    def find(self, collection: str, query: Dict[str, Any], projection: Dict[str, Any] = None, database: str = None, cached: bool = False, **kwargs: Any) -> Any:
+        """
+        Query a collection.
+        :param cached: Serve the query from the query cache (connection.cache); the result is then a coroutine resolving to a list.
+        :returns: Async cursor, or awaitable list of documents if cached.
+        """
+        logger.debug("find %s: %s", collection, query)
+        if cached:
+            return cached_find_async(self.collection(collection, database), query, projection, **kwargs)
+        return self.collection(collection, database).find(query, projection, **kwargs)
+
+    async def find_one(self, collection: str, query: Dict[str, Any], projection: Dict[str, Any] = None, database: str = None, cached: bool = False, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        logger.debug("find_one %s: %s", collection, query)
+        if cached:
+            return await cached_find_one_async(self.collection(collection, database), query, projection, **kwargs)
+        return await self.collection(collection, database).find_one(query, projection, **kwargs)
+
+    async def insert_many(self, collection: str, data: Iterable[Dict[str, Any]], database: str = None, ordered: bool = False, **kwargs: Any) -> Any:
+        logger.debug("insert_many %s", collection)
+        target = self.collection(collection, database)
+        result = await target.insert_many(data, ordered=ordered, **kwargs)
+        invalidate(target.database.name, collection)
+        return result
+
+    async def insert_one(self, collection: str, record: Dict[str, Any], database: str = None, **kwargs: Any) -> Any:
+        logger.debug("insert_one %s", collection)
+        target = self.collection(collection, database)
+        result = await target.insert_one(record, **kwargs)
+        invalidate(target.database.name, collection)
+        return result
+
+    async def bulk_write(self, collection: str, requests: List[Any], database: str = None, ordered: bool = False, **kwargs: Any) -> Any:
+        logger.debug("bulk_write %s: %d request(s)", collection, len(requests))
+        target = self.collection(collection, database)
+        result = await target.bulk_write(requests, ordered=ordered, **kwargs)
+        invalidate(target.database.name, collection)
+        return result
+
+    async def close(self) -> None:
+        result = self.client.close()
+        if inspect.isawaitable(result):
+            await result
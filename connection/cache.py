@@ -0,0 +1,207 @@
+# cache.py
+# Author: Ian Effendi
+#
+# LRU query result cache keyed on the normalized query and the generation of the queried collection.
+#
+# Every write through Client, AsyncClient, Database and the ingestion pipeline bumps the collection's
+# generation. Generations are also kept in a small JSON stamp file (connection.generations), so a write
+# from another process (eg. a `python -m ingestion` run or a drse crawl) is seen on the next lookup:
+# entries cached under an older generation are never served again, and are dropped as soon as the
+# change is noticed.
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from bson import json_util
+
+from config import settings
+from connection.generations import Generations
+
+# lookup() result of a query that is not cached.
+MISS = object()
+
+def normalize(value: Any) -> str:
+    """
+    Normalize a query, projection or options value into a stable key.
+    Values are written as canonical extended JSON, so an ObjectId or a datetime never matches its string form.
+    Top-level key order of documents is ignored; embedded documents keep theirs, as MongoDB matches them in order.
+    :raises TypeError: If a value cannot be encoded as BSON.
+    :returns: Canonical JSON string.
+    """
+    if isinstance(value, dict):
+        value = sorted(value.items())
+    elif isinstance(value, (list, tuple)):
+        value = [ sorted(part.items()) if isinstance(part, dict) else part for part in value ]
+    return json_util.dumps(value, json_options=json_util.CANONICAL_JSON_OPTIONS)
+
+class QueryCache:
+    """Thread-safe LRU cache of query results with hit/miss/eviction/invalidation counters."""
+
+    def __init__(self, size: int = 1024, max_results: int = 1000, generations: Generations = None):
+        self.size = size
+        self.max_results = max_results
+        self.generations = generations if generations is not None else Generations()
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = { 'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'uncacheable': 0 }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the counters, the number of entries and the hit rate.
+        :returns: Dict of counters.
+        """
+        lookups = self.counters['hits'] + self.counters['misses']
+        return { **self.counters, 'entries': len(self.entries), 'size': self.size, 'hit_rate': self.counters['hits'] / lookups if lookups else 0.0 }
+
+    def key(self, database: str, collection: str, operation: str, *parts: Any) -> Tuple[Hashable, ...]:
+        return (database, collection, operation, normalize(parts), self.generations.get(database, collection))
+
+    def lookup(self, database: str, collection: str, operation: str, *parts: Any, copy: bool = True) -> Tuple[Optional[Tuple[Hashable, ...]], Any]:
+        """
+        Look up a cached result, counting the hit or miss.
+        :returns: (key, result). The result is MISS on a miss; the key is None if the parts cannot be encoded as a key.
+        """
+        if self.generations.refresh():
+            self.purge()
+        try:
+            key = self.key(database, collection, operation, *parts)
+        except TypeError:
+            with self.lock:
+                self.counters['uncacheable'] += 1
+            return None, MISS
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return key, deepcopy(self.entries[key]) if copy else self.entries[key]
+            self.counters['misses'] += 1
+        return key, MISS
+
+    def store(self, key: Optional[Tuple[Hashable, ...]], result: Any, copy: bool = True) -> Any:
+        """
+        Cache a result loaded after a missed lookup(). Lists longer than max_results are not cached, nor are results
+        of a collection written to while they were loading.
+        :returns: Result.
+        """
+        if key is None:
+            return result
+        if isinstance(result, list) and len(result) > self.max_results:
+            with self.lock:
+                self.counters['uncacheable'] += 1
+            return result
+        if key[-1] == self.generations.get(key[0], key[1]):
+            with self.lock:
+                self.entries[key] = deepcopy(result) if copy else result
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+                    self.counters['evictions'] += 1
+        return result
+
+    def get(self, database: str, collection: str, operation: str, *parts: Any, load: Callable[[], Any] = None, copy: bool = True) -> Any:
+        """
+        Get a cached result, or load, cache and return it on a miss.
+        :param load: Callable returning the result; lists longer than max_results are returned but not cached.
+        :param copy: Copy results in and out of the cache, so callers cannot modify cached documents.
+        :returns: Result.
+        """
+        key, result = self.lookup(database, collection, operation, *parts, copy=copy)
+        return result if result is not MISS else self.store(key, load(), copy)
+
+    async def get_async(self, database: str, collection: str, operation: str, *parts: Any, load: Callable[[], Awaitable[Any]] = None, copy: bool = True) -> Any:
+        """
+        Coroutine version of get(), for an asynchronous load (eg. a Motor or PyMongo async query).
+        :returns: Result.
+        """
+        key, result = self.lookup(database, collection, operation, *parts, copy=copy)
+        return result if result is not MISS else self.store(key, await load(), copy)
+
+    def invalidate(self, database: str, collection: str) -> int:
+        """
+        Advance a collection's generation and drop its cached results.
+        :returns: Number of entries dropped.
+        """
+        self.generations.bump(database, collection)
+        with self.lock:
+            stale = [ key for key in self.entries if key[0] == database and key[1] == collection ]
+            for key in stale:
+                del self.entries[key]
+            self.counters['invalidations'] += 1
+        return len(stale)
+
+    def purge(self) -> int:
+        """
+        Drop entries cached under an older generation (eg. after another process wrote to a collection).
+        :returns: Number of entries dropped.
+        """
+        with self.lock:
+            stale = [ key for key in self.entries if key[-1] != self.generations.counters.get(Generations.name(key[0], key[1]), 0) ]
+            for key in stale:
+                del self.entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+###########################
+# SHARED CACHE
+###########################
+
+_cache: Optional[QueryCache] = None
+_lock = threading.Lock()
+
+def get_query_cache() -> QueryCache:
+    """
+    Get the process-wide query cache configured by the [cache] settings (query_size, query_max_results, generations).
+    :returns: QueryCache.
+    """
+    global _cache
+    with _lock:
+        if _cache is None:
+            config = settings.get('cache', {})
+            _cache = QueryCache(
+                size=config.get('query_size', 1024),
+                max_results=config.get('query_max_results', 1000),
+                generations=Generations(config.get('generations', '.cache/generations.json')),
+            )
+        return _cache
+
+def invalidate(database: str, collection: str) -> int:
+    """
+    Invalidate the cached results of a collection after a write.
+    :returns: Number of entries dropped.
+    """
+    return get_query_cache().invalidate(database, collection)
+
+def cached_find(target: Any, query: Dict[str, Any], projection: Dict[str, Any] = None, **kwargs: Any) -> list:
+    """
+    Run find() on a pymongo collection through the query cache.
+    :returns: List of documents.
+    """
+    return get_query_cache().get(target.database.name, target.name, 'find', query, projection, kwargs, load=lambda: list(target.find(query, projection, **kwargs)))
+
+def cached_find_one(target: Any, query: Dict[str, Any], projection: Dict[str, Any] = None, **kwargs: Any) -> Optional[Dict[str, Any]]:
+    """
+    Run find_one() on a pymongo collection through the query cache.
+    :returns: Document, or None.
+    """
+    return get_query_cache().get(target.database.name, target.name, 'find_one', query, projection, kwargs, load=lambda: target.find_one(query, projection, **kwargs))
+
+async def cached_find_async(target: Any, query: Dict[str, Any], projection: Dict[str, Any] = None, **kwargs: Any) -> list:
+    """
+    Run find() on an asyncio (PyMongo async or Motor) collection through the query cache.
+    :returns: List of documents.
+    """
+    return await get_query_cache().get_async(target.database.name, target.name, 'find', query, projection, kwargs, load=lambda: target.find(query, projection, **kwargs).to_list(None))
+
+async def cached_find_one_async(target: Any, query: Dict[str, Any], projection: Dict[str, Any] = None, **kwargs: Any) -> Optional[Dict[str, Any]]:
+    """
+    Run find_one() on an asyncio (PyMongo async or Motor) collection through the query cache.
+    :returns: Document, or None.
+    """
+    return await get_query_cache().get_async(target.database.name, target.name, 'find_one', query, projection, kwargs, load=lambda: target.find_one(query, projection, **kwargs))
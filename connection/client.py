@@ -0,0 +1,133 @@
+# client.py
+# Author: Ian Effendi
+#
+# Instance-based, pooled MongoDB client configured from the [db.client] settings.
+#
+# Unlike the class-level Database helper, each Client owns (or shares) a MongoClient connection
+# pool and is safe to use from many threads at once. use() returns a view bound to another
+# database over the same pool, so one process can work with several databases concurrently.
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import MongoClient
+
+from config import settings
+from connection.cache import cached_find, cached_find_one, invalidate
+from connection.database import Database
+
+logger = logging.getLogger(__name__)
+
+# [db.client] setting names to MongoClient keyword arguments.
+CLIENT_OPTIONS = {
+    'max_pool_size': 'maxPoolSize',
+    'min_pool_size': 'minPoolSize',
+    'max_idle_time_ms': 'maxIdleTimeMS',
+    'wait_queue_timeout_ms': 'waitQueueTimeoutMS',
+    'connect_timeout_ms': 'connectTimeoutMS',
+    'socket_timeout_ms': 'socketTimeoutMS',
+    'server_selection_timeout_ms': 'serverSelectionTimeoutMS',
+    'read_preference': 'readPreference',
+    'write_concern': 'w',
+    'journal': 'journal',
+    'wtimeout_ms': 'wTimeoutMS',
+    'retry_writes': 'retryWrites',
+    'retry_reads': 'retryReads',
+    'appname': 'appname',
+}
+
+def get_auth_options(options: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Get the connection options ({ DB_HOST, DB_USER, DB_PASS, DB_PORT }) from settings.db.auth, unless provided.
+    :returns: Dict of options accepted by Database.get_connection_string().
+    """
+    if options:
+        return options
+    auth = settings.db.auth
+    return Database.make_options(hostname=auth.hostname, username=auth.username, password=auth.password, port=auth.port)
+
+def get_client_options(**overrides: Any) -> Dict[str, Any]:
+    """
+    Translate [db.client] settings (and keyword overrides using the same names) into MongoClient keyword arguments.
+    :returns: Dict of MongoClient options. Unset options keep the driver defaults.
+    """
+    config = { **settings.get('db', {}).get('client', {}), **overrides }
+    options = { CLIENT_OPTIONS[name]: value for name, value in config.items() if name in CLIENT_OPTIONS and value is not None }
+    options.setdefault('appname', f"{settings.app.name}@{settings.app.version}")
+    return options
+
+class Client:
+    """Thread-safe MongoDB client bound to a default database."""
+
+    def __init__(self, options: Dict[str, Any] = None, database: str = None, client: MongoClient = None, **overrides: Any):
+        if client is None:
+            uri = Database.get_connection_string(get_auth_options(options))
+            client = MongoClient(uri, **get_client_options(**overrides))
+        self.client = client
+        self.database = database
+
+    def __enter__(self) -> 'Client':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def use(self, database: str) -> 'Client':
+        """
+        Get a view of this client bound to another database. The view shares this client's connection pool.
+        :returns: Client.
+        """
+        return Client(client=self.client, database=database)
+
+    def db(self, database: str = None) -> Any:
+        """
+        Get a pymongo Database, defaulting to the bound database.
+        :raises ValueError: Raised if no database is bound or provided.
+        """
+        name = database if database else self.database
+        if not name:
+            raise ValueError("No database selected. Call use() or pass database=.")
+        return self.client[name]
+
+    def collection(self, collection: str, database: str = None) -> Any:
+        return self.db(database)[collection]
+
+    def find(self, collection: str, query: Dict[str, Any], projection: Dict[str, Any] = None, database: str = None, cached: bool = False, **kwargs: Any) -> Any:
+        """
+        Query a collection.
+        :param cached: Serve the query from the query cache (connection.cache); the result is then a list instead of a cursor.
+        :returns: Cursor, or list of documents if cached.
+        """
+        logger.debug("find %s: %s", collection, query)
+        if cached:
+            return cached_find(self.collection(collection, database), query, projection, **kwargs)
+        return self.collection(collection, database).find(query, projection, **kwargs)
+
+    def find_one(self, collection: str, query: Dict[str, Any], projection: Dict[str, Any] = None, database: str = None, cached: bool = False, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        logger.debug("find_one %s: %s", collection, query)
+        if cached:
+            return cached_find_one(self.collection(collection, database), query, projection, **kwargs)
+        return self.collection(collection, database).find_one(query, projection, **kwargs)
+
+    def insert_many(self, collection: str, data: Iterable[Dict[str, Any]], database: str = None, ordered: bool = False, **kwargs: Any) -> Any:
+        logger.debug("insert_many %s", collection)
+        target = self.collection(collection, database)
+        result = target.insert_many(data, ordered=ordered, **kwargs)
+        invalidate(target.database.name, collection)
+        return result
+
+    def insert_one(self, collection: str, record: Dict[str, Any], database: str = None, **kwargs: Any) -> Any:
+        logger.debug("insert_one %s", collection)
+        target = self.collection(collection, database)
+        result = target.insert_one(record, **kwargs)
+        invalidate(target.database.name, collection)
+        return result
+
+    def bulk_write(self, collection: str, requests: List[Any], database: str = None, ordered: bool = False, **kwargs: Any) -> Any:
+        logger.debug("bulk_write %s: %d request(s)", collection, len(requests))
+        target = self.collection(collection, database)
+        result = target.bulk_write(requests, ordered=ordered, **kwargs)
+        invalidate(target.database.name, collection)
+        return result
+
+    def close(self) -> None:
+        self.client.close()
@@ -5,26 +5,157 @@ import datetime
 import json
 
 # Import data processing tools.
+import numpy as np
 import pandas as pd
 
-# Import MongoDB related packages.
-from pymongo import MongoClient
-from dotenv import dotenv_values
+from typing import Any, Dict, Iterator, List
 
-# Application related libraries.
-from config import Configuration
-from database import Database
+from connection.schema import resolve
 
-# Load the environment variables.
-env = Configuration('./../')
+###########################
+# CURSOR LOADERS
+###########################
 
-# Initialize the database and make connection.
-Database.initialize(env)
-Database.use('region')
-results = Database.find('zipcodes', {})
+def get_columns(projection: Dict[str, Any] = None) -> List[str]:
+    """
+    Get the DataFrame columns selected by an inclusion projection (eg. { 'zip': 1, 'address.city': 1 }).
+    :returns: List of (dotted) field names. Empty if no fields are explicitly included.
+    """
+    if not projection:
+        return []
+    return [ field for field, include in projection.items() if include and not isinstance(include, dict) ]
 
-# Load the DataFrame results.
-df = pd.DataFrame(list(results))
+def nullable_dtype(dtype: Any) -> Any:
+    """
+    Get the pandas nullable dtype of a numpy integer or bool dtype (eg. 'int32' -> 'Int32', bool -> 'boolean').
+    :returns: The dtype unchanged if it has no nullable counterpart.
+    """
+    try:
+        name = np.dtype(dtype).name
+    except TypeError:
+        return dtype
+    if name.startswith('uint'):
+        return 'UInt' + name[4:]
+    if name.startswith('int'):
+        return 'Int' + name[3:]
+    return 'boolean' if name == 'bool' else dtype
 
-# Display the DataFrame.
-print(df)
\ No newline at end of file
+def to_frame(documents: List[Dict[str, Any]], columns: List[str] = None, dtypes: Dict[str, Any] = None) -> pd.DataFrame:
+    """
+    Convert a batch of documents into a DataFrame, one column at a time, with the dtype map applied.
+    Integer and bool columns with missing values (eg. a field some documents lack) get the pandas nullable dtype.
+    :raises ValueError: Raised if a column cannot be converted to its dtype.
+    :returns: pd.DataFrame. Without columns, the fields of the documents are used.
+    """
+    if columns:
+        frame = pd.DataFrame({ column: [ resolve(document, column) for document in documents ] for column in columns }, columns=columns)
+    else:
+        frame = pd.DataFrame.from_records(documents)
+    for column, dtype in (dtypes if dtypes else {}).items():
+        if column in frame.columns:
+            try:
+                frame[column] = frame[column].astype(nullable_dtype(dtype) if frame[column].isna().any() else dtype)
+            except (TypeError, ValueError) as error:
+                raise ValueError(f"Column '{column}' cannot be converted to {dtype}: {error}") from error
+    return frame
+
+def get_cursor(source: Any, query: Dict[str, Any] = None, projection: Dict[str, Any] = None, batch_size: int = 1000) -> Any:
+    """Get a cursor from a pymongo collection, or pass an existing cursor through."""
+    if hasattr(source, 'find'):
+        return source.find(query if query else {}, projection).batch_size(batch_size)
+    return source
+
+def iter_frames(source: Any, query: Dict[str, Any] = None, projection: Dict[str, Any] = None,
+                batch_size: int = 1000, dtypes: Dict[str, Any] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a collection (or cursor) as DataFrame chunks of at most batch_size rows, for out-of-core processing.
+    :returns: Generator of pd.DataFrame.
+    """
+    columns = get_columns(projection)
+    batch = []
+    for document in get_cursor(source, query, projection, batch_size):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield to_frame(batch, columns, dtypes)
+            batch = []
+    if batch:
+        yield to_frame(batch, columns, dtypes)
+
+def load_frame(source: Any, query: Dict[str, Any] = None, projection: Dict[str, Any] = None,
+               batch_size: int = 1000, dtypes: Dict[str, Any] = None) -> pd.DataFrame:
+    """
+    Load a collection (or cursor) into one DataFrame, chunk by chunk. Integer and bool columns with
+    missing values get the pandas nullable dtype (see to_frame).
+
+    With a projection and a collection, every column is preallocated at the matched document
+    count and filled in place, so peak memory stays close to the final frame size. Otherwise
+    the chunks are concatenated.
+    :returns: pd.DataFrame.
+    """
+    columns = get_columns(projection)
+    dtypes = dtypes if dtypes else {}
+    if not columns or not hasattr(source, 'count_documents'):
+        chunks = list(iter_frames(source, query, projection, batch_size, dtypes))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+    # Columns with a numpy dtype are filled in place; the rest (eg. 'category', 'string') are converted at the end.
+    # Integer and bool columns also fill a mask of missing values, and become nullable if any are missing.
+    def numpy_dtype(column):
+        try:
+            return np.dtype(dtypes.get(column, object))
+        except TypeError:
+            return None
+
+    count = source.count_documents(query if query else {})
+    arrays = { column: np.empty(count, dtype=numpy_dtype(column) or np.dtype(object)) for column in columns }
+    masks = { column: np.zeros(count, dtype=bool) for column in columns if arrays[column].dtype.kind in 'iub' }
+    overflow = []
+    rows = 0
+    for chunk in iter_frames(source, query, projection, batch_size, dtypes):
+        size = min(len(chunk), count - rows)
+        for column in columns:
+            if column in masks:
+                masks[column][rows:rows + size] = chunk[column].isna().to_numpy()[:size]
+                arrays[column][rows:rows + size] = chunk[column].to_numpy(dtype=arrays[column].dtype, na_value=0)[:size]
+            else:
+                arrays[column][rows:rows + size] = chunk[column].to_numpy()[:size]
+        if size < len(chunk):
+            overflow.append(chunk.iloc[size:])
+        rows += size
+    for column, mask in masks.items():
+        if mask[:rows].any():
+            array_type = pd.arrays.BooleanArray if arrays[column].dtype == bool else pd.arrays.IntegerArray
+            arrays[column] = array_type(arrays[column][:rows], mask[:rows])
+    frame = pd.DataFrame({ column: array[:rows] for column, array in arrays.items() }, copy=False)
+    for column, dtype in dtypes.items():
+        if column in frame.columns and numpy_dtype(column) is None:
+            frame[column] = frame[column].astype(dtype)
+    return pd.concat([ frame, *overflow ], ignore_index=True) if overflow else frame
+
+###########################
+# SCRIPT
+###########################
+
+# Run from the repository root: python -m connection.connect
+if __name__ == '__main__':
+
+    # Application related libraries.
+    from config import settings
+    from connection.database import Database
+
+    # Initialize the database (settings.toml is resolved from the working directory) and make connection.
+    Database.initialize(Database.make_options(
+        hostname=settings.db.auth.hostname,
+        username=settings.db.auth.username,
+        password=settings.db.auth.password,
+        port=settings.db.auth.port,
+    ))
+    Database.use('region')
+
+    # Load the DataFrame results.
+    df = load_frame(Database.DATABASE['zipcodes'],
+                    projection={ '_id': 0, 'zip': 1, 'city': 1, 'county': 1, 'pop': 1 },
+                    dtypes={ 'zip': 'int32', 'city': 'category', 'county': 'category', 'pop': 'int64' })
+
+    # Display the DataFrame.
+    print(df)
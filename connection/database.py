@@ -1,5 +1,9 @@
+import logging
 import urllib.parse
 from pymongo import MongoClient
+from connection.cache import cached_find, cached_find_one, invalidate
+
+logger = logging.getLogger(__name__)
 
 class Database:
     
@@ -32,40 +36,57 @@ class Database:
         return cls.CLIENT
         
     @classmethod
-    def use(cls, database):
+    def use(cls, database, indexes=False):
         cls.DATABASE = cls.CLIENT[database]
-        if cls.DATABASE:
+        if cls.DATABASE is not None:
             print("OK")
+            if indexes:
+                cls.sync_indexes()
         return cls.DATABASE
+    
+    @classmethod
+    def sync_indexes(cls, create=True, drop=False):
+        from connection.indexes import sync_indexes
+        if cls.DATABASE is not None:
+            reports = sync_indexes(cls.DATABASE, create=create, drop=drop)
+            for report in reports:
+                print(report)
+            return reports
+        else:
+            print("No database currently loaded.")
         
     @classmethod
     def insert_many(cls, collection, data):
-        if cls.DATABASE:
-            print("Inserting data into %s collection." % (collection,))
-            return cls.DATABASE[collection].insert_many(data)
+        if cls.DATABASE is not None:
+            result = cls.DATABASE[collection].insert_many(data)
+            invalidate(cls.DATABASE.name, collection)
+            return result
         else:
-            print("No database currently loaded.")
+            logger.warning("No database currently loaded.")
             
     @classmethod
     def insert_one(cls, collection, record):
-        if cls.DATABASE:
-            print("Inserting record into %s collection." % (collection,))
-            return cls.DATABASE[collection].insert_one(record)
+        if cls.DATABASE is not None:
+            result = cls.DATABASE[collection].insert_one(record)
+            invalidate(cls.DATABASE.name, collection)
+            return result
         else:
-            print("No database currently loaded.")
+            logger.warning("No database currently loaded.")
         
     @classmethod
-    def find(cls, collection, query):
-        if cls.DATABASE:
-            print("Querying any %s collection: '%s'" % (collection, query))
+    def find(cls, collection, query, cached=False):
+        if cls.DATABASE is not None:
+            if cached:
+                return cached_find(cls.DATABASE[collection], query)
             return cls.DATABASE[collection].find(query)
         else:
-            print("No database currently loaded.")
+            logger.warning("No database currently loaded.")
     
     @classmethod
-    def find_one(cls, collection, query):
-        if cls.DATABASE:
-            print("Querying one from %s collection: '%s'" % (collection, query))
+    def find_one(cls, collection, query, cached=False):
+        if cls.DATABASE is not None:
+            if cached:
+                return cached_find_one(cls.DATABASE[collection], query)
             return cls.DATABASE[collection].find_one(query)
         else:
-            print("No database currently loaded.")
\ No newline at end of file
+            logger.warning("No database currently loaded.")
\ No newline at end of file
@@ -0,0 +1,120 @@
+# generations.py
+# Author: Ian Effendi
+#
+# Per-collection write counters shared between processes through a JSON stamp file.
+#
+# Standard library only, so writers outside the application (eg. the drse Scrapy project) can bump a
+# collection's generation without loading the application settings. connection.cache keys cached query
+# results on these generations.
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (eg. on Windows), bumps are only serialized within a process.
+    fcntl = None
+
+class Generations:
+    """Per-collection write counters, shared between processes through a JSON stamp file."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.counters: Dict[str, int] = {}
+        self.stamp: Optional[int] = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def name(database: str, collection: str) -> str:
+        return f"{database}.{collection}"
+
+    def refresh(self) -> bool:
+        """
+        Reload the stamp file if another process changed it.
+        :returns: bool, True if any generation changed.
+        """
+        if not self.path:
+            return False
+        try:
+            stamp = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if stamp == self.stamp:
+            return False
+        with self.lock:
+            counters = self.load()
+            if counters is None:
+                return False
+            changed = self.merge(counters)
+            self.stamp = stamp
+        return changed
+
+    def load(self) -> Optional[Dict[str, int]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def merge(self, counters: Dict[str, int]) -> bool:
+        """
+        Merge counters read from the stamp file, keeping the highest generation of each collection.
+        :returns: bool, True if any generation changed.
+        """
+        changed = any(generation > self.counters.get(name, 0) for name, generation in counters.items())
+        for name, generation in counters.items():
+            self.counters[name] = max(generation, self.counters.get(name, 0))
+        return changed
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Hold an exclusive lock on the stamp file, so concurrent bumps from other processes are not lost."""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a', encoding='utf-8') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def get(self, database: str, collection: str) -> int:
+        self.refresh()
+        return self.counters.get(self.name(database, collection), 0)
+
+    def bump(self, database: str, collection: str) -> int:
+        """
+        Advance the generation of a collection (and persist it, if a stamp file is configured).
+        :returns: New generation.
+        """
+        name = self.name(database, collection)
+        with self.lock:
+            if not self.path:
+                self.counters[name] = self.counters.get(name, 0) + 1
+                return self.counters[name]
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self.locked():
+                # Re-read under the lock, so a bump made by another process since the last refresh is kept.
+                try:
+                    previous = os.stat(self.path).st_mtime_ns
+                except FileNotFoundError:
+                    previous = None
+                self.merge(self.load() or {})
+                self.counters[name] = self.counters.get(name, 0) + 1
+                temp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp, 'w', encoding='utf-8') as file:
+                    json.dump(self.counters, file)
+                os.replace(temp, self.path)
+                stamp = os.stat(self.path).st_mtime_ns
+                # Readers compare mtimes: make sure every rewrite gets a new one, even on coarse filesystem clocks.
+                if previous is not None and stamp <= previous:
+                    stamp = previous + 1
+                    os.utime(self.path, ns=(stamp, stamp))
+                self.stamp = stamp
+            return self.counters[name]
@@ -0,0 +1,180 @@
+# indexes.py
+# Author: Ian Effendi
+#
+# Create and audit MongoDB indexes from the `index` flags of the settings.toml schemas.
+#
+# Schema entries support:
+#   { field = "zip", index = true }                       ascending single-field index
+#   { field = "zip", index = true, unique = true }        unique index
+#   { field = "address.geometry", index = "2dsphere" }    any pymongo index type (-1, "2dsphere", "text", "hashed")
+# and collections may declare compound indexes:
+#   indexes = [ { fields = ["address.state", "address.county"], unique = false } ]
+import sys
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, IndexModel
+
+from connection.schema import get_databases, get_database, get_collections, get_schema
+
+class IndexSpec:
+    """Declared index: ordered (field, direction) keys and options."""
+
+    def __init__(self, keys: List[Tuple[str, Any]], unique: bool = False):
+        self.keys = [(field, direction) for field, direction in keys]
+        self.unique = bool(unique)
+
+    @property
+    def name(self) -> str:
+        return '_'.join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def signature(self) -> Tuple[Tuple[str, Any], ...]:
+        return tuple(self.keys)
+
+    def model(self) -> IndexModel:
+        options = { 'name': self.name }
+        if self.unique:
+            options['unique'] = True
+        return IndexModel(self.keys, **options)
+
+    def __repr__(self) -> str:
+        return f"IndexSpec({self.keys}, unique={self.unique})"
+
+class IndexReport:
+    """Result of syncing one index. Status is one of: ok, created, missing, changed, extra, unused."""
+
+    def __init__(self, namespace: str, name: str, status: str, keys: List[Tuple[str, Any]] = None):
+        self.namespace = namespace
+        self.name = name
+        self.status = status
+        self.keys = keys if keys else []
+
+    def __str__(self) -> str:
+        return f"[{self.status}] {self.namespace}: {self.name}"
+
+def get_direction(flag: Any) -> Any:
+    """
+    Convert a schema `index` flag into a pymongo index direction.
+    :returns: None if the field is not indexed.
+    """
+    if flag is True:
+        return ASCENDING
+    if flag is False or flag is None:
+        return None
+    return flag
+
+def get_index_specs(collection: Any) -> List[IndexSpec]:
+    """
+    Get the indexes declared by a collection. The implicit `_id` index is excluded.
+    :returns: List of IndexSpec.
+    """
+    specs = []
+    for entry in get_schema(collection):
+        direction = get_direction(entry.get('index', False))
+        if direction is not None and entry['field'] != '_id':
+            specs.append(IndexSpec([(entry['field'], direction)], unique=entry.get('unique', False)))
+    for entry in collection.get('indexes', []):
+        keys = [(field, ASCENDING) if isinstance(field, str) else tuple(field) for field in entry['fields']]
+        specs.append(IndexSpec(keys, unique=entry.get('unique', False)))
+    return specs
+
+def get_existing(target: Any) -> Dict[Tuple[Tuple[str, Any], ...], Dict[str, Any]]:
+    """
+    Get the indexes present on a pymongo collection, keyed by their key signature.
+    :returns: Dict of signature to { name, unique }.
+    """
+    existing = {}
+    for name, info in target.index_information().items():
+        if name == '_id_':
+            continue
+        signature = tuple((field, direction) for field, direction in info['key'])
+        existing[signature] = { 'name': name, 'unique': info.get('unique', False) }
+    return existing
+
+def get_usage(target: Any) -> Dict[str, int]:
+    """
+    Get the number of operations served by each index since the server started, via $indexStats.
+    :returns: Dict of index name to operation count. Empty if $indexStats is unavailable.
+    """
+    try:
+        return { stat['name']: int(stat['accesses']['ops']) for stat in target.aggregate([{ '$indexStats': {} }]) }
+    except Exception:
+        return {}
+
+def sync_collection(db: Any, collection: Any, create: bool = True, drop: bool = False) -> List[IndexReport]:
+    """
+    Sync the declared indexes of one collection.
+    Missing indexes are created (if create), indexes whose options changed are rebuilt (if drop),
+    and undeclared indexes are reported as extra (and removed if drop).
+    :returns: List of IndexReport.
+    """
+    target = db[collection['name']]
+    namespace = f"{db.name}.{collection['name']}"
+    existing = get_existing(target)
+    usage = get_usage(target)
+    reports, models = [], []
+
+    declared = get_index_specs(collection)
+    for spec in declared:
+        current = existing.get(spec.signature())
+        if current is None:
+            if create:
+                models.append(spec.model())
+            reports.append(IndexReport(namespace, spec.name, "created" if create else "missing", spec.keys))
+        elif current['unique'] != spec.unique:
+            if drop:
+                target.drop_index(current['name'])
+                models.append(spec.model())
+            reports.append(IndexReport(namespace, current['name'], "changed", spec.keys))
+        elif usage.get(current['name'], None) == 0:
+            reports.append(IndexReport(namespace, current['name'], "unused", spec.keys))
+        else:
+            reports.append(IndexReport(namespace, current['name'], "ok", spec.keys))
+
+    signatures = set(spec.signature() for spec in declared)
+    for signature, current in existing.items():
+        if signature not in signatures:
+            if drop:
+                target.drop_index(current['name'])
+            reports.append(IndexReport(namespace, current['name'], "extra", list(signature)))
+
+    if models:
+        target.create_indexes(models)
+    return reports
+
+def sync_indexes(db: Any, create: bool = True, drop: bool = False) -> List[IndexReport]:
+    """
+    Sync the declared indexes of every collection in a pymongo database, matched to settings.toml by name.
+    :returns: List of IndexReport. Empty if the database is not declared.
+    """
+    reports = []
+    for collection in get_collections(get_database(db.name)):
+        reports.extend(sync_collection(db, collection, create=create, drop=drop))
+    return reports
+
+if __name__ == '__main__':
+    import argparse
+    from config import settings
+    from connection.database import Database
+
+    argparser = argparse.ArgumentParser(prog="indexes", description="Sync MongoDB indexes with the settings.toml schema declarations.")
+    argparser.add_argument('databases', metavar='DATABASE', nargs='*',
+                           help="Databases to sync, defaults to every declared database.")
+    argparser.add_argument('--check', action='store_true', default=False,
+                           help="Only report missing, changed, extra and unused indexes.")
+    argparser.add_argument('--drop', action='store_true', default=False,
+                           help="Rebuild changed indexes and drop undeclared ones.")
+    cargs = argparser.parse_args()
+
+    client = Database.initialize(Database.make_options(
+        hostname=settings.db.auth.hostname,
+        username=settings.db.auth.username,
+        password=settings.db.auth.password,
+        port=settings.db.auth.port,
+    ))
+    names = cargs.databases if cargs.databases else [ db['name'] for db in get_databases() ]
+    reports = []
+    for name in names:
+        reports.extend(sync_indexes(client[name], create=not cargs.check, drop=cargs.drop and not cargs.check))
+    for report in reports:
+        print(report)
+    sys.exit(1 if cargs.check and any(report.status in ("missing", "changed") for report in reports) else 0)
@@ -0,0 +1,73 @@
+# schema.py
+# Author: Ian Effendi
+#
+# Helper functions for reading the database declarations in settings.toml.
+from typing import Any, Dict, List, Union
+
+from config import settings
+from utils.finder import find_one
+
+def get_databases(root: Any = None) -> List[Any]:
+    """
+    Get the collection of [[db.databases]] entries.
+    :returns: List of database declarations. Empty if none are configured.
+    """
+    root = root if root is not None else settings
+    try:
+        return list(root.db.databases)
+    except (AttributeError, KeyError):
+        return []
+
+def get_database(name: str, root: Any = None) -> Union[Any, None]:
+    """
+    Find a database declaration by name.
+    :returns: None if no database is declared with that name.
+    """
+    return find_one(get_databases(root), lambda db: db['name'] == name)
+
+def get_collections(database: Any) -> List[Any]:
+    """
+    Get the [[db.databases.collections]] entries of a database declaration.
+    :returns: List of collection declarations.
+    """
+    return list(database.get('collections', [])) if database else []
+
+def get_collection(database: str, collection: str, root: Any = None) -> Union[Any, None]:
+    """
+    Find a collection declaration by database and collection name.
+    :returns: None if no collection is declared with that name.
+    """
+    return find_one(get_collections(get_database(database, root)), lambda coll: coll['name'] == collection)
+
+def get_sources(collection: Any) -> List[Any]:
+    """
+    Get the [[db.databases.collections.sources]] entries of a collection declaration.
+    :returns: List of source declarations.
+    """
+    return list(collection.get('sources', [])) if collection else []
+
+def get_schema(collection: Any) -> List[Any]:
+    """
+    Get the schema entries of a collection declaration.
+    :returns: List of { field, ... } entries.
+    """
+    return list(collection.get('schema', [])) if collection else []
+
+def get_fields(collection: Any, flag: str = None) -> List[str]:
+    """
+    Get the field names in a collection schema. If flag is provided, only fields with a truthy flag are returned.
+    :returns: List of (dotted) field names.
+    """
+    return [entry['field'] for entry in get_schema(collection) if not flag or entry.get(flag, False)]
+
+def resolve(document: Dict[str, Any], field: str, default: Any = None) -> Any:
+    """
+    Get the value at a dotted field path (eg. 'address.city') in a nested document.
+    :returns: default if any component of the path is missing.
+    """
+    value = document
+    for key in field.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return default
+        value = value[key]
+    return value
@@ -0,0 +1,124 @@
+# cache.py
+# Author: Ian Effendi
+#
+# Persistent geocoding cache, keyed on normalized address queries and reverse-lookup points.
+import re
+import json
+import sqlite3
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from config import settings
+
+class Place:
+    """Resolved location. Mirrors the fields of geopy.location.Location that the project uses."""
+
+    def __init__(self, latitude: float, longitude: float, address: str = None, raw: Dict[str, Any] = None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.address = address
+        self.raw = raw if raw else {}
+
+    @property
+    def point(self) -> Tuple[float, float]:
+        return self.latitude, self.longitude
+
+    @classmethod
+    def from_location(cls, location: Any) -> Optional['Place']:
+        """Convert a geopy Location (or any object with latitude/longitude) into a Place."""
+        if location is None:
+            return None
+        return cls(location.latitude, location.longitude, getattr(location, 'address', None), getattr(location, 'raw', None))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Place':
+        return cls(**data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'address': self.address,
+            'raw': self.raw
+        }
+
+    def __repr__(self) -> str:
+        return f"Place({self.latitude}, {self.longitude}, {self.address!r})"
+
+###########################
+# QUERY KEYS
+###########################
+
+def normalize(text: Any) -> str:
+    """
+    Normalize an address component: lowercase, punctuation removed, whitespace collapsed.
+    :returns: Empty string for None and NaN values.
+    """
+    if text is None or text != text:
+        return ''
+    text = re.sub(r"[^\w\s]", ' ', str(text).lower())
+    return ' '.join(text.split())
+
+def address_key(query: Union[str, Dict[str, Any]]) -> str:
+    """
+    Key for a forward geocoding query. Structured queries ignore empty components and component order.
+    :returns: str key.
+    """
+    if isinstance(query, dict):
+        components = { field: normalize(value) for field, value in query.items() }
+        return 'geocode:' + json.dumps({ field: value for field, value in components.items() if value }, sort_keys=True)
+    return 'geocode:' + normalize(query)
+
+def point_key(point: Any, precision: int = 6) -> str:
+    """
+    Key for a reverse geocoding query, rounded to `precision` decimal places (~0.1m at 6).
+    :returns: str key.
+    """
+    latitude, longitude = (point.latitude, point.longitude) if hasattr(point, 'latitude') else point[:2]
+    return f"reverse:{round(float(latitude), precision):.{precision}f},{round(float(longitude), precision):.{precision}f}"
+
+###########################
+# CACHE
+###########################
+
+class GeocodeCache:
+    """
+    SQLite-backed cache of resolved places. Failed lookups are stored as None so they are not retried.
+    Access it from a single thread; the resolver only touches the cache outside its worker threads.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path if path else settings.get('geocoder', {}).get('cache', '.cache/geocode.sqlite')
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS places (key TEXT PRIMARY KEY, place TEXT)")
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM places WHERE key = ?", (key,)).fetchone() is not None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[Place]]:
+        """
+        Look up cached keys, in chunks to stay under the SQLite variable limit.
+        :returns: Dict of found keys to their Place (or None for cached failures). Missing keys are omitted.
+        """
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.connection.execute(f"SELECT key, place FROM places WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for key, place in rows:
+                found[key] = Place.from_dict(json.loads(place)) if place else None
+        return found
+
+    def set_many(self, places: Dict[str, Optional[Place]]) -> None:
+        rows = [ (key, json.dumps(place.to_dict()) if place else None) for key, place in places.items() ]
+        self.connection.executemany("INSERT OR REPLACE INTO places (key, place) VALUES (?, ?)", rows)
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,122 @@
+# kdtree.py
+# Author: Ian Effendi
+#
+# KD-tree over (latitude, longitude) points for nearest-neighbour and radius queries.
+#
+# Points are projected onto the unit sphere (x, y, z), where straight-line (chord) distance
+# orders points the same way as great-circle distance, so the tree needs no special cases
+# for the antimeridian or the poles.
+import math
+import heapq
+from typing import Any, List, Sequence, Tuple
+
+# Mean Earth radius, in kilometers.
+EARTH_RADIUS_KM = 6371.0088
+
+def to_cartesian(latitude: float, longitude: float) -> Tuple[float, float, float]:
+    """
+    Project a (latitude, longitude) in degrees onto the unit sphere.
+    :returns: (x, y, z) tuple.
+    """
+    phi = math.radians(latitude)
+    theta = math.radians(longitude)
+    return (math.cos(phi) * math.cos(theta), math.cos(phi) * math.sin(theta), math.sin(phi))
+
+def chord_to_km(chord: float) -> float:
+    """Convert a chord length on the unit sphere into a great-circle distance in kilometers."""
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2.0))
+
+def km_to_chord(km: float) -> float:
+    """Convert a great-circle distance in kilometers into a chord length on the unit sphere."""
+    return 2.0 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2.0)
+
+def haversine(a: Sequence[float], b: Sequence[float]) -> float:
+    """
+    Great-circle distance between two (latitude, longitude) points.
+    :returns: Distance in kilometers.
+    """
+    phi1, phi2 = math.radians(a[0]), math.radians(b[0])
+    dphi = phi2 - phi1
+    dlambda = math.radians(b[1] - a[1])
+    h = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+class KDTree:
+    """
+    Static 3-d tree over labelled (latitude, longitude) points.
+    The tree is stored implicitly: each node is the median of its slice of `order`.
+    """
+
+    def __init__(self, points: Sequence[Tuple[float, float]], labels: Sequence[Any] = None):
+        self.points = [ (float(latitude), float(longitude)) for latitude, longitude in points ]
+        self.labels = list(labels) if labels is not None else list(range(len(self.points)))
+        self.coords = [ to_cartesian(*point) for point in self.points ]
+        self.order = list(range(len(self.points)))
+        self.build(0, len(self.order), 0)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def build(self, lo: int, hi: int, axis: int) -> None:
+        if hi - lo <= 1:
+            return
+        coords = self.coords
+        self.order[lo:hi] = sorted(self.order[lo:hi], key=lambda i: coords[i][axis])
+        mid = (lo + hi) // 2
+        self.build(lo, mid, (axis + 1) % 3)
+        self.build(mid + 1, hi, (axis + 1) % 3)
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Tuple[Any, float]]:
+        """
+        Find the k points closest to a location.
+        :returns: List of (label, distance in km), closest first.
+        """
+        if not self.order or k < 1:
+            return []
+        target = to_cartesian(latitude, longitude)
+        best: List[Tuple[float, int]] = []
+        self.search_nearest(target, k, best, 0, len(self.order), 0)
+        return [ (self.labels[i], chord_to_km(-negative)) for negative, i in sorted(best, reverse=True) ]
+
+    def search_nearest(self, target: Tuple[float, float, float], k: int, best: List[Tuple[float, int]], lo: int, hi: int, axis: int) -> None:
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        i = self.order[mid]
+        coord = self.coords[i]
+        distance = math.dist(target, coord)
+        if len(best) < k:
+            heapq.heappush(best, (-distance, i))
+        elif distance < -best[0][0]:
+            heapq.heapreplace(best, (-distance, i))
+        delta = target[axis] - coord[axis]
+        near, far = ((lo, mid), (mid + 1, hi)) if delta < 0 else ((mid + 1, hi), (lo, mid))
+        self.search_nearest(target, k, best, near[0], near[1], (axis + 1) % 3)
+        if len(best) < k or abs(delta) < -best[0][0]:
+            self.search_nearest(target, k, best, far[0], far[1], (axis + 1) % 3)
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[Any, float]]:
+        """
+        Find every point within a great-circle radius of a location.
+        :returns: List of (label, distance in km), closest first.
+        """
+        target = to_cartesian(latitude, longitude)
+        radius = km_to_chord(radius_km)
+        found: List[Tuple[float, int]] = []
+        stack = [ (0, len(self.order), 0) ]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            i = self.order[mid]
+            coord = self.coords[i]
+            distance = math.dist(target, coord)
+            if distance <= radius:
+                found.append((distance, i))
+            delta = target[axis] - coord[axis]
+            if delta - radius <= 0:
+                stack.append((lo, mid, (axis + 1) % 3))
+            if delta + radius >= 0:
+                stack.append((mid + 1, hi, (axis + 1) % 3))
+        return [ (self.labels[i], chord_to_km(distance)) for distance, i in sorted(found) ]
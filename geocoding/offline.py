@@ -0,0 +1,468 @@
+# offline.py
+# Author: Ian Effendi
+#
+# Offline geocoding of zip, city and county queries from the zipcodes table and a local centroid table.
+#
+# Zip centroids come from a centroid CSV (geocoder.centroids; zip/latitude/longitude or Census Gazetteer
+# columns) and/or from any records that already carry coordinates (eg. providers with address.coordinates).
+# python -m geocoding.offline <Census ZCTA Gazetteer file> builds data/zip_centroids.csv from the Gazetteer
+# coordinates, named from the provider worksheets. Without one, the bundled table is derived from the
+# worksheet coordinates that pass validation (state prefix and bounds, city agreement, outliers), so it
+# only covers zip codes that have providers. City and county centroids are the population-weighted
+# mean of their zip centroids. Only queries with a street line need the remote geocoder.
+import os
+import re
+import csv
+import math
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from config import settings
+from geocoding.cache import Place, normalize
+from geocoding.kdtree import KDTree, haversine, to_cartesian
+from utils.address import format_zip
+
+# First three digits of a zip code to USPS state code (approximate; military and territory codes omitted).
+ZIP_PREFIXES = [
+    (5, 5, 'NY'), (6, 9, 'PR'), (10, 27, 'MA'), (28, 29, 'RI'), (30, 38, 'NH'), (39, 49, 'ME'),
+    (50, 59, 'VT'), (60, 69, 'CT'), (70, 89, 'NJ'), (100, 149, 'NY'), (150, 196, 'PA'), (197, 199, 'DE'),
+    (200, 205, 'DC'), (206, 219, 'MD'), (220, 246, 'VA'), (247, 268, 'WV'), (270, 289, 'NC'), (290, 299, 'SC'),
+    (300, 319, 'GA'), (320, 349, 'FL'), (350, 369, 'AL'), (370, 385, 'TN'), (386, 397, 'MS'), (398, 399, 'GA'),
+    (400, 427, 'KY'), (430, 459, 'OH'), (460, 479, 'IN'), (480, 499, 'MI'), (500, 528, 'IA'), (530, 549, 'WI'),
+    (550, 567, 'MN'), (570, 577, 'SD'), (580, 588, 'ND'), (590, 599, 'MT'), (600, 629, 'IL'), (630, 658, 'MO'),
+    (660, 679, 'KS'), (680, 693, 'NE'), (700, 714, 'LA'), (716, 729, 'AR'), (730, 732, 'OK'), (733, 733, 'TX'),
+    (734, 749, 'OK'), (750, 799, 'TX'), (800, 816, 'CO'), (820, 831, 'WY'), (832, 838, 'ID'), (840, 847, 'UT'),
+    (850, 865, 'AZ'), (870, 884, 'NM'), (885, 885, 'TX'), (889, 898, 'NV'), (900, 961, 'CA'), (967, 968, 'HI'),
+    (970, 979, 'OR'), (980, 994, 'WA'), (995, 999, 'AK'),
+]
+
+def zip_state(zipcode: Any) -> Optional[str]:
+    """
+    Infer the state code of a zip code from its three-digit prefix.
+    :returns: None if the prefix is not mapped.
+    """
+    zipcode = format_zip(zipcode)
+    if not zipcode:
+        return None
+    prefix = int(zipcode[:3])
+    for lo, hi, state in ZIP_PREFIXES:
+        if lo <= prefix <= hi:
+            return state
+    return None
+
+def needs_street(query: Union[str, Dict[str, Any]]) -> bool:
+    """
+    Check if a query needs street-level precision. Free text is assumed to, unless it is just a zip code.
+    :returns: bool, True if the remote geocoder is required.
+    """
+    if isinstance(query, dict):
+        return bool(normalize(query.get('street', None)))
+    return format_zip(query) is None
+
+class OfflineGeocoder:
+    """
+    In-memory geocoder with geopy-style geocode(query) and reverse(point) methods.
+    Structured queries use the geopy component names: postalcode, city, county, state.
+    """
+
+    def __init__(self):
+        self.zipcodes: Dict[str, Dict[str, Any]] = {}
+        self.sums: Dict[str, List[float]] = {}
+        self.places: Dict[Tuple[str, ...], Place] = {}
+        self.tree: KDTree = None
+
+    ###########################
+    # LOADING
+    ###########################
+
+    def add_zipcodes(self, rows: Iterable[Dict[str, Any]]) -> 'OfflineGeocoder':
+        """Add zipcode rows ({ zip, city, county, pop }, as in the zipcodes sheet and region.zipcodes)."""
+        for row in rows:
+            zipcode = format_zip(row.get('zip'))
+            if zipcode:
+                pop = row.get('pop')
+                self.zipcodes[zipcode] = {
+                    'zip': zipcode,
+                    'city': row.get('city'),
+                    'county': row.get('county'),
+                    'state': row.get('state') or zip_state(zipcode),
+                    'pop': float(pop) if pop is not None and pop == pop else 0.0,
+                }
+        self.tree = None
+        return self
+
+    def add_centroids(self, rows: Iterable[Tuple[Any, float, float]]) -> 'OfflineGeocoder':
+        """Add (zip, latitude, longitude) observations. Repeated zips are averaged on the unit sphere."""
+        for zipcode, latitude, longitude in rows:
+            zipcode = format_zip(zipcode)
+            if zipcode and latitude == latitude and longitude == longitude and latitude is not None and longitude is not None:
+                x, y, z = to_cartesian(float(latitude), float(longitude))
+                sums = self.sums.setdefault(zipcode, [0.0, 0.0, 0.0])
+                sums[0] += x
+                sums[1] += y
+                sums[2] += z
+        self.tree = None
+        return self
+
+    def add_centroid_file(self, path: str) -> 'OfflineGeocoder':
+        """
+        Add centroids from a CSV/TSV with zip and coordinate columns. Accepts zip/latitude/longitude
+        or the Census Gazetteer names (GEOID, INTPTLAT, INTPTLONG). Optional city/county/state columns
+        describe zip codes missing from the zipcodes table.
+        """
+        with open(path, 'r', newline='', encoding='utf-8') as file:
+            dialect = csv.Sniffer().sniff(file.read(4096), delimiters=',\t|')
+            file.seek(0)
+            reader = csv.DictReader(file, dialect=dialect)
+            reader.fieldnames = [ name.strip() for name in reader.fieldnames ]
+            zip_field = 'zip' if 'zip' in reader.fieldnames else 'GEOID'
+            lat_field = 'latitude' if 'latitude' in reader.fieldnames else 'INTPTLAT'
+            lon_field = 'longitude' if 'longitude' in reader.fieldnames else 'INTPTLONG'
+            rows = list(reader)
+        self.add_zipcodes({ **row, 'zip': row[zip_field], 'pop': None } for row in rows if 'city' in row and format_zip(row[zip_field]) not in self.zipcodes)
+        return self.add_centroids((row[zip_field], float(row[lat_field]), float(row[lon_field])) for row in rows)
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]]) -> 'OfflineGeocoder':
+        """Add centroid observations from provider documents with address.zipcode and address.coordinates."""
+        def observations():
+            for document in documents:
+                address = document.get('address') or {}
+                coordinates = address.get('coordinates') or {}
+                zipcode = format_zip(address.get('zipcode'))
+                if zipcode and zipcode not in self.zipcodes:
+                    self.zipcodes[zipcode] = {
+                        'zip': zipcode,
+                        'city': address.get('city'),
+                        'county': address.get('county'),
+                        'state': address.get('state') or zip_state(zipcode),
+                        'pop': 0.0,
+                    }
+                if coordinates.get('latitude') is not None and coordinates.get('longitude') is not None:
+                    yield zipcode, coordinates['latitude'], coordinates['longitude']
+        return self.add_centroids(observations())
+
+    def build(self) -> 'OfflineGeocoder':
+        """Compute zip, city and county places and the reverse-lookup tree."""
+        self.places = {}
+        weighted: Dict[Tuple[str, ...], List[float]] = {}
+        zips, points = [], []
+        for zipcode, (x, y, z) in self.sums.items():
+            norm = math.sqrt(x * x + y * y + z * z)
+            if not norm:
+                continue
+            x, y, z = x / norm, y / norm, z / norm
+            latitude, longitude = math.degrees(math.asin(z)), math.degrees(math.atan2(y, x))
+            info = self.zipcodes.get(zipcode, { 'zip': zipcode, 'city': None, 'county': None, 'state': zip_state(zipcode), 'pop': 0.0 })
+            self.places[('zip', zipcode)] = Place(latitude, longitude, self.describe(info), { **info, 'precision': 'zip' })
+            zips.append(zipcode)
+            points.append((latitude, longitude))
+            weight = info['pop'] if info['pop'] > 0 else 1.0
+            for kind in ('city', 'county'):
+                name = normalize(info.get(kind))
+                if name:
+                    sums = weighted.setdefault((kind, name, info['state'] or ''), [0.0, 0.0, 0.0, 0.0])
+                    sums[0] += x * weight
+                    sums[1] += y * weight
+                    sums[2] += z * weight
+                    sums[3] += 1
+        states: Dict[Tuple[str, str], List[str]] = {}
+        for (kind, name, state), (x, y, z, count) in weighted.items():
+            norm = math.sqrt(x * x + y * y + z * z)
+            if norm:
+                raw = { kind: name, 'state': state or None, 'zips': int(count), 'precision': kind }
+                self.places[(kind, name, state)] = Place(math.degrees(math.asin(z / norm)), math.degrees(math.atan2(y, x)), f"{name.title()}" + (f", {state}" if state else ""), raw)
+                states.setdefault((kind, name), []).append(state)
+        # Names without a state only resolve when they are unambiguous.
+        for (kind, name), found in states.items():
+            if len(found) == 1:
+                self.places.setdefault((kind, name, ''), self.places[(kind, name, found[0])])
+        self.tree = KDTree(points, labels=zips)
+        return self
+
+    @staticmethod
+    def describe(info: Dict[str, Any]) -> str:
+        parts = [ info.get('city'), info.get('state'), info.get('zip') ]
+        return ', '.join(str(part) for part in parts if part)
+
+    ###########################
+    # LOOKUPS
+    ###########################
+
+    def geocode(self, query: Union[str, Dict[str, Any]], **kwargs: Any) -> Optional[Place]:
+        """
+        Resolve a query at the finest precision available: postal code, then city, then county.
+        The state (if provided) disambiguates cities and counties with the same name.
+        :returns: Place, or None if nothing matches or the query needs a street address.
+        """
+        if self.tree is None:
+            self.build()
+        if not isinstance(query, dict):
+            zipcode = format_zip(query)
+            return self.places.get(('zip', zipcode)) if zipcode else None
+        if needs_street(query):
+            return None
+        zipcode = format_zip(query.get('postalcode'))
+        if zipcode and ('zip', zipcode) in self.places:
+            return self.places[('zip', zipcode)]
+        state = str(query.get('state') or '').strip().upper()
+        for kind in ('city', 'county'):
+            name = normalize(query.get(kind))
+            if name:
+                place = self.places.get((kind, name, state)) or self.places.get((kind, name, ''))
+                if place:
+                    return place
+        return None
+
+    def reverse(self, point: Any, **kwargs: Any) -> Optional[Place]:
+        """
+        Find the zip code whose centroid is nearest to a point.
+        :returns: Place of the zip code (raw includes 'distance' in km), or None if no centroids are loaded.
+        """
+        if self.tree is None:
+            self.build()
+        latitude, longitude = (point.latitude, point.longitude) if hasattr(point, 'latitude') else point[:2]
+        nearest = self.tree.nearest(float(latitude), float(longitude), k=1)
+        if not nearest:
+            return None
+        zipcode, distance = nearest[0]
+        place = self.places[('zip', zipcode)]
+        return Place(place.latitude, place.longitude, place.address, { **place.raw, 'distance': distance })
+
+    ###########################
+    # FACTORIES
+    ###########################
+
+    @classmethod
+    def from_frames(cls, zipcodes: Any, documents: Iterable[Dict[str, Any]] = None, centroids: str = None) -> 'OfflineGeocoder':
+        """
+        Build from a zipcodes table (DataFrame with Zipcode/City/County/Population or zip/city/county/pop columns),
+        provider documents with coordinates, and the configured centroid file.
+        :raises FileNotFoundError: Raised if the centroid file does not exist.
+        :raises ValueError: Raised if no zip code has a centroid.
+        :returns: Built OfflineGeocoder.
+        """
+        geocoder = cls()
+        frame = zipcodes.rename(columns=lambda column: { 'zipcode': 'zip', 'population': 'pop' }.get(str(column).lower(), str(column).lower()))
+        geocoder.add_zipcodes(frame.to_dict('records'))
+        centroids = centroids if centroids else get_centroids_path()
+        if centroids:
+            if not os.path.exists(centroids):
+                raise FileNotFoundError(f"Centroid file not found: '{centroids}'. Run python -m geocoding.offline [gazetteer] to build it.")
+            geocoder.add_centroid_file(centroids)
+        if documents is not None:
+            geocoder.add_documents(documents)
+        geocoder.build()
+        if not geocoder.places:
+            raise ValueError("No zip code centroids were loaded; the offline geocoder cannot resolve anything.")
+        return geocoder
+
+    @classmethod
+    def from_sheet(cls, documents: Iterable[Dict[str, Any]] = None, centroids: str = None) -> 'OfflineGeocoder':
+        """Build from the zipcodes worksheet declared for region.zipcodes in settings.toml."""
+        from ingestion.pipeline import get_jobs, read_excel
+        jobs = get_jobs('region', 'zipcodes')
+        frame = read_excel(jobs[0])
+        return cls.from_frames(frame, documents, centroids)
+
+    @classmethod
+    def from_collection(cls, documents: Iterable[Dict[str, Any]] = None, centroids: str = None) -> 'OfflineGeocoder':
+        """Build from the region.zipcodes collection (and providers.services coordinates if documents is None)."""
+        import pandas as pd
+        from connection.database import Database
+        client = Database.CLIENT
+        zipcodes = pd.DataFrame(list(client['region']['zipcodes'].find({}, { '_id': 0 })))
+        if documents is None:
+            documents = client['providers']['services'].find({ 'address.coordinates.latitude': { '$ne': None } }, { 'address': 1 })
+        return cls.from_frames(zipcodes, documents, centroids)
+
+###########################
+# CENTROID TABLE
+###########################
+
+# Approximate state bounding boxes: (south, north, west, east) in degrees.
+STATE_BOUNDS = {
+    'AK': (51.2, 71.4, -180.0, -129.9), 'AL': (30.1, 35.0, -88.5, -84.9), 'AR': (33.0, 36.5, -94.6, -89.6),
+    'AZ': (31.3, 37.0, -114.8, -109.0), 'CA': (32.5, 42.0, -124.5, -114.1), 'CO': (37.0, 41.0, -109.1, -102.0),
+    'CT': (40.9, 42.1, -73.7, -71.8), 'DC': (38.8, 39.0, -77.1, -76.9), 'DE': (38.4, 39.8, -75.8, -75.0),
+    'FL': (24.5, 31.0, -87.6, -80.0), 'GA': (30.4, 35.0, -85.6, -80.8), 'HI': (18.9, 22.3, -160.3, -154.8),
+    'IA': (40.4, 43.5, -96.6, -90.1), 'ID': (42.0, 49.0, -117.2, -111.0), 'IL': (37.0, 42.5, -91.5, -87.0),
+    'IN': (37.8, 41.8, -88.1, -84.8), 'KS': (37.0, 40.0, -102.1, -94.6), 'KY': (36.5, 39.1, -89.6, -82.0),
+    'LA': (28.9, 33.0, -94.0, -88.8), 'MA': (41.2, 42.9, -73.5, -69.9), 'MD': (37.9, 39.7, -79.5, -75.0),
+    'ME': (43.0, 47.5, -71.1, -66.9), 'MI': (41.7, 48.3, -90.4, -82.4), 'MN': (43.5, 49.4, -97.2, -89.5),
+    'MO': (36.0, 40.6, -95.8, -89.1), 'MS': (30.2, 35.0, -91.7, -88.1), 'MT': (44.4, 49.0, -116.0, -104.0),
+    'NC': (33.8, 36.6, -84.3, -75.5), 'ND': (45.9, 49.0, -104.0, -96.6), 'NE': (40.0, 43.0, -104.0, -95.3),
+    'NH': (42.7, 45.3, -72.6, -70.6), 'NJ': (38.9, 41.4, -75.6, -73.9), 'NM': (31.3, 37.0, -109.1, -103.0),
+    'NV': (35.0, 42.0, -120.0, -114.0), 'NY': (40.5, 45.0, -79.8, -71.9), 'OH': (38.4, 42.0, -84.8, -80.5),
+    'OK': (33.6, 37.0, -103.0, -94.4), 'OR': (42.0, 46.3, -124.6, -116.5), 'PA': (39.7, 42.3, -80.5, -74.7),
+    'PR': (17.9, 18.5, -67.9, -65.2), 'RI': (41.1, 42.0, -71.9, -71.1), 'SC': (32.0, 35.2, -83.4, -78.5),
+    'SD': (42.5, 45.9, -104.1, -96.4), 'TN': (35.0, 36.7, -90.3, -81.6), 'TX': (25.8, 36.5, -106.6, -93.5),
+    'UT': (37.0, 42.0, -114.1, -109.0), 'VA': (36.5, 39.5, -83.7, -75.2), 'VT': (42.7, 45.0, -73.4, -71.5),
+    'WA': (45.5, 49.0, -124.8, -116.9), 'WI': (42.5, 47.1, -92.9, -86.8), 'WV': (37.2, 40.6, -82.6, -77.7),
+    'WY': (41.0, 45.0, -111.1, -104.1),
+}
+
+# Slack around a state bounding box, in degrees.
+BOUNDS_MARGIN = 0.1
+
+# A derived centroid this far from every zip code sharing its three-digit prefix or its county is rejected.
+OUTLIER_KM = 150.0
+
+def get_centroids_path() -> Optional[str]:
+    return settings.get('geocoder', {}).get('centroids', 'data/zip_centroids.csv')
+
+def in_state(zipcode: Any, latitude: float, longitude: float) -> bool:
+    """
+    Check that a point lies in the bounding box of the state its zip code belongs to.
+    :returns: bool, False if the state of the zip code is unknown.
+    """
+    bounds = STATE_BOUNDS.get(zip_state(zipcode))
+    if bounds is None:
+        return False
+    south, north, west, east = bounds
+    return south - BOUNDS_MARGIN <= latitude <= north + BOUNDS_MARGIN and west - BOUNDS_MARGIN <= longitude <= east + BOUNDS_MARGIN
+
+def clean_place(value: Any) -> Optional[str]:
+    """
+    Clean a city or county name from a worksheet: repair UTF-8 text decoded as cp1252, collapse whitespace,
+    strip stray punctuation and title-case single-case names. Lists of places (eg. 'Warren - Hamilton') are rejected.
+    :returns: None if the value is not a single place name.
+    """
+    if value is None or value != value:
+        return None
+    text = str(value)
+    try:
+        text = text.encode('cp1252').decode('utf-8')
+    except UnicodeError:
+        pass
+    # A non-breaking space decoded as cp1252 leaves a stray 'Â' before the space.
+    text = ' '.join(text.replace('\u00c2\u00a0', ' ').replace('\u00c2 ', ' ').split()).strip(' ,;.-/')
+    if not text or re.search(r"\s[-&/]\s|[,;/]|\sand\s", text):
+        return None
+    return text.title() if text.isupper() or text.islower() else text
+
+def sheet_observations() -> Iterable[Dict[str, Any]]:
+    """
+    Read the located rows of the providers.services worksheets, mapped by their ingestion transforms.
+    :returns: Generator of { zip, latitude, longitude, city, county, state, source, facility } observations.
+    """
+    from ingestion.pipeline import get_jobs, get_transform, prepare, readers
+    for job in get_jobs('providers', 'services'):
+        reader, apply = readers.get(job.type), get_transform(job)
+        if reader is None or not job.signature():
+            continue
+        for record in prepare(reader(job), job).to_dict('records'):
+            record = apply(record) if apply else record
+            zipcode = format_zip(record.get('address.zipcode'))
+            latitude, longitude = record.get('address.coordinates.latitude'), record.get('address.coordinates.longitude')
+            if zipcode and latitude is not None and longitude is not None:
+                yield {
+                    'zip': zipcode,
+                    'latitude': float(latitude),
+                    'longitude': float(longitude),
+                    **{ kind: record.get(f'address.{kind}') for kind in ('city', 'county', 'state') },
+                    'source': f"{job.name}#{job.sheet}",
+                    'facility': record.get('facility'),
+                }
+
+def validate_observations(observations: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Clean centroid observations and reject the ones that cannot be the location of their zip code:
+    - the state does not match the zip code prefix (ZIP_PREFIXES), or the point is outside that state (STATE_BOUNDS);
+    - the city differs from the most common city of the zip code (the coordinates belong to another address);
+    - counties listed several to a facility are service areas, not locations; the county of a zip code is only kept
+      when a strict majority of its facilities name the same single county;
+    - the mean point of the zip code is more than OUTLIER_KM from every other zip code sharing its three-digit prefix or its county.
+    :returns: Accepted observations and the number rejected for each reason.
+    """
+    from collections import Counter, defaultdict
+    rejected: Counter = Counter()
+    rows: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in observations:
+        zipcode, state = format_zip(row.get('zip')), zip_state(row.get('zip'))
+        if state is None or str(row.get('state') or state).strip().upper() != state:
+            rejected['state'] += 1
+        else:
+            rows[zipcode].append({ **row, 'zip': zipcode, 'state': state, 'city': clean_place(row.get('city')), 'county': clean_place(row.get('county')) })
+    for zipcode, found in list(rows.items()):
+        cities = Counter(row['city'].lower() for row in found if row['city'])
+        if cities:
+            city = cities.most_common(1)[0][0]
+            rejected['city'] += sum(1 for row in found if row['city'] and row['city'].lower() != city)
+            found = [ row for row in found if not row['city'] or row['city'].lower() == city ]
+        rejected['bounds'] += sum(1 for row in found if not in_state(zipcode, row['latitude'], row['longitude']))
+        found = [ row for row in found if in_state(zipcode, row['latitude'], row['longitude']) ]
+        if not found:
+            del rows[zipcode]
+            continue
+        facilities = defaultdict(set)
+        for row in found:
+            facilities[(row.get('source'), row.get('facility'))].update([ row['county'] ] if row['county'] else [])
+        votes = Counter(next(iter(counties)) for counties in facilities.values() if len(counties) == 1)
+        county = votes.most_common(1)[0][0] if votes else None
+        for row in found:
+            row['county'] = county if county and votes[county] * 2 > len(facilities) else None
+        rows[zipcode] = found
+    geocoder = OfflineGeocoder().add_centroids((row['zip'], row['latitude'], row['longitude']) for found in rows.values() for row in found).build()
+    points = { zipcode: (geocoder.places[('zip', zipcode)].latitude, geocoder.places[('zip', zipcode)].longitude) for zipcode in rows }
+    groups: Dict[Tuple[str, ...], Set[str]] = defaultdict(set)
+    for zipcode, found in rows.items():
+        groups[('prefix', zipcode[:3])].add(zipcode)
+        for county in { row['county'].lower() for row in found if row['county'] }:
+            groups[('county', county, zip_state(zipcode))].add(zipcode)
+    neighbours: Dict[str, Set[str]] = defaultdict(set)
+    for members in groups.values():
+        for zipcode in members:
+            neighbours[zipcode] |= members - { zipcode }
+    outliers = [ zipcode for zipcode, others in neighbours.items()
+                 if len(others) >= 2 and min(haversine(points[zipcode], points[other]) for other in others) > OUTLIER_KM ]
+    for zipcode in outliers:
+        rejected['outlier'] += len(rows.pop(zipcode))
+    return [ row for found in rows.values() for row in found ], dict(rejected)
+
+def write_centroid_file(observations: Iterable[Dict[str, Any]], path: str = None, gazetteer: str = None) -> int:
+    """
+    Write a centroid CSV readable by add_centroid_file, with the most common city, county and state of each zip code.
+    Coordinates come from a Census ZCTA Gazetteer file if one is given (every ZCTA is written); otherwise, and for
+    zip codes missing from it, they are the mean of the observations accepted by validate_observations.
+    :returns: Number of zip codes written.
+    """
+    from collections import Counter
+    path = path if path else get_centroids_path()
+    observations, _ = validate_observations(observations)
+    geocoder = OfflineGeocoder().add_centroids((row['zip'], row['latitude'], row['longitude']) for row in observations).build()
+    places = { key[1]: place for key, place in geocoder.places.items() if key[0] == 'zip' }
+    if gazetteer:
+        reference = OfflineGeocoder().add_centroid_file(gazetteer).build()
+        places.update({ key[1]: place for key, place in reference.places.items() if key[0] == 'zip' })
+    names: Dict[str, Dict[str, Counter]] = { zipcode: { kind: Counter() for kind in ('city', 'county', 'state') } for zipcode in places }
+    for row in observations:
+        for kind, counter in names[row['zip']].items():
+            counter[row.get(kind)] += 1
+    def common(counter: Counter) -> str:
+        values = [ value for value, _ in counter.most_common() if value ]
+        return values[0] if values else ''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp = path + '.tmp'
+    with open(temp, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow([ 'zip', 'latitude', 'longitude', 'city', 'county', 'state', 'observations' ])
+        for zipcode in sorted(places):
+            place, counters = places[zipcode], names[zipcode]
+            writer.writerow([ zipcode, f"{place.latitude:.6f}", f"{place.longitude:.6f}", common(counters['city']), common(counters['county']),
+                              common(counters['state']) or zip_state(zipcode) or '', sum(counters['state'].values()) ])
+    os.replace(temp, path)
+    return len(places)
+
+###########################
+# SCRIPT
+###########################
+
+if __name__ == '__main__':
+
+    # Build the centroid table: python -m geocoding.offline [path to a Census ZCTA Gazetteer file]
+    import sys
+    observations = list(sheet_observations())
+    _, rejected = validate_observations(observations)
+    count = write_centroid_file(observations, gazetteer=sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"Wrote {count} zip code centroid(s) to {get_centroids_path()}; rejected observations: {rejected or 'none'}.")
@@ -0,0 +1,232 @@
+# regions.py
+# Author: Ian Effendi
+#
+# Memory-mapped zip code -> city/county/state/population lookup table, built from region.zipcodes and region.states.
+#
+# The table is a directory of .npy arrays: zip codes sorted ascending (uint32) with fixed-width columns
+# in the same order (city and county codes, state index, population), plus a small JSON file of the
+# city, county and state names. Arrays are opened with mmap, so worker processes share the page cache
+# instead of each loading a copy. Since zip codes span only 100000 values, a dense zip -> row index
+# (400 KB) turns each lookup into a single array read, with no binary search and no database round trips.
+import os
+import json
+import shutil
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config import settings
+from geocoding.offline import zip_state
+from utils.address import format_zip
+
+# Fixed-width columns, in table order.
+COLUMNS = { 'zip': np.uint32, 'city': np.int32, 'county': np.int32, 'state': np.int16, 'pop': np.int64 }
+
+# Size of the dense zip -> row index (zip codes 00000 to 99999).
+ZIP_SPACE = 100000
+
+# Population of an unknown zip code or state.
+NO_POPULATION = -1
+
+def to_zip_array(values: Any) -> np.ndarray:
+    """
+    Convert zip codes (ints, strings, ZIP+4, NaN) to a uint32 array in bulk. Unparseable values become 0.
+    Strings are parsed once per distinct value, so repeated zip codes cost a hash lookup.
+    :returns: uint32 array.
+    """
+    import pandas as pd
+    values = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+    if values.dtype.kind in 'iuf':
+        numbers = values.astype(np.float64)
+    else:
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        parsed = [ format_zip(value) for value in np.asarray(uniques, dtype=object) ]
+        numbers = np.array([ *(float(value) if value else np.nan for value in parsed), np.nan ])[codes]
+    numbers[~np.isfinite(numbers) | (numbers < 0) | (numbers > 99999)] = 0
+    return numbers.astype(np.uint32)
+
+class RegionTable:
+    """Sorted, memory-mapped zip code table with single (lookup) and vectorized (lookup_many, enrich) access."""
+
+    def __init__(self, directory: str, mmap: bool = True):
+        self.directory = directory
+        self.arrays = { name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None) for name in [ *COLUMNS, 'index' ] }
+        with open(os.path.join(directory, 'names.json'), 'r', encoding='utf-8') as file:
+            names = json.load(file)
+        # Code -1 (unknown) selects the trailing None.
+        self.cities = np.array([ *names['cities'], None ], dtype=object)
+        self.counties = np.array([ *names['counties'], None ], dtype=object)
+        self.states = np.array([ *names['states'], None ], dtype=object)
+        self.state_names = np.array([ *names['state_names'], None ], dtype=object)
+        self.state_pops = np.array([ *names['state_pops'], NO_POPULATION ], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.arrays['zip'])
+
+    ###########################
+    # BUILDING
+    ###########################
+
+    @classmethod
+    def build(cls, zipcodes: Iterable[Dict[str, Any]], states: Iterable[Dict[str, Any]] = (), directory: str = None) -> 'RegionTable':
+        """
+        Write the table for zipcode rows ({ zip, city, county, pop[, state] }) and state rows ({ state, abbr, pop }).
+        States are inferred from the zip prefix when a row has none. The directory is replaced atomically.
+        :returns: Opened RegionTable.
+        """
+        directory = directory if directory else settings.get('geocoder', {}).get('regions', '.cache/regions')
+        states = list(states)
+        abbrs = [ str(state.get('abbr')).upper() for state in states if state.get('abbr') ]
+        state_index = { abbr: i for i, abbr in enumerate(abbrs) }
+        state_names = [ state.get('state') for state in states if state.get('abbr') ]
+        state_pops = [ int(state['pop']) if state.get('pop') is not None and state['pop'] == state['pop'] else NO_POPULATION for state in states if state.get('abbr') ]
+
+        rows: Dict[int, Dict[str, Any]] = {}
+        for row in zipcodes:
+            zipcode = format_zip(row.get('zip', row.get('zipcode')))
+            # 00000 is not a zip code; index entry 0 stays -1 for unparseable input.
+            if zipcode and int(zipcode) > 0:
+                rows[int(zipcode)] = { **row, 'zip': zipcode }
+        cities: Dict[str, int] = {}
+        counties: Dict[str, int] = {}
+        columns = { name: np.empty(len(rows), dtype=dtype) for name, dtype in COLUMNS.items() }
+        for i, number in enumerate(sorted(rows)):
+            row = rows[number]
+            city, county, pop = row.get('city'), row.get('county'), row.get('pop', row.get('population'))
+            state = str(row.get('state') or zip_state(row['zip']) or '').upper()
+            if state and state not in state_index:
+                state_index[state] = len(abbrs)
+                abbrs.append(state)
+                state_names.append(None)
+                state_pops.append(NO_POPULATION)
+            columns['zip'][i] = number
+            columns['city'][i] = cities.setdefault(city, len(cities)) if city and city == city else -1
+            columns['county'][i] = counties.setdefault(county, len(counties)) if county and county == county else -1
+            columns['state'][i] = state_index[state] if state else -1
+            columns['pop'][i] = int(pop) if pop is not None and pop == pop else NO_POPULATION
+
+        staging = f'{directory}.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        columns['index'] = np.full(ZIP_SPACE, -1, dtype=np.int32)
+        columns['index'][columns['zip']] = np.arange(len(columns['zip']), dtype=np.int32)
+        for name, array in columns.items():
+            np.save(os.path.join(staging, f'{name}.npy'), array)
+        with open(os.path.join(staging, 'names.json'), 'w', encoding='utf-8') as file:
+            json.dump({ 'cities': list(cities), 'counties': list(counties), 'states': abbrs, 'state_names': state_names, 'state_pops': state_pops }, file)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+        return cls(directory)
+
+    @classmethod
+    def from_collections(cls, directory: str = None) -> 'RegionTable':
+        """Build from the region.zipcodes and region.states collections."""
+        from connection.database import Database
+        region = Database.CLIENT['region']
+        zipcodes = region['zipcodes'].find({}, { '_id': 0, 'zip': 1, 'city': 1, 'county': 1, 'pop': 1 })
+        states = region['states'].find({}, { '_id': 0, 'state': 1, 'abbr': 1, 'pop': 1 })
+        return cls.build(zipcodes, states, directory)
+
+    @classmethod
+    def from_sheet(cls, directory: str = None) -> 'RegionTable':
+        """Build from the worksheets declared for region.zipcodes and region.states in settings.toml."""
+        from ingestion.pipeline import get_jobs, read_excel
+        def records(collection: str) -> List[Dict[str, Any]]:
+            frame = read_excel(get_jobs('region', collection)[0])
+            return frame.rename(columns=lambda column: { 'zipcode': 'zip', 'population': 'pop', 'abbreviation': 'abbr' }.get(str(column).lower(), str(column).lower())).to_dict('records')
+        return cls.build(records('zipcodes'), records('states'), directory)
+
+    @classmethod
+    def open(cls, directory: str = None) -> 'RegionTable':
+        """
+        Open the table configured by geocoder.regions.
+        :raises FileNotFoundError: Raised if the table has not been built.
+        """
+        return cls(directory if directory else settings.get('geocoder', {}).get('regions', '.cache/regions'))
+
+    ###########################
+    # LOOKUPS
+    ###########################
+
+    def rows(self, zipcodes: Any) -> np.ndarray:
+        """
+        Find the table row of each zip code.
+        :returns: int32 array of row indices, -1 where the zip code is unknown.
+        """
+        return self.arrays['index'][to_zip_array(zipcodes)]
+
+    def lookup_many(self, zipcodes: Any) -> Dict[str, np.ndarray]:
+        """
+        Look up many zip codes at once.
+        :returns: Dict of zip (uint32, 0 if unknown), city, county, state, state_name, pop and state_pop arrays. Unknown zips have None/-1 entries.
+        """
+        rows = self.rows(zipcodes)
+        found = rows >= 0
+        index = np.where(found, rows, 0)
+        def column(name: str, missing: int) -> np.ndarray:
+            return np.where(found, self.arrays[name][index], missing) if len(self) else np.full(len(rows), missing)
+        states = column('state', -1)
+        return {
+            'zip': column('zip', 0),
+            'city': self.cities[column('city', -1)],
+            'county': self.counties[column('county', -1)],
+            'state': self.states[states],
+            'state_name': self.state_names[states],
+            'pop': column('pop', NO_POPULATION),
+            'state_pop': self.state_pops[states],
+        }
+
+    def lookup(self, zipcode: Any) -> Optional[Dict[str, Any]]:
+        """
+        Look up a single zip code.
+        :returns: Dict of zip, city, county, state, state_name, pop and state_pop. None if the zip code is unknown.
+        """
+        number = int(zipcode) if isinstance(zipcode, (int, np.integer)) and 0 <= zipcode < ZIP_SPACE else format_zip(zipcode)
+        row = int(self.arrays['index'][int(number)]) if number else -1
+        if row < 0:
+            return None
+        state = int(self.arrays['state'][row])
+        return {
+            'zip': f'{int(number):05d}',
+            'city': self.cities[self.arrays['city'][row]],
+            'county': self.counties[self.arrays['county'][row]],
+            'state': self.states[state],
+            'state_name': self.state_names[state],
+            'pop': int(self.arrays['pop'][row]),
+            'state_pop': int(self.state_pops[state]),
+        }
+
+    def enrich(self, frame: Any, column: str = 'address.zipcode', prefix: str = 'address.', overwrite: bool = False) -> Any:
+        """
+        Fill the city, county and state columns of a DataFrame from its zip code column (in place).
+        Existing values are kept unless overwrite is set.
+        :returns: The enriched DataFrame.
+        """
+        import pandas as pd
+        values = self.lookup_many(frame[column])
+        for name in ('city', 'county', 'state'):
+            target = f'{prefix}{name}'
+            if overwrite or target not in frame.columns:
+                frame[target] = values[name]
+            else:
+                frame[target] = frame[target].where(frame[target].notna(), pd.Series(values[name], index=frame.index))
+        return frame
+
+###########################
+# SCRIPT
+###########################
+
+if __name__ == '__main__':
+
+    # Application related libraries.
+    from connection.database import Database
+
+    # Initialize the database and build the table.
+    Database.initialize(Database.make_options(
+        hostname=settings.db.auth.hostname,
+        username=settings.db.auth.username,
+        password=settings.db.auth.password,
+        port=settings.db.auth.port,
+    ))
+    table = RegionTable.from_collections()
+    print(f"Wrote {len(table)} zip code(s) to {table.directory}.")
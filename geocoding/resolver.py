@@ -0,0 +1,153 @@
+# resolver.py
+# Author: Ian Effendi
+#
+# Rate-limit-aware batch geocoding in front of the persistent cache.
+#
+# Queries are normalized and merged before dispatch, answered from the cache when possible,
+# and the remaining unique lookups are started at most once every `min_delay_seconds`
+# while up to `max_in_flight` of them wait on the service concurrently.
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from config import settings
+from geocoding.cache import GeocodeCache, Place, address_key, point_key
+from geocoding.offline import needs_street
+
+Query = Union[str, Dict[str, Any]]
+
+def get_geocoder() -> Any:
+    """
+    Make the remote Nominatim geocoder, identified by the application name and version.
+    :returns: geopy.geocoders.Nominatim
+    """
+    from geopy.geocoders import Nominatim
+    return Nominatim(user_agent=f"{settings.app.name}@{settings.app.version}")
+
+class RateGate:
+    """Hands out request start times spaced at least `delay` seconds apart, across threads."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next = 0.0
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next)
+            self.next = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+class Resolver:
+    """
+    Batch geocoder. `geocoder` is any object with geopy-style geocode(query) and reverse(point) methods,
+    so tests can substitute a local stub for Nominatim.
+    """
+
+    def __init__(self, geocoder: Any = None, cache: GeocodeCache = None, min_delay_seconds: float = None,
+                 max_in_flight: int = None, retries: int = None, offline: Any = None):
+        config = settings.get('geocoder', {})
+        self.geocoder = geocoder
+        self.offline = offline
+        self.cache = cache if cache else GeocodeCache()
+        self.min_delay_seconds = min_delay_seconds if min_delay_seconds is not None else config.get('min_delay_seconds', 1)
+        self.max_in_flight = max_in_flight if max_in_flight else config.get('max_in_flight', 4)
+        self.retries = retries if retries is not None else config.get('retries', 2)
+        self.stats = { 'queries': 0, 'unique': 0, 'offline': 0, 'hits': 0, 'calls': 0, 'errors': 0 }
+        self.lock = threading.Lock()
+
+    def get_geocoder(self) -> Any:
+        if self.geocoder is None:
+            self.geocoder = get_geocoder()
+        return self.geocoder
+
+    def attempt(self, gate: RateGate, call: Callable[[], Any]) -> Any:
+        """
+        Run one remote lookup through the rate gate, retrying failures.
+        :returns: Place, None if the service found nothing, or the last exception if every attempt failed.
+        """
+        error = None
+        for _ in range(self.retries + 1):
+            gate.wait()
+            try:
+                with self.lock:
+                    self.stats['calls'] += 1
+                return Place.from_location(call())
+            except Exception as e:
+                error = e
+        return error
+
+    def dispatch(self, calls: Dict[str, Callable[[], Any]]) -> Dict[str, Optional[Place]]:
+        """
+        Resolve unique keys: cached keys are returned directly, the rest are called remotely and cached.
+        Keys whose lookups raise are left out of the cache so a later run retries them.
+        :returns: Dict of key to Place (or None).
+        """
+        results = self.cache.get_many(calls.keys())
+        self.stats['hits'] += len(results)
+        pending = [ key for key in calls if key not in results ]
+        if not pending:
+            return results
+
+        gate = RateGate(self.min_delay_seconds)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            outcomes = dict(zip(pending, executor.map(lambda key: self.attempt(gate, calls[key]), pending)))
+        resolved = {}
+        for key, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                self.stats['errors'] += 1
+                results[key] = None
+            else:
+                resolved[key] = outcome
+        self.cache.set_many(resolved)
+        results.update(resolved)
+        return results
+
+    def geocode(self, queries: List[Union[Query, List[Query]]], **kwargs: Any) -> List[Optional[Place]]:
+        """
+        Forward geocode a batch. Each entry is a query or a list of fallback queries tried in order
+        (eg. full address, then city, then postal code). Every round merges duplicate queries across the batch.
+        Queries without a street line are answered by the offline geocoder first, when one is configured.
+        :returns: List of Place (or None), aligned with queries.
+        """
+        candidates = [ list(query) if isinstance(query, (list, tuple)) else [ query ] for query in queries ]
+        results: List[Optional[Place]] = [ None ] * len(candidates)
+        pending = [ i for i, options in enumerate(candidates) if options ]
+        depth = 0
+        while pending:
+            calls, local = {}, {}
+            for i in pending:
+                query = candidates[i][depth]
+                key = address_key(query)
+                self.stats['queries'] += 1
+                if self.offline is not None and not needs_street(query):
+                    if key not in local:
+                        local[key] = self.offline.geocode(query)
+                    if local[key] is not None:
+                        continue
+                calls.setdefault(key, lambda query=query: self.get_geocoder().geocode(query, **kwargs))
+            self.stats['unique'] += len(calls)
+            self.stats['offline'] += sum(1 for place in local.values() if place is not None)
+            places = { **self.dispatch(calls), **{ key: place for key, place in local.items() if place is not None } } if calls else local
+            for i in pending:
+                results[i] = places.get(address_key(candidates[i][depth]))
+            depth += 1
+            pending = [ i for i in pending if results[i] is None and depth < len(candidates[i]) ]
+        return results
+
+    def reverse(self, points: List[Any], **kwargs: Any) -> List[Optional[Place]]:
+        """
+        Reverse geocode a batch of (latitude, longitude) points. Duplicate points are looked up once.
+        :returns: List of Place (or None), aligned with points.
+        """
+        keys = [ point_key(point) for point in points ]
+        self.stats['queries'] += len(keys)
+        calls = {}
+        for key, point in zip(keys, points):
+            calls.setdefault(key, lambda point=point: self.get_geocoder().reverse(point if not hasattr(point, 'latitude') else (point.latitude, point.longitude), **kwargs))
+        self.stats['unique'] += len(calls)
+        places = self.dispatch(calls)
+        return [ places.get(key) for key in keys ]
@@ -0,0 +1,39 @@
+# __main__.py
+# Author: Ian Effendi
+#
+# Command line entry point: python -m ingestion [options]
+import sys
+import argparse
+
+from config import settings
+from connection.database import Database
+from ingestion.pipeline import ingest
+
+argparser = argparse.ArgumentParser(prog="ingestion", description="Bulk load the db.databases sources declared in settings.toml into MongoDB.")
+argparser.add_argument('-d', '--database', metavar='DATABASE', default=None,
+                       help="Only ingest sources for this database.")
+argparser.add_argument('-c', '--collection', metavar='COLLECTION', default=None,
+                       help="Only ingest sources for this collection.")
+argparser.add_argument('-b', '--batch-size', metavar='N', dest='batch_size', type=int, default=None,
+                       help="Rows per bulk write, defaults to ingestion.batch_size.")
+argparser.add_argument('-w', '--workers', metavar='N', type=int, default=None,
+                       help="Sources ingested in parallel, defaults to ingestion.workers.")
+argparser.add_argument('--restart', action='store_true', default=False,
+                       help="Discard the checkpoint and reload every source from scratch.")
+argparser.add_argument('-D', '--dry', action='store_true', default=False,
+                       help="Read and transform sources without writing to the database.")
+
+if __name__ == '__main__':
+    cargs = argparser.parse_args()
+    if not cargs.dry:
+        Database.initialize(Database.make_options(
+            hostname=settings.db.auth.hostname,
+            username=settings.db.auth.username,
+            password=settings.db.auth.password,
+            port=settings.db.auth.port,
+        ))
+    reports = ingest(database=cargs.database, collection=cargs.collection, batch_size=cargs.batch_size,
+                     workers=cargs.workers, restart=cargs.restart, dryrun=cargs.dry)
+    for report in reports:
+        print(report)
+    sys.exit(1 if any(report.status == "failed" for report in reports) else 0)
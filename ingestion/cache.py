@@ -0,0 +1,104 @@
+# cache.py
+# Author: Ian Effendi
+#
+# Columnar on-disk cache for the Excel source workbooks.
+#
+# Each (workbook, sheet, fields) is parsed with openpyxl once and stored as an uncompressed
+# Arrow IPC (Feather v2) file, which later loads memory-map instead of re-parsing.
+# Entries are keyed on the workbook's modification time and size (or content hash),
+# so a changed workbook is re-converted on its next load.
+import os
+import glob
+import hashlib
+from typing import Any, Union
+
+import pandas as pd
+
+from config import settings
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+def get_cache_dir() -> str:
+    return settings.get('cache', {}).get('dir', '.cache/sources')
+
+def fingerprint(path: str, content: bool = False) -> str:
+    """
+    Identify the current version of a workbook.
+    :returns: Hex digest of the file contents if content is True; otherwise of its modification time and size.
+    """
+    digest = hashlib.sha1()
+    if content:
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    else:
+        stat = os.stat(path)
+        digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def get_entry(path: str, sheet_name: Union[str, int] = 0, usecols: Any = None, **kwargs: Any) -> str:
+    """
+    Name the cache entry for a worksheet selection, independent of the workbook version.
+    :returns: str prefix shared by every version of this entry.
+    """
+    options = repr((os.path.abspath(path), sheet_name, usecols or None, sorted(kwargs.items())))
+    key = hashlib.sha1(options.encode('utf-8')).hexdigest()[:16]
+    return f"{os.path.basename(path)}.{sheet_name}.{key}"
+
+def get_cache_path(path: str, sheet_name: Union[str, int] = 0, usecols: Any = None, content: bool = False, **kwargs: Any) -> str:
+    """
+    Get the cache file for the current version of a worksheet selection.
+    :returns: Path to the *.feather file (which may not exist yet).
+    """
+    entry = get_entry(path, sheet_name, usecols, **kwargs)
+    return os.path.join(get_cache_dir(), f"{entry}.{fingerprint(path, content)}.feather")
+
+def to_columnar(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make a frame storable as Arrow columns: string column names, and mixed-type object columns as strings.
+    """
+    frame = frame.copy()
+    frame.columns = [ str(column) for column in frame.columns ]
+    for column in frame.columns:
+        if frame[column].dtype == object and pd.api.types.infer_dtype(frame[column], skipna=True).startswith('mixed'):
+            frame[column] = frame[column].map(lambda value: value if pd.isna(value) else str(value))
+    return frame.reset_index(drop=True)
+
+def read_excel(path: str, sheet_name: Union[str, int] = 0, usecols: Any = None, refresh: bool = False, content: bool = False, **kwargs: Any) -> pd.DataFrame:
+    """
+    Drop-in for pd.read_excel() on a single sheet, served from the columnar cache when it is current.
+    :param refresh: Re-convert the worksheet even if a current cache entry exists.
+    :param content: Key the cache on a hash of the workbook contents instead of its modification time and size.
+    :returns: pd.DataFrame.
+    """
+    usecols = (usecols if isinstance(usecols, str) else list(usecols)) if usecols else None
+    if feather is None:
+        return pd.read_excel(path, sheet_name=sheet_name, usecols=usecols, **kwargs)
+
+    target = get_cache_path(path, sheet_name, usecols, content=content, **kwargs)
+    if not refresh and os.path.exists(target):
+        return feather.read_feather(target, memory_map=True)
+
+    frame = to_columnar(pd.read_excel(path, sheet_name=sheet_name, usecols=usecols, **kwargs))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    for stale in glob.glob(os.path.join(get_cache_dir(), glob.escape(get_entry(path, sheet_name, usecols, **kwargs)) + '.*.feather')):
+        os.remove(stale)
+    temp = target + '.tmp'
+    feather.write_feather(frame, temp, compression='uncompressed')
+    os.replace(temp, target)
+    return frame
+
+def clear(path: str = None) -> int:
+    """
+    Remove cache entries, for one workbook or (if path is None) all of them.
+    :returns: Number of files removed.
+    """
+    pattern = (glob.escape(os.path.basename(path)) + '.*.feather') if path else '*.feather'
+    removed = 0
+    for entry in glob.glob(os.path.join(get_cache_dir(), pattern)):
+        os.remove(entry)
+        removed += 1
+    return removed
@@ -0,0 +1,205 @@
+# census.py
+# Author: Ian Effendi
+#
+# Typed loader for the ACS S1810 (disability characteristics) census tables in data/census.
+#
+# The data CSV has a second header row of labels, "(X)"/"N"/"**" style placeholders and pairs every
+# estimate column (...E) with a margin of error column (...M). The loader decodes the column hierarchy
+# from the _metadata_ file, parses every value to float64 (placeholders become NaN), and keeps estimates
+# and margins as parallel (geography x variable) arrays. The parsed table is joined to region.states and
+# cached as uncompressed Feather next to the source cache, so later loads memory-map instead of parsing CSV.
+import os
+import glob
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import settings
+from ingestion.cache import fingerprint, get_cache_dir
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# Label path separator used by the metadata file, eg. 'Estimate!!With a disability!!Total ...'.
+SEPARATOR = '!!'
+
+# Percent with a disability, of the total civilian noninstitutionalized population.
+PREVALENCE = 'S1810_C03_001'
+POPULATION = 'S1810_C01_001'
+DISABLED = 'S1810_C02_001'
+
+def get_census_files() -> Dict[str, str]:
+    """
+    Find the latest S1810 data and metadata files matching census.data and census.metadata.
+    :raises FileNotFoundError: Raised if either file is missing.
+    :returns: Dict of 'data' and 'metadata' paths.
+    """
+    config = settings.get('census', {})
+    files = {}
+    for name, default in (('data', 'data/census/ACSST1Y2019.S1810_data_with_overlays_*.csv'), ('metadata', 'data/census/ACSST1Y2019.S1810_metadata_*.csv')):
+        matches = sorted(glob.glob(config.get(name, default)))
+        if not matches:
+            raise FileNotFoundError(f"No census {name} file matches '{config.get(name, default)}'.")
+        files[name] = matches[-1]
+    return files
+
+def read_metadata(path: str) -> Dict[str, List[str]]:
+    """
+    Decode the column hierarchy of the metadata file.
+    :returns: Dict of variable code (without the E/M suffix) to its label path, eg. ['With a disability', 'Total civilian ...'].
+    """
+    variables = {}
+    for code, label in pd.read_csv(path, header=None, dtype=str).itertuples(index=False):
+        if code.endswith('E') and label.startswith('Estimate' + SEPARATOR):
+            variables[code[:-1]] = label.split(SEPARATOR)[1:]
+    return variables
+
+def to_numeric(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Parse ACS cells to float64: thousands separators and open-ended median markers ('250,000+', '2,500-')
+    are stripped; placeholders ('(X)', 'N', '-', '**', '***', '*****') become NaN.
+    :returns: float64 array shaped like frame.
+    """
+    cleaned = frame.apply(lambda column: column.str.replace(r'[,+]|(?<=\d)-$', '', regex=True))
+    return cleaned.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+def get_fips(geo_id: Any) -> Optional[str]:
+    """
+    Get the FIPS code of a GEO_ID, eg. '0400000US36' -> '36'.
+    :returns: None for national (or malformed) ids.
+    """
+    fips = str(geo_id).partition('US')[2]
+    return fips if fips else None
+
+class CensusTable:
+    """ACS S1810 estimates and margins of error as parallel float64 arrays, one row per geography."""
+
+    def __init__(self, geography: pd.DataFrame, variables: Dict[str, List[str]], estimates: np.ndarray, margins: np.ndarray):
+        self.geography = geography.reset_index(drop=True)
+        self.variables = variables
+        self.codes = list(variables)
+        self.columns = { code: i for i, code in enumerate(self.codes) }
+        self.estimates = estimates
+        self.margins = margins
+
+    def __len__(self) -> int:
+        return len(self.geography)
+
+    ###########################
+    # LOADING
+    ###########################
+
+    @classmethod
+    def from_csv(cls, data: str, metadata: str, states: Iterable[Dict[str, Any]] = ()) -> 'CensusTable':
+        """
+        Parse the data CSV (skipping its label row) with the metadata file, and join each row to region.states
+        by FIPS code or name.
+        :returns: Parsed CensusTable.
+        """
+        variables = read_metadata(metadata)
+        frame = pd.read_csv(data, skiprows=[ 1 ], dtype=str, keep_default_na=False)
+        variables = { code: label for code, label in variables.items() if f'{code}E' in frame.columns }
+        geography = pd.DataFrame({ 'geo_id': frame['GEO_ID'], 'name': frame['NAME'], 'fips': frame['GEO_ID'].map(get_fips) })
+        by_fips, by_name = {}, {}
+        for state in states:
+            code = state.get('code')
+            if code is not None and code == code:
+                by_fips[str(int(float(code))).zfill(2)] = state
+            if state.get('state'):
+                by_name[str(state['state']).strip().lower()] = state
+        matches = [ by_fips.get(fips) or by_name.get(str(name).strip().lower()) or {} for fips, name in zip(geography['fips'], geography['name']) ]
+        geography['state'] = [ match.get('abbr') for match in matches ]
+        geography['pop'] = [ match.get('pop') for match in matches ]
+        estimates = to_numeric(frame[[ f'{code}E' for code in variables ]])
+        margins = to_numeric(frame[[ f'{code}M' if f'{code}M' in frame.columns else f'{code}E' for code in variables ]])
+        margins[:, [ i for i, code in enumerate(variables) if f'{code}M' not in frame.columns ]] = np.nan
+        return cls(geography, variables, estimates, margins)
+
+    @classmethod
+    def load(cls, states: Iterable[Dict[str, Any]] = None, refresh: bool = False) -> 'CensusTable':
+        """
+        Load the configured census table from the cache, parsing and caching it if the data file changed.
+        :param states: region.states rows to join; read from the database when None and the cache is stale.
+        :returns: CensusTable.
+        """
+        files = get_census_files()
+        target = os.path.join(get_cache_dir(), f"{os.path.basename(files['data'])}.{fingerprint(files['data'])}.feather")
+        if feather is not None and not refresh and os.path.exists(target):
+            return cls.from_frame(feather.read_feather(target, memory_map=True))
+        if states is None:
+            from connection.database import Database
+            states = Database.CLIENT['region']['states'].find({}, { '_id': 0, 'state': 1, 'abbr': 1, 'code': 1, 'pop': 1 })
+        table = cls.from_csv(files['data'], files['metadata'], states)
+        if feather is not None:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            for stale in glob.glob(os.path.join(get_cache_dir(), glob.escape(os.path.basename(files['data'])) + '.*.feather')):
+                os.remove(stale)
+            temp = target + '.tmp'
+            feather.write_feather(table.to_frame(), temp, compression='uncompressed')
+            os.replace(temp, target)
+        return table
+
+    ###########################
+    # CONVERSIONS
+    ###########################
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Convert to one wide frame: geography columns, then <code>E and <code>M float64 columns.
+        The label paths are kept in frame.attrs['variables'] (and the Feather schema metadata).
+        """
+        values = {}
+        for code, i in self.columns.items():
+            values[f'{code}E'] = self.estimates[:, i]
+            values[f'{code}M'] = self.margins[:, i]
+        frame = pd.concat([ self.geography, pd.DataFrame(values) ], axis=1)
+        frame.attrs['variables'] = json.dumps(self.variables)
+        return frame
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'CensusTable':
+        """Rebuild from to_frame() output."""
+        variables = json.loads(frame.attrs['variables'])
+        geography = frame[[ 'geo_id', 'name', 'fips', 'state', 'pop' ]]
+        estimates = frame[[ f'{code}E' for code in variables ]].to_numpy(dtype=np.float64)
+        margins = frame[[ f'{code}M' for code in variables ]].to_numpy(dtype=np.float64)
+        return cls(geography, variables, estimates, margins)
+
+    ###########################
+    # ACCESS
+    ###########################
+
+    def find(self, *labels: str) -> List[str]:
+        """
+        Find the variables whose label path contains every label (case insensitive), eg. find('With a disability', 'Male').
+        :returns: List of variable codes.
+        """
+        labels = [ label.lower() for label in labels ]
+        return [ code for code, path in self.variables.items() if all(any(label == part.lower() for part in path) for label in labels) ]
+
+    def estimate(self, code: str) -> np.ndarray:
+        """Get the estimates of a variable, one per geography (NaN where not available)."""
+        return self.estimates[:, self.columns[code.rstrip('EM') if code not in self.columns else code]]
+
+    def margin(self, code: str) -> np.ndarray:
+        """Get the 90% margins of error of a variable, one per geography (NaN where not available)."""
+        return self.margins[:, self.columns[code.rstrip('EM') if code not in self.columns else code]]
+
+    def prevalence(self) -> pd.DataFrame:
+        """
+        Get per-state disability prevalence, indexed by state code (rows not joined to a state are dropped).
+        :returns: DataFrame of percent, percent_moe, disabled, disabled_moe and population.
+        """
+        frame = pd.DataFrame({
+            'state': self.geography['state'],
+            'percent': self.estimate(PREVALENCE),
+            'percent_moe': self.margin(PREVALENCE),
+            'disabled': self.estimate(DISABLED),
+            'disabled_moe': self.margin(DISABLED),
+            'population': self.estimate(POPULATION),
+        })
+        return frame.dropna(subset=[ 'state' ]).set_index('state')
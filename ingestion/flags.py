@@ -0,0 +1,139 @@
+# flags.py
+# Author: Ian Effendi
+#
+# Y/N service-flag columns (eg. the DDSO service provider sheet) encoded as a packed bitmap.
+#
+# The flag columns are read once into a boolean matrix and packed eight flags per byte, one row
+# per provider, over a shared keyword vocabulary. Filters such as "providers offering X and Y"
+# are a bitwise AND against a packed mask; keyword lists are only decoded when documents are written.
+import re
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Cell values counted as a set flag (compared upper-cased and stripped).
+TRUTHY = ('Y', 'YES', 'TRUE', '1', 'X')
+
+def normalize_keyword(name: Any) -> str:
+    """
+    Make a keyword from a flag column header, eg. 'Individual Support Services (ISSs)' -> 'INDIVIDUAL SUPPORT SERVICES ISS'.
+    :returns: str, empty if name is blank.
+    """
+    if name is None:
+        return ''
+    name = re.sub('s[)]', ')', str(name).strip())
+    name = re.sub('[({})]', '', name.upper())
+    return ' '.join(name.split())
+
+def column_index(letters: str) -> int:
+    """
+    Convert an Excel column (eg. 'A', 'K', 'AB') to a zero-based index.
+    :raises ValueError: Raised if letters is not a column name.
+    """
+    letters = letters.strip().upper()
+    if not letters.isalpha():
+        raise ValueError(f"Invalid column '{letters}'.")
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index - 1
+
+def column_range(spec: str, origin: str = None) -> List[int]:
+    """
+    Convert an Excel column range (eg. 'K:U' or 'K,M,O:P') into frame positions.
+    Positions are relative to origin, the first column read (eg. 'A' for fields="A:V").
+    :returns: List of zero-based positions.
+    """
+    offset = column_index(origin.split(':')[0].split(',')[0]) if origin else 0
+    positions = []
+    for part in spec.split(','):
+        first, _, last = part.partition(':')
+        start, stop = column_index(first), column_index(last if last else first)
+        positions.extend(position - offset for position in range(start, stop + 1))
+    return positions
+
+class FlagMatrix:
+    """Packed bitmap of boolean flags, one row per document, over a shared vocabulary."""
+
+    def __init__(self, bits: np.ndarray, vocabulary: Sequence[str]):
+        self.bits = bits
+        self.vocabulary = list(vocabulary)
+        self.positions = { keyword: i for i, keyword in enumerate(self.vocabulary) }
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, columns: Sequence[Union[int, str]], vocabulary: Sequence[str] = None,
+                   truthy: Iterable[str] = TRUTHY) -> 'FlagMatrix':
+        """
+        Encode flag columns (given by name or position) in one vectorized pass.
+        The vocabulary defaults to the normalized column headers.
+        :returns: FlagMatrix.
+        """
+        names = [ frame.columns[column] if isinstance(column, int) else column for column in columns ]
+        if vocabulary is None:
+            vocabulary = [ normalize_keyword(name) for name in names ]
+        values = frame[names].fillna('').astype(str).to_numpy(dtype=str)
+        matrix = np.isin(np.char.upper(np.char.strip(values)), list(truthy))
+        return cls(np.packbits(matrix, axis=1), vocabulary)
+
+    def __len__(self) -> int:
+        return self.bits.shape[0]
+
+    def __getitem__(self, rows: Union[slice, np.ndarray]) -> 'FlagMatrix':
+        return FlagMatrix(self.bits[rows], self.vocabulary)
+
+    def mask(self, keywords: Iterable[str]) -> np.ndarray:
+        """
+        Pack a set of keywords into a row mask.
+        :raises KeyError: Raised if a keyword is not in the vocabulary.
+        """
+        row = np.zeros(len(self.vocabulary), dtype=bool)
+        for keyword in keywords:
+            row[self.positions[normalize_keyword(keyword)]] = True
+        return np.packbits(row)
+
+    def having_all(self, keywords: Iterable[str]) -> np.ndarray:
+        """
+        Select the rows with every keyword set.
+        :returns: Boolean array, one entry per row.
+        """
+        mask = self.mask(keywords)
+        return np.all((self.bits & mask) == mask, axis=1)
+
+    def having_any(self, keywords: Iterable[str]) -> np.ndarray:
+        """
+        Select the rows with at least one keyword set.
+        :returns: Boolean array, one entry per row.
+        """
+        return np.any(self.bits & self.mask(keywords), axis=1)
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Count the rows flagged for each keyword.
+        :returns: Dict of keyword to count.
+        """
+        totals = self.unpack().sum(axis=0)
+        return { keyword: int(total) for keyword, total in zip(self.vocabulary, totals) }
+
+    def unpack(self) -> np.ndarray:
+        return np.unpackbits(self.bits, axis=1, count=len(self.vocabulary)).astype(bool)
+
+    def to_keywords(self) -> List[List[str]]:
+        """
+        Decode every row into its (sorted) keyword list.
+        :returns: List of keyword lists, one per row.
+        """
+        vocabulary = np.array(self.vocabulary, dtype=object)
+        order = np.argsort(vocabulary)
+        matrix = self.unpack()[:, order]
+        vocabulary = vocabulary[order]
+        return [ list(vocabulary[row]) for row in matrix ]
+
+def encode_flags(frame: pd.DataFrame, columns: Sequence[Union[int, str]], vocabulary: Sequence[str] = None) -> Tuple[pd.DataFrame, FlagMatrix]:
+    """
+    Transformation stage: replace the flag columns of a frame with a FlagMatrix.
+    :returns: Tuple of (frame without the flag columns, FlagMatrix aligned with its rows).
+    """
+    names = [ frame.columns[column] if isinstance(column, int) else column for column in columns ]
+    flags = FlagMatrix.from_frame(frame, names, vocabulary)
+    return frame.drop(columns=names), flags
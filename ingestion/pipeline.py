@@ -0,0 +1,453 @@
+# pipeline.py
+# Author: Ian Effendi
+#
+# Schema-driven bulk ingestion of the db.databases sources declared in settings.toml.
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+from pymongo import UpdateOne
+
+from config import settings
+from connection.cache import invalidate
+from connection.database import Database
+from connection.schema import get_databases, get_collection, get_collections, get_sources, get_fields, get_schema, resolve
+from ingestion import cache
+from ingestion.flags import column_range, encode_flags
+from ingestion.websites import normalize_websites
+from utils.address import format_zip, to_geometry
+
+def log(message: str) -> None:
+    """Print message if settings.verbose is enabled."""
+    if message and settings.get('verbose', False):
+        print(message)
+
+###########################
+# JOBS AND REPORTS
+###########################
+
+class Job:
+    """A single worksheet (or file) of a source, destined for one collection."""
+
+    def __init__(self, database: Any, collection: Any, source: Any, worksheet: Any = None):
+        self.database = database['name']
+        self.collection = collection['name']
+        self.fields = [field for field in get_fields(collection) if field != '_id']
+        self.keys = [entry['field'] for entry in get_schema(collection) if entry.get('index') is True and entry['field'] != '_id']
+        self.geometry = [entry['field'] for entry in get_schema(collection) if entry.get('index') == '2dsphere']
+        self.name = source['name']
+        self.type = source['type']
+        self.path = os.path.join(settings.get('dirpath', './'), settings.get('datadir', 'data/'), self.name)
+        self.sheet = worksheet['name'] if worksheet else None
+        self.columns = (worksheet.get('fields') or None) if worksheet else None
+        self.flags = (worksheet.get('flags') or None) if worksheet else None
+        self.website = (worksheet.get('website') or None) if worksheet else source.get('website')
+        # Natural key of the rows of a worksheet (eg. facility and address), for sources with no indexed key fields.
+        self.natural = (worksheet.get('keys') or None) if worksheet else source.get('keys')
+
+    @property
+    def namespace(self) -> str:
+        return f"{self.database}.{self.collection}"
+
+    @property
+    def key(self) -> str:
+        return f"{self.namespace}:{self.name}" + (f"#{self.sheet}" if self.sheet else "")
+
+    def signature(self) -> str:
+        """
+        Identify the current version of the source file.
+        :returns: str of modification time and size. Empty if the file is missing.
+        """
+        try:
+            stat = os.stat(self.path)
+            return f"{stat.st_mtime_ns}:{stat.st_size}"
+        except OSError:
+            return ""
+
+class Report:
+    """Outcome and throughput of an ingestion job."""
+
+    def __init__(self, job: Job, rows: int = 0, seconds: float = 0.0, status: str = "ok", error: str = None):
+        self.job = job
+        self.rows = rows
+        self.seconds = seconds
+        self.status = status
+        self.error = error
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        message = f"[{self.status}] {self.job.key}: {self.rows} row(s) in {self.seconds:.2f}s ({self.rate:.0f} rows/s)"
+        return message + (f" - {self.error}" if self.error else "")
+
+class Checkpoint:
+    """Thread-safe record of rows written per job, persisted as JSON so interrupted runs can resume."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as file:
+                self.entries = json.load(file)
+
+    def get(self, job: Job, signature: str) -> Dict[str, Any]:
+        """
+        Get progress for a job. Progress recorded against a different version of the source is discarded.
+        :returns: Dict with 'rows' and 'done'.
+        """
+        with self.lock:
+            entry = self.entries.get(job.key, {})
+            if entry.get('signature') != signature:
+                return { 'rows': 0, 'done': False }
+            return entry
+
+    def update(self, job: Job, signature: str, rows: int, done: bool = False) -> None:
+        with self.lock:
+            self.entries[job.key] = { 'signature': signature, 'rows': rows, 'done': done }
+            if self.path:
+                temp = self.path + '.tmp'
+                with open(temp, 'w') as file:
+                    json.dump(self.entries, file, indent=2)
+                os.replace(temp, self.path)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries = {}
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+###########################
+# SOURCE READERS
+###########################
+
+def read_excel(job: Job) -> pd.DataFrame:
+    return cache.read_excel(job.path, sheet_name=job.sheet if job.sheet else 0, usecols=job.columns)
+
+def read_json(job: Job) -> pd.DataFrame:
+    with open(job.path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    return pd.json_normalize(data if isinstance(data, list) else [ data ])
+
+def read_csv(job: Job) -> pd.DataFrame:
+    return pd.read_csv(job.path, usecols=job.columns)
+
+def read_tsv(job: Job) -> pd.DataFrame:
+    return pd.read_csv(job.path, sep='\t', usecols=job.columns)
+
+# Readers by source `type`. Sources with no reader are reported as skipped.
+readers: Dict[str, Callable[[Job], pd.DataFrame]] = {
+    'excel': read_excel,
+    'json': read_json,
+    'csv': read_csv,
+    'tsv': read_tsv,
+}
+
+###########################
+# RECORD TRANSFORMS
+###########################
+
+# Field receiving the keyword list decoded from a worksheet's `flags` columns.
+KEYWORDS = 'keywords'
+
+# Record transforms, keyed by "<database>.<collection>" or, for a single worksheet, "<database>.<collection>#<worksheet>".
+transforms: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+def transform(namespace: str, worksheet: str = None) -> Callable:
+    """
+    Decorator registering a record transform for a "<database>.<collection>" namespace (or one of its worksheets).
+    Transforms receive the raw row and may return dotted field names (eg. 'address.city').
+    """
+    def register(f: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        transforms[f"{namespace}#{worksheet}" if worksheet else namespace] = f
+        return f
+    return register
+
+def get_transform(job: Job) -> Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Get the transform of a job's worksheet, falling back to its collection's.
+    :returns: None if neither is registered.
+    """
+    return transforms.get(f"{job.namespace}#{job.sheet}") or transforms.get(job.namespace)
+
+def clean_name(name: Any, fields: List[str] = None) -> str:
+    """Make a raw column name safe for use as a MongoDB field name. Declared (dotted) schema fields are kept."""
+    name = str(name).strip()
+    if fields and name in fields:
+        return name
+    return name.replace('.', '_').replace('$', '_')
+
+def prepare(frame: pd.DataFrame, job: Job) -> pd.DataFrame:
+    """
+    Name the columns of a source frame and replace missing values with None.
+    Columns are assigned to the schema fields in order when the counts match (eg. the glossary sheets);
+    otherwise (or when the worksheet declares flags or website columns) the cleaned raw column names are kept.
+    Worksheets with a registered transform keep their raw column names, for the transform to map.
+    """
+    frame = frame.dropna(how='all')
+    positional = not (job.flags or job.website) and len(frame.columns) == len(job.fields)
+    if get_transform(job) is None:
+        frame.columns = job.fields if positional else [ clean_name(column, job.fields) for column in frame.columns ]
+    return frame.astype(object).where(frame.notna(), None)
+
+def add_geometry(record: Dict[str, Any], field: str) -> Dict[str, Any]:
+    """
+    Set a GeoJSON point field (eg. 'address.geometry') from its sibling coordinates ('address.coordinates').
+    Works on nested records and on records with dotted field names.
+    """
+    parent, _, name = field.rpartition('.')
+    prefix = parent + '.' if parent else ''
+    coordinates = resolve(record, prefix + 'coordinates') or {}
+    geometry = to_geometry(record.get(prefix + 'coordinates.latitude', coordinates.get('latitude')),
+                           record.get(prefix + 'coordinates.longitude', coordinates.get('longitude')))
+    if geometry is None:
+        return record
+    container = resolve(record, parent) if parent else record
+    if isinstance(container, dict):
+        container[name] = geometry
+    else:
+        record[field] = geometry
+    return record
+
+def make_upsert(record: Dict[str, Any], keys: List[str], natural: List[str] = None, scope: str = '') -> UpdateOne:
+    """
+    Make an idempotent upsert for a record.
+    Records are matched on a hash `_id` of their natural key (scoped to their source, eg. "file#worksheet") when one is
+    declared, then on the collection's indexed fields, or else on a content hash `_id`.
+    """
+    if '_id' in record:
+        selector = { '_id': record.pop('_id') }
+    elif natural:
+        content = json.dumps([ scope, [ record.get(key) for key in natural ] ], default=str)
+        selector = { '_id': hashlib.sha1(content.encode('utf-8')).hexdigest() }
+    elif keys and all(record.get(key) is not None for key in keys):
+        selector = { key: record[key] for key in keys }
+    else:
+        content = json.dumps(record, sort_keys=True, default=str)
+        selector = { '_id': hashlib.sha1(content.encode('utf-8')).hexdigest() }
+    return UpdateOne(selector, { '$set': record }, upsert=True)
+
+def get_declared_columns(job: Job, spec: Any) -> List[Any]:
+    """
+    Get the columns declared by a worksheet option: an Excel range (eg. 'K:U', relative to the columns read) or a list of names.
+    :returns: List of column positions or names. Empty if none are declared.
+    """
+    if not spec:
+        return []
+    if isinstance(spec, str) and job.type == 'excel':
+        return column_range(spec, job.columns)
+    return [ spec ] if isinstance(spec, str) else list(spec)
+
+def batches(frame: pd.DataFrame, size: int, offset: int = 0) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Slice a frame into lists of row dicts.
+    :returns: Generator of batches, starting after `offset` rows.
+    """
+    for start in range(offset, len(frame), size):
+        yield frame.iloc[start:start + size].to_dict('records')
+
+###########################
+# PROVIDER WORKSHEETS
+###########################
+
+# "(latitude, longitude)" suffix of the location cells, eg. '43-45 CARROLL STREET\n BINGHAMTON, NY 13901\n (42.096971, -75.906545)'.
+COORDINATES_PATTERN = re.compile(r'\(\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*\)\s*$')
+
+# providers.services schema fields, read from settings.toml on first use.
+PROVIDER_FIELDS: Optional[List[str]] = None
+
+def parse_coordinates(location: Any) -> Dict[str, Optional[float]]:
+    """
+    Parse the trailing "(latitude, longitude)" of a location cell.
+    :returns: Dict of latitude and longitude, None if the cell has no coordinates.
+    """
+    match = COORDINATES_PATTERN.search(str(location)) if location is not None else None
+    return { 'latitude': float(match.group(1)), 'longitude': float(match.group(2)) } if match else { 'latitude': None, 'longitude': None }
+
+def get_provider_fields() -> List[str]:
+    global PROVIDER_FIELDS
+    if PROVIDER_FIELDS is None:
+        PROVIDER_FIELDS = [ field for field in get_fields(get_collection('providers', 'services')) if field != '_id' ] + [ KEYWORDS ]
+    return PROVIDER_FIELDS
+
+def map_columns(record: Dict[str, Any], columns: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """
+    Rename the raw columns of a row to schema fields. Columns mapped to None are dropped; unmapped columns
+    (eg. those already named after schema fields, or the info.website.* stage outputs) keep their cleaned names.
+    """
+    fields = get_provider_fields()
+    mapped = {}
+    for name, value in record.items():
+        field = columns[name] if name in columns else clean_name(name, fields)
+        if field is not None:
+            mapped[field] = value
+    if 'address.zipcode' in mapped:
+        mapped['address.zipcode'] = format_zip(mapped['address.zipcode'])
+    return mapped
+
+def strip_text(value: Any) -> Any:
+    return ' '.join(value.split()) if isinstance(value, str) else value
+
+@transform('providers.services', 'dss_service_providers')
+def transform_dss_service_providers(record: Dict[str, Any]) -> Dict[str, Any]:
+    """California DSS community service providers: one row per provider, program and service."""
+    mapped = map_columns(record, {
+        'County': 'address.county',
+        'Provider': 'facility',
+        'Address': 'address.street.line1',
+        'City': 'address.city',
+        'State': 'address.state',
+        'Zip': 'address.zipcode',
+        'Phone': 'info.phone',
+        'Website': None,
+        'Category': None,
+        'Type': None,
+        'Services': 'category.service',
+        'Latitude': 'address.coordinates.latitude',
+        'Longitude': 'address.coordinates.longitude',
+        'Location': None,
+    })
+    mapped[KEYWORDS] = list(dict.fromkeys(value for value in (record.get('Category'), record.get('Type')) if value))
+    return mapped
+
+@transform('providers.services', 'ddso_service_providers')
+def transform_ddso_service_providers(record: Dict[str, Any]) -> Dict[str, Any]:
+    """New York OPWDD service provider agencies. The service flags are already decoded into keywords."""
+    mapped = map_columns(record, {
+        'Developmental Disability Services Office': 'info.office',
+        'Service Provider Agency': 'facility',
+        'Street Address': 'address.street.line1',
+        'Street Address Line 2': 'address.street.line2',
+        'City': 'address.city',
+        'State': 'address.state',
+        'Zip Code': 'address.zipcode',
+        'Phone': 'info.phone',
+        'County': 'address.county',
+        'Website Url': None,
+        'Location 1': 'address.location',
+    })
+    coordinates = parse_coordinates(mapped.get('address.location'))
+    mapped['address.coordinates.latitude'] = coordinates['latitude']
+    mapped['address.coordinates.longitude'] = coordinates['longitude']
+    return mapped
+
+@transform('providers.services', 'ddso_discharge_facilities')
+def transform_ddso_discharge_facilities(record: Dict[str, Any]) -> Dict[str, Any]:
+    """New York DDSO discharge contacts: columns are named after schema fields, one row per facility and county served."""
+    mapped = map_columns(record, {})
+    mapped['facility'] = strip_text(mapped.get('facility'))
+    return mapped
+
+@transform('providers.services', 'ofa_service_providers')
+def transform_ofa_service_providers(record: Dict[str, Any]) -> Dict[str, Any]:
+    """New York Office for the Aging providers: columns are named after schema fields, except the street and full location."""
+    mapped = map_columns(record, {
+        'NYSOFA County Code': None,
+        'address.location': 'address.street.line1',
+        'address.location.1': 'address.location',
+    })
+    coordinates = parse_coordinates(mapped.get('address.location'))
+    mapped['address.coordinates.latitude'] = coordinates['latitude']
+    mapped['address.coordinates.longitude'] = coordinates['longitude']
+    return mapped
+
+###########################
+# PIPELINE
+###########################
+
+def get_jobs(database: str = None, collection: str = None) -> List[Job]:
+    """
+    Walk every db.databases[].collections[].sources[] entry, one job per worksheet.
+    Duplicate source declarations are only ingested once.
+    :returns: List of jobs.
+    """
+    jobs: Dict[str, Job] = {}
+    for db in get_databases():
+        if database and db['name'] != database:
+            continue
+        for coll in get_collections(db):
+            if collection and coll['name'] != collection:
+                continue
+            for source in get_sources(coll):
+                for worksheet in (source.get('worksheets') or [ None ]):
+                    job = Job(db, coll, source, worksheet)
+                    jobs.setdefault(job.key, job)
+    return list(jobs.values())
+
+def ingest_job(job: Job, checkpoint: Checkpoint, batch_size: int, dryrun: bool = False) -> Report:
+    """
+    Stream one job into its collection as batches of unordered bulk upserts.
+    :returns: Report with rows written and throughput.
+    """
+    reader = readers.get(job.type)
+    if reader is None:
+        return Report(job, status="skipped", error=f"No reader for source type '{job.type}'.")
+    signature = job.signature()
+    if not signature:
+        return Report(job, status="skipped", error=f"Source file not found: {job.path}")
+    progress = checkpoint.get(job, signature)
+    if progress['done']:
+        return Report(job, rows=progress['rows'], status="unchanged")
+
+    started = time.perf_counter()
+    written = progress['rows']
+    try:
+        frame = prepare(reader(job), job)
+        if job.website:
+            frame = normalize_websites(frame, get_declared_columns(job, job.website)[0])
+        flags = None
+        if job.flags:
+            frame, flags = encode_flags(frame, get_declared_columns(job, job.flags))
+        apply = get_transform(job)
+        scope = f"{job.name}#{job.sheet}" if job.sheet else job.name
+        target = Database.CLIENT[job.database][job.collection] if not dryrun else None
+        if written:
+            log(f"Resuming {job.key} after {written} row(s).")
+        for batch in batches(frame, batch_size, offset=written):
+            if flags is not None:
+                for record, keywords in zip(batch, flags[written:written + len(batch)].to_keywords()):
+                    record[KEYWORDS] = keywords
+            records = [ apply(record) for record in batch ] if apply else batch
+            for field in job.geometry:
+                records = [ add_geometry(record, field) for record in records if record ]
+            requests = [ make_upsert(record, job.keys, job.natural, scope) for record in records if record ]
+            if target is not None and requests:
+                target.bulk_write(requests, ordered=False)
+                invalidate(job.database, job.collection)
+            written += len(batch)
+            if not dryrun:
+                checkpoint.update(job, signature, written)
+            log(f"{job.key}: {written}/{len(frame)} row(s).")
+        if not dryrun:
+            checkpoint.update(job, signature, written, done=True)
+    except Exception as e:
+        return Report(job, rows=written - progress['rows'], seconds=time.perf_counter() - started, status="failed", error=str(e))
+    return Report(job, rows=written - progress['rows'], seconds=time.perf_counter() - started)
+
+def ingest(database: str = None, collection: str = None, batch_size: int = None, workers: int = None,
+           restart: bool = False, dryrun: bool = None, checkpoint: Union[str, Checkpoint] = None) -> List[Report]:
+    """
+    Ingest every declared source (optionally limited to a database or collection), in parallel across sources.
+    Progress is checkpointed per batch; a rerun skips unchanged sources and resumes partial ones.
+    :returns: List of reports, one per job.
+    """
+    config = settings.get('ingestion', {})
+    batch_size = batch_size if batch_size else config.get('batch_size', 1000)
+    workers = workers if workers else config.get('workers', 4)
+    dryrun = dryrun if dryrun is not None else settings.get('dryrun', False)
+    if not isinstance(checkpoint, Checkpoint):
+        checkpoint = Checkpoint(checkpoint if checkpoint else config.get('checkpoint', '.ingestion.json'))
+    if restart:
+        checkpoint.clear()
+
+    jobs = get_jobs(database, collection)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda job: ingest_job(job, checkpoint, batch_size, dryrun=dryrun), jobs))
@@ -0,0 +1,75 @@
+# websites.py
+# Author: Ian Effendi
+#
+# Website normalization stage: fills the info.website.* fields from one parse per distinct URL.
+#
+# Parses are memoized for the life of the process, so providers sharing a hostname (within or
+# across NY/CA/OH sources) are only parsed once. Each parse also yields a canonical host key
+# (lower-case, without 'www'), shared by the deduplication and crawl steps.
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import tldextract
+
+# Uses the public suffix list snapshot bundled with tldextract, so workers never fetch it over the network.
+extract = tldextract.TLDExtract(suffix_list_urls=())
+
+# info.website.* fields filled by the stage.
+FIELDS = ('url', 'subdomain', 'hostname', 'domain', 'host')
+
+# Placeholder values found in the website columns.
+BLANKS = ('', 'n/a', 'na', 'none', 'null', 'nan', '-')
+
+def clean_url(url: Any) -> Optional[str]:
+    """
+    Normalize a raw website cell for parsing and memoization (lower-case, without whitespace or stray encoding bytes).
+    :returns: None if the cell is blank or a placeholder.
+    """
+    if url is None or url != url:
+        return None
+    url = re.sub(r'[^\x21-\x7e]', '', str(url)).lower()
+    return None if url in BLANKS else url
+
+@lru_cache(maxsize=None)
+def parse_website(url: str) -> Dict[str, Optional[str]]:
+    """
+    Parse a (cleaned) URL once into every info.website.* field:
+    url (dotted host), subdomain, hostname (registered name), domain (public suffix) and host (canonical key).
+    :returns: Dict of field values. Values are None if no hostname can be extracted.
+    """
+    result = extract(url)
+    if not result.domain:
+        return dict.fromkeys(FIELDS)
+    subdomain = re.sub(r'^www\d*(\.|$)', '', result.subdomain)
+    host = '.'.join(part for part in (subdomain, result.domain, result.suffix) if part)
+    return {
+        'url': '.'.join(part for part in (result.subdomain, result.domain, result.suffix) if part),
+        'subdomain': result.subdomain,
+        'hostname': result.domain,
+        'domain': result.suffix,
+        'host': host,
+    }
+
+def host_key(url: Any) -> Optional[str]:
+    """
+    Get the canonical host key of a URL (eg. 'http://WWW.Arc.org/about' -> 'arc.org').
+    :returns: None if the URL is blank or has no hostname.
+    """
+    url = clean_url(url)
+    return parse_website(url)['host'] if url else None
+
+def normalize_websites(frame: pd.DataFrame, column: Any, prefix: str = 'info.website') -> pd.DataFrame:
+    """
+    Transformation stage: add the prefix.* website fields for a frame's website column (given by name or position).
+    Each distinct URL is parsed once; rows are then filled with dictionary lookups.
+    :returns: pd.DataFrame with the added fields.
+    """
+    name = frame.columns[column] if isinstance(column, int) else column
+    urls = frame[name].map(clean_url)
+    parsed = { url: parse_website(url) for url in urls.dropna().unique() }
+    for field in FIELDS:
+        values = { url: result[field] for url, result in parsed.items() }
+        frame[f"{prefix}.{field}"] = urls.map(values).astype(object).where(urls.notna(), None)
+    return frame
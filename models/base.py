@@ -0,0 +1,45 @@
+# base.py
+# Author: Ian Effendi
+#
+# Compact base class for the models: slotted (no per-instance __dict__) and immutable once constructed.
+from typing import Any, Tuple
+
+def _restore(cls: type, values: Tuple[Any, ...]) -> 'Model':
+    """Rebuild a pickled model without going through the (frozen) __setattr__."""
+    model = object.__new__(cls)
+    for name, value in zip(cls.__slots__, values):
+        object.__setattr__(model, name, value)
+    return model
+
+class Model:
+    """Base for slotted, frozen models. Subclasses declare __slots__ and pass every slot to __init__ by name."""
+    __slots__ = ()
+
+    def __init__(self, **values: Any):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def values(self) -> Tuple[Any, ...]:
+        """
+        Get the slot values in declaration order.
+        :returns: Tuple of values.
+        """
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and self.values() == other.values()
+
+    def __hash__(self) -> int:
+        return hash((type(self), self.values()))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (_restore, (type(self), self.values()))
@@ -0,0 +1,318 @@
+# columns.py
+# Author: Ian Effendi
+#
+# Columnar containers for large collections of models (eg. the national zipcode table or the provider corpus).
+#
+# Each field is held in a typed numpy array instead of one object and one dict per row: repeated strings
+# (cities, counties, services, keywords) are dictionary-encoded, unique strings share one UTF-8 buffer,
+# and numbers use fixed-width integers or floats with a sentinel for missing values.
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+def missing(value: Any) -> bool:
+    """Check for None and NaN (pandas' placeholder for empty cells)."""
+    return value is None or (isinstance(value, float) and value != value)
+
+def smallest(count: int) -> np.dtype:
+    """Get the smallest signed integer type holding codes in [-1, count)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if count <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+###########################
+# COLUMNS
+###########################
+
+class Categorical:
+    """Dictionary-encoded strings: one small integer code per row and one copy of each distinct value."""
+
+    def __init__(self, codes: np.ndarray, categories: List[Any]):
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> 'Categorical':
+        index: Dict[Any, int] = {}
+        codes = [ -1 if missing(value) else index.setdefault(value, len(index)) for value in values ]
+        return cls(np.array(codes, dtype=smallest(len(index))), list(index))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def get(self, i: int) -> Any:
+        code = self.codes[i]
+        return None if code < 0 else self.categories[code]
+
+    def tolist(self) -> List[Any]:
+        # Code -1 selects the trailing None.
+        return np.array([ *self.categories, None ], dtype=object)[self.codes].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+class Texts:
+    """Mostly unique strings packed into one UTF-8 buffer with row offsets."""
+
+    def __init__(self, buffer: bytes, offsets: np.ndarray, mask: np.ndarray):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.mask = mask
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> 'Texts':
+        encoded = [ None if missing(value) else str(value).encode('utf-8') for value in values ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([ len(value) if value else 0 for value in encoded ], out=offsets[1:])
+        return cls(b''.join(value for value in encoded if value), offsets, np.array([ value is None for value in encoded ], dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.mask)
+
+    def get(self, i: int) -> Optional[str]:
+        return None if self.mask[i] else self.buffer[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    def tolist(self) -> List[Optional[str]]:
+        offsets = self.offsets.tolist()
+        return [ None if absent else self.buffer[offsets[i]:offsets[i + 1]].decode('utf-8') for i, absent in enumerate(self.mask.tolist()) ]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.nbytes + self.mask.nbytes
+
+class Integers:
+    """Fixed-width integers; the type's minimum value marks a missing entry."""
+    dtype = np.dtype(np.int32)
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    @classmethod
+    def parse(cls, value: Any) -> Optional[int]:
+        try:
+            return None if missing(value) else int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> 'Integers':
+        sentinel = np.iinfo(cls.dtype).min
+        parsed = (cls.parse(value) for value in values)
+        return cls(np.array([ sentinel if value is None else value for value in parsed ], dtype=cls.dtype))
+
+    def format(self, value: int) -> Any:
+        return value
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, i: int) -> Any:
+        value = int(self.values[i])
+        return None if value == np.iinfo(self.dtype).min else self.format(value)
+
+    def tolist(self) -> List[Any]:
+        sentinel = np.iinfo(self.dtype).min
+        return [ None if value == sentinel else self.format(value) for value in self.values.tolist() ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+class Zipcodes(Integers):
+    """Five-digit zip codes stored as integers (leading zeros restored on read, ZIP+4 suffixes dropped)."""
+
+    @classmethod
+    def parse(cls, value: Any) -> Optional[int]:
+        if missing(value):
+            return None
+        digits = str(value).strip().split('-')[0].split('.')[0]
+        return int(digits) if digits.isdigit() and len(digits) <= 5 else None
+
+    def format(self, value: int) -> str:
+        return f"{value:05d}"
+
+class Floats:
+    """Floats (eg. coordinates, kept at full precision); NaN marks a missing entry."""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> 'Floats':
+        return cls(np.array([ np.nan if missing(value) else float(value) for value in values ], dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, i: int) -> Optional[float]:
+        value = float(self.values[i])
+        return None if value != value else value
+
+    def tolist(self) -> List[Optional[float]]:
+        return [ None if value != value else value for value in self.values.tolist() ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+class Lists:
+    """Variable-length lists of repeated strings (eg. keywords): dictionary-encoded items with row offsets."""
+
+    def __init__(self, items: Categorical, offsets: np.ndarray):
+        self.items = items
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> 'Lists':
+        items, offsets = [], [ 0 ]
+        for value in values:
+            if isinstance(value, str):
+                items.append(value)
+            elif not missing(value):
+                items.extend(value)
+            offsets.append(len(items))
+        return cls(Categorical.from_values(items), np.array(offsets, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, i: int) -> List[Any]:
+        return [ self.items.get(j) for j in range(self.offsets[i], self.offsets[i + 1]) ]
+
+    def tolist(self) -> List[List[Any]]:
+        items, offsets = self.items.tolist(), self.offsets.tolist()
+        return [ items[start:end] for start, end in zip(offsets, offsets[1:]) ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.items.nbytes + self.offsets.nbytes
+
+###########################
+# TABLE
+###########################
+
+def nest(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand dotted keys into nested dicts, skipping nested fields that are None."""
+    nested: Dict[str, Any] = {}
+    for key, value in flat.items():
+        *parents, name = key.split('.')
+        if parents and value is None:
+            continue
+        node = nested
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[name] = value
+    return nested
+
+def lookup(record: Dict[str, Any], key: str) -> Any:
+    """Get a (dotted) key from a nested dict."""
+    value: Any = record
+    for name in key.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(name)
+    return value
+
+class Table:
+    """
+    Columnar collection of models. Subclasses declare the model type and (key, column type) pairs,
+    where keys are the (dotted) keys of the model's data() and aliases map DataFrame columns onto them.
+    """
+    model: type = None
+    columns: Tuple[Tuple[str, type], ...] = ()
+    aliases: Dict[str, str] = {}
+
+    def __init__(self, **columns: Any):
+        lengths = { len(column) for column in columns.values() }
+        if len(lengths) > 1:
+            raise ValueError(f"Columns of {type(self).__name__} differ in length: {sorted(lengths)}.")
+        self.fields = { key: columns[key] for key, _ in self.columns }
+
+    ###########################
+    # FACTORIES
+    ###########################
+
+    @classmethod
+    def from_columns(cls, values: Dict[str, List[Any]]) -> 'Table':
+        """
+        Build from lists of values keyed by (dotted) data() key. Keys that are not present are empty.
+        :returns: Built table.
+        """
+        size = max((len(column) for column in values.values()), default=0)
+        return cls(**{ key: kind.from_values(values.get(key, [ None ] * size)) for key, kind in cls.columns })
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> 'Table':
+        """
+        Build from data() style dicts (nested or dotted keys).
+        :returns: Built table.
+        """
+        values: Dict[str, List[Any]] = { key: [] for key, _ in cls.columns }
+        for record in records:
+            for key in values:
+                values[key].append(record[key] if key in record else lookup(record, key))
+        return cls.from_columns(values)
+
+    @classmethod
+    def from_models(cls, models: Iterable[Any]) -> 'Table':
+        """Build from model instances."""
+        return cls.from_records(model.data() for model in models)
+
+    @classmethod
+    def from_dataframe(cls, frame: Any) -> 'Table':
+        """
+        Build from a DataFrame whose columns are data() keys (case insensitive) or their aliases.
+        Columns are converted in bulk; no per-row dicts are created.
+        :returns: Built table.
+        """
+        aliases = { key.lower(): alias for key, alias in cls.aliases.items() }
+        frame = frame.rename(columns=lambda column: aliases.get(str(column).lower(), str(column).lower()))
+        frame = frame.loc[:, ~frame.columns.duplicated()]
+        values = { key: frame[key].astype(object).where(frame[key].notna(), None).tolist() for key, _ in cls.columns if key in frame.columns }
+        values = values if values else { cls.columns[0][0]: [ None ] * len(frame) }
+        return cls.from_columns(values)
+
+    ###########################
+    # CONVERSIONS
+    ###########################
+
+    def __len__(self) -> int:
+        return len(next(iter(self.fields.values()))) if self.fields else 0
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Get row i as a data() style dict."""
+        return nest({ key: column.get(i) for key, column in self.fields.items() })
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        Convert every row to a data() style dict, decoding each column once.
+        :returns: List of dicts.
+        """
+        keys = list(self.fields)
+        rows = zip(*(column.tolist() for column in self.fields.values()))
+        if any('.' in key for key in keys):
+            return [ nest(dict(zip(keys, row))) for row in rows ]
+        return [ dict(zip(keys, row)) for row in rows ]
+
+    def to_dataframe(self) -> Any:
+        """Convert to a DataFrame with one column per (dotted) key."""
+        import pandas as pd
+        return pd.DataFrame({ key: column.tolist() for key, column in self.fields.items() })
+
+    def __getitem__(self, i: int) -> Any:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"{type(self).__name__} index out of range.")
+        return self.model.from_data(self.record(i))
+
+    def __iter__(self) -> Iterator[Any]:
+        for record in self.to_records():
+            yield self.model.from_data(record)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (category lists excluded)."""
+        return sum(column.nbytes for column in self.fields.values())
@@ -1,12 +1,18 @@
-class Category:
+from models.base import Model
+
+class Category(Model):
+    __slots__ = ('category', 'description')
     
     def __init__(self, category, description):
-        self.category = category
-        self.description = description
+        super().__init__(category=category, description=description)
         
     def data(self):
         data = {
             'cat': self.category,
             'desc': self.description
         }
-        return data
\ No newline at end of file
+        return data
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(data.get('cat'), data.get('desc'))
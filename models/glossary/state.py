@@ -1,9 +1,10 @@
-class State:
+from models.base import Model
+
+class State(Model):
+    __slots__ = ('state', 'abbreviation', 'code', 'population')
+
     def __init__(self, state, abbreviation, code, population):
-        self.state = state
-        self.abbreviation = abbreviation
-        self.code = code
-        self.population = population
+        super().__init__(state=state, abbreviation=abbreviation, code=code, population=population)
         
     def data(self):
         data = {
@@ -12,4 +13,8 @@ class State:
             'code': self.code,
             'pop': self.population      
         }
-        return data
\ No newline at end of file
+        return data
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(data.get('state'), data.get('abbr'), data.get('code'), data.get('pop'))
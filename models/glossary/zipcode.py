@@ -1,9 +1,11 @@
-class Zipcode:
+from models.base import Model
+from models.columns import Categorical, Integers, Table, Zipcodes
+
+class Zipcode(Model):
+    __slots__ = ('zipcode', 'city', 'county', 'population')
+
     def __init__(self, zipcode, city, county, population):
-        self.zipcode = zipcode
-        self.city = city
-        self.county = county
-        self.population = population
+        super().__init__(zipcode=zipcode, city=city, county=county, population=population)
         
     def data(self):
         data = {
@@ -12,4 +14,14 @@ class Zipcode:
             'county': self.county,
             'pop': self.population            
         }
-        return data
\ No newline at end of file
+        return data
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(data.get('zip'), data.get('city'), data.get('county'), data.get('pop'))
+
+class ZipcodeTable(Table):
+    """Columnar zipcodes: an int32 zip, two dictionary-encoded names and an int32 population per row."""
+    model = Zipcode
+    columns = (('zip', Zipcodes), ('city', Categorical), ('county', Categorical), ('pop', Integers))
+    aliases = { 'zipcode': 'zip', 'population': 'pop' }
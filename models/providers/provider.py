@@ -1,15 +1,48 @@
-class Provider:
+from models.base import Model
+from models.columns import Categorical, Floats, Lists, Table, Texts, Zipcodes
+
+class Provider(Model):
+    __slots__ = ('provider', 'service', 'address', 'keywords')
+    # Address and keywords are containers, so providers are not hashable.
+    __hash__ = None
+
     def __init__(self, **kwargs):
-        self.provider = kwargs.get('provider', None)
-        self.service = kwargs.get('service', 'Unknown')
-        self.address = kwargs.get('address', {})
-        self.keywords = kwargs.get('keywords', [])
+        super().__init__(
+            provider=kwargs.get('provider', None),
+            service=kwargs.get('service', 'Unknown'),
+            address=kwargs.get('address', {}),
+            keywords=tuple(kwargs.get('keywords', None) or ()),
+        )
         
     def data(self):
         data = {
             'provider': self.provider,
             'service': self.service,
-            'address': self.address,
-            'keywords': self.keywords
+            'address': dict(self.address),
+            'keywords': list(self.keywords)
         }
-        return data
\ No newline at end of file
+        return data
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(**data)
+
+class ProviderTable(Table):
+    """
+    Columnar providers: names and street lines packed as UTF-8, services, places and keywords dictionary-encoded.
+    Only the address fields below are kept.
+    """
+    model = Provider
+    columns = (
+        ('provider', Texts),
+        ('service', Categorical),
+        ('address.street.line1', Texts),
+        ('address.street.line2', Texts),
+        ('address.city', Categorical),
+        ('address.county', Categorical),
+        ('address.state', Categorical),
+        ('address.zipcode', Zipcodes),
+        ('address.coordinates.latitude', Floats),
+        ('address.coordinates.longitude', Floats),
+        ('keywords', Lists),
+    )
@@ -0,0 +1,45 @@
+# __main__.py
+# Author: Ian Effendi
+#
+# Command line entry point: python -m resolution [options]
+import sys
+import argparse
+
+from pymongo import UpdateOne
+
+from config import settings
+from connection.cache import invalidate
+from connection.database import Database
+from resolution.entities import EntityResolver
+
+argparser = argparse.ArgumentParser(prog="resolution", description="Cluster duplicate providers across sources and assign canonical entity IDs.")
+argparser.add_argument('-d', '--database', metavar='DATABASE', default=None,
+                       help="Provider database, defaults to resolution.database.")
+argparser.add_argument('-c', '--collection', metavar='COLLECTION', default=None,
+                       help="Provider collection, defaults to resolution.collection.")
+argparser.add_argument('-t', '--threshold', metavar='SCORE', type=float, default=None,
+                       help="Minimum pair score for a match, defaults to resolution.threshold.")
+argparser.add_argument('-D', '--dry', action='store_true', default=False,
+                       help="Report the clusters without writing entity IDs.")
+
+if __name__ == '__main__':
+    cargs = argparser.parse_args()
+    config = settings.get('resolution', {})
+    Database.initialize(Database.make_options(
+        hostname=settings.db.auth.hostname,
+        username=settings.db.auth.username,
+        password=settings.db.auth.password,
+        port=settings.db.auth.port,
+    ))
+    collection = Database.CLIENT[cargs.database or config.get('database', 'providers')][cargs.collection or config.get('collection', 'services')]
+    projection = { 'facility': 1, 'info.phone': 1, 'info.website': 1, 'address.zipcode': 1, 'address.state': 1 }
+
+    resolver = EntityResolver(threshold=cargs.threshold).extend(collection.find({}, projection))
+    entities = resolver.resolve()
+    print(", ".join(f"{name}: {count}" for name, count in resolver.stats.items()))
+    if not cargs.dry:
+        requests = [ UpdateOne({ '_id': key }, { '$set': { 'entity': entity } }) for key, entity in entities.items() ]
+        for start in range(0, len(requests), 1000):
+            collection.bulk_write(requests[start:start + 1000], ordered=False)
+        invalidate(collection.database.name, collection.name)
+    sys.exit(0)
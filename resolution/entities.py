@@ -0,0 +1,216 @@
+# entities.py
+# Author: Ian Effendi
+#
+# Cross-source provider entity resolution.
+#
+# Candidate pairs are blocked with MinHash/LSH over facility-name shingles, plus exact blocks on
+# phone number, website host and zip + leading name token. Each candidate pair is scored on
+# name similarity and the agreeing identifiers; pairs above the threshold are merged with
+# union-find, and every cluster gets a canonical ID derived from its smallest member key.
+import re
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from config import settings
+from connection.schema import resolve
+from ingestion.websites import host_key
+from resolution.minhash import LSH, MinHasher, block_pairs, containment, jaccard, shingles
+
+# Words ignored when comparing provider names.
+STOPWORDS = {
+    'the', 'of', 'and', 'for', 'a', 'an', 'at', 'in',
+    'inc', 'incorporated', 'llc', 'ltd', 'corp', 'corporation', 'co', 'company', 'pc', 'pllc',
+}
+
+# Default weights of the agreeing fields in a pair score.
+WEIGHTS = { 'name': 0.5, 'phone': 0.25, 'host': 0.2, 'zip': 0.15 }
+
+def normalize_name(name: Any) -> str:
+    """
+    Normalize a provider name for comparison (lower-case, '&' as 'and', punctuation and legal suffixes removed).
+    :returns: str, empty if name is blank.
+    """
+    if name is None or name != name:
+        return ''
+    words = re.sub(r'[^a-z0-9 ]', ' ', str(name).lower().replace('&', ' and ')).split()
+    return ' '.join(word for word in words if word not in STOPWORDS)
+
+def normalize_phone(phone: Any) -> Optional[str]:
+    """
+    Normalize a US phone number to its last ten digits.
+    :returns: None if fewer than ten digits are present.
+    """
+    if phone is None or phone != phone:
+        return None
+    digits = re.sub(r'\D', '', str(phone))
+    return digits[-10:] if len(digits) >= 10 else None
+
+def normalize_zip(zipcode: Any) -> Optional[str]:
+    """
+    Normalize a zip code (or zip+4) to five digits.
+    :returns: None if no zip code is present.
+    """
+    if zipcode is None or zipcode != zipcode:
+        return None
+    digits = re.sub(r'\D', '', str(int(zipcode)) if isinstance(zipcode, float) else str(zipcode))
+    if not digits:
+        return None
+    return digits[:5] if len(digits) > 5 else digits.zfill(5)
+
+class Record:
+    """Comparable view of a provider document."""
+
+    def __init__(self, key: Hashable, name: Any = None, phone: Any = None, host: Any = None, zipcode: Any = None, state: Any = None):
+        self.key = key
+        self.name = normalize_name(name)
+        self.shingles = shingles(self.name)
+        self.phone = normalize_phone(phone)
+        self.host = host if host else None
+        self.zip = normalize_zip(zipcode)
+        self.state = str(state).strip().upper() if state else None
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any], key: Hashable = None) -> 'Record':
+        """Make a record from a providers.services document (keyed by its `_id` unless given)."""
+        website = resolve(document, 'info.website') or {}
+        host = website.get('host') if isinstance(website, dict) else None
+        if not host:
+            host = host_key(website.get('url') if isinstance(website, dict) else website)
+        return cls(
+            key=key if key is not None else document.get('_id'),
+            name=resolve(document, 'facility'),
+            phone=resolve(document, 'info.phone'),
+            host=host,
+            zipcode=resolve(document, 'address.zipcode'),
+            state=resolve(document, 'address.state'),
+        )
+
+class UnionFind:
+    """Disjoint sets with path compression and union by size."""
+
+    def __init__(self):
+        self.parent: Dict[Hashable, Hashable] = {}
+        self.size: Dict[Hashable, int] = {}
+
+    def find(self, key: Hashable) -> Hashable:
+        root = self.parent.setdefault(key, key)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while key != root:
+            self.parent[key], key = root, self.parent[key]
+        return root
+
+    def union(self, a: Hashable, b: Hashable) -> None:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size.get(a, 1) < self.size.get(b, 1):
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] = self.size.get(a, 1) + self.size.get(b, 1)
+
+def canonical_id(keys: Iterable[Hashable]) -> str:
+    """
+    Get the canonical ID of a cluster: a hash of its smallest member key.
+    The ID does not depend on input order, and only changes if a smaller key joins the cluster.
+    """
+    return hashlib.sha1(min(str(key) for key in keys).encode('utf-8')).hexdigest()[:16]
+
+class EntityResolver:
+    """Blocks, scores and clusters provider records."""
+
+    def __init__(self, threshold: float = None, num_perm: int = None, bands: int = None, max_bucket: int = None,
+                 weights: Dict[str, float] = None):
+        config = settings.get('resolution', {})
+        self.threshold = threshold if threshold is not None else config.get('threshold', 0.55)
+        self.max_bucket = max_bucket if max_bucket else config.get('max_bucket', 100)
+        bands = bands if bands else config.get('bands', 16)
+        num_perm = num_perm if num_perm else config.get('num_perm', 128)
+        self.weights = { **WEIGHTS, **config.get('weights', {}), **(weights or {}) }
+        self.hasher = MinHasher(num_perm)
+        self.lsh = LSH(bands, num_perm // bands)
+        self.records: Dict[Hashable, Record] = {}
+        self.blocks: Dict[str, Dict[str, List[Hashable]]] = { 'phone': defaultdict(list), 'host': defaultdict(list), 'zip': defaultdict(list) }
+        self.stats = { 'records': 0, 'candidates': 0, 'matches': 0, 'clusters': 0 }
+
+    def add(self, record: Record) -> None:
+        """Add a record to the LSH and exact-key blocks. Record keys must be unique."""
+        self.records[record.key] = record
+        self.lsh.add(record.key, self.hasher.signature(record.shingles))
+        if record.phone:
+            self.blocks['phone'][record.phone].append(record.key)
+        if record.host:
+            self.blocks['host'][record.host].append(record.key)
+        if record.zip and record.name:
+            self.blocks['zip'][f"{record.zip}:{record.name.split()[0]}"].append(record.key)
+        self.stats['records'] += 1
+
+    def extend(self, documents: Iterable[Dict[str, Any]]) -> 'EntityResolver':
+        """Add provider documents (or records)."""
+        for document in documents:
+            self.add(document if isinstance(document, Record) else Record.from_document(document))
+        return self
+
+    def candidates(self) -> Set[Tuple[Hashable, Hashable]]:
+        """
+        Get the candidate pairs from every block.
+        :returns: Set of (key, key) pairs.
+        """
+        groups = list(self.lsh.groups())
+        for blocks in self.blocks.values():
+            groups.extend(keys for keys in blocks.values() if len(keys) > 1)
+        return block_pairs(groups, self.max_bucket)
+
+    def score(self, a: Record, b: Record) -> float:
+        """
+        Score a pair: the weighted name similarity (mean of shingle Jaccard and containment) plus the
+        weights of the agreeing phone, host and zip. Records in different states never match.
+        :returns: float, higher is more similar.
+        """
+        if a.state and b.state and a.state != b.state:
+            return 0.0
+        score = self.weights['name'] * (jaccard(a.shingles, b.shingles) + containment(a.shingles, b.shingles)) / 2.0
+        for field in ('phone', 'host', 'zip'):
+            value = getattr(a, field)
+            if value and value == getattr(b, field):
+                score += self.weights[field]
+        return score
+
+    def matches(self) -> List[Tuple[Hashable, Hashable, float]]:
+        """
+        Score every candidate pair.
+        :returns: List of (key, key, score) above the threshold.
+        """
+        pairs = self.candidates()
+        self.stats['candidates'] = len(pairs)
+        found = []
+        for a, b in pairs:
+            score = self.score(self.records[a], self.records[b])
+            if score >= self.threshold:
+                found.append((a, b, score))
+        self.stats['matches'] = len(found)
+        return found
+
+    def clusters(self) -> List[List[Hashable]]:
+        """
+        Merge matching pairs into clusters. Unmatched records are clusters of one.
+        :returns: List of member key lists.
+        """
+        sets = UnionFind()
+        for key in self.records:
+            sets.find(key)
+        for a, b, _ in self.matches():
+            sets.union(a, b)
+        members = defaultdict(list)
+        for key in self.records:
+            members[sets.find(key)].append(key)
+        self.stats['clusters'] = len(members)
+        return list(members.values())
+
+    def resolve(self) -> Dict[Hashable, str]:
+        """
+        Assign every record the canonical ID of its cluster.
+        :returns: Dict of record key to entity ID.
+        """
+        return { key: canonical_id(keys) for keys in self.clusters() for key in keys }
@@ -0,0 +1,124 @@
+# minhash.py
+# Author: Ian Effendi
+#
+# MinHash signatures and banded locality-sensitive hashing (LSH) for near-duplicate blocking.
+#
+# Two sets with Jaccard similarity s share a band of r rows with probability s^r, so with b bands
+# they become candidates with probability 1 - (1 - s^r)^b. Only records sharing a bucket are ever
+# compared, which keeps blocking close to linear in the number of records.
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+import numpy as np
+
+# Signature value for an empty shingle set; never equal to a real hash, so empty sets do not collide.
+EMPTY = np.uint32(0xFFFFFFFF)
+
+def shingles(text: str, k: int = 3) -> Set[str]:
+    """
+    Get the character k-grams of a (normalized) string. Words are padded so short names still produce shingles.
+    :returns: Set of shingles. Empty if text is blank.
+    """
+    if not text:
+        return set()
+    text = f" {text} "
+    if len(text) <= k:
+        return { text }
+    return { text[i:i + k] for i in range(len(text) - k + 1) }
+
+def jaccard(a: Set[Any], b: Set[Any]) -> float:
+    """
+    Get the Jaccard similarity of two sets.
+    :returns: float in [0, 1]. 0 if either is empty.
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def containment(a: Set[Any], b: Set[Any]) -> float:
+    """
+    Get the share of the smaller set found in the larger one (eg. 'arc monroe' in 'arc monroe county').
+    :returns: float in [0, 1]. 0 if either is empty.
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+class MinHasher:
+    """MinHash signatures over num_perm multiply-shift hash functions of a stable 32-bit shingle hash."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        generator = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Odd multipliers and random offsets for h(x) = (a * x + b) >> 32, computed modulo 2^64.
+        self.a = generator.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = generator.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: Iterable[str]) -> np.ndarray:
+        """
+        Get the MinHash signature of a set of shingles.
+        :returns: uint32 array of length num_perm.
+        """
+        hashes = np.fromiter((zlib.crc32(item.encode('utf-8')) for item in items), dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, EMPTY, dtype=np.uint32)
+        with np.errstate(over='ignore'):
+            values = (np.outer(self.a, hashes) + self.b[:, None]) >> np.uint64(32)
+        return values.min(axis=1).astype(np.uint32)
+
+    @staticmethod
+    def estimate(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimate the Jaccard similarity of two sets from their signatures."""
+        return float(np.mean(a == b))
+
+class LSH:
+    """Banded LSH index: keys whose signatures agree on every row of any band share a bucket."""
+
+    def __init__(self, bands: int = 16, rows: int = 8):
+        self.bands = bands
+        self.rows = rows
+        self.buckets: List[Dict[bytes, List[Hashable]]] = [ defaultdict(list) for _ in range(bands) ]
+
+    @property
+    def threshold(self) -> float:
+        """Approximate similarity at which a pair becomes a candidate with probability 1/2."""
+        return (1.0 / self.bands) ** (1.0 / self.rows)
+
+    def add(self, key: Hashable, signature: np.ndarray) -> None:
+        """
+        Index a key by its signature. Empty signatures are not indexed.
+        :raises ValueError: Raised if the signature is shorter than bands * rows.
+        """
+        if len(signature) < self.bands * self.rows:
+            raise ValueError(f"Signature of length {len(signature)} is shorter than {self.bands} bands of {self.rows} rows.")
+        if signature[0] == EMPTY:
+            return
+        for band in range(self.bands):
+            self.buckets[band][signature[band * self.rows:(band + 1) * self.rows].tobytes()].append(key)
+
+    def groups(self) -> Iterator[List[Hashable]]:
+        """
+        Iterate over the buckets holding more than one key.
+        :returns: Generator of key lists.
+        """
+        for buckets in self.buckets:
+            for keys in buckets.values():
+                if len(keys) > 1:
+                    yield keys
+
+def block_pairs(groups: Iterable[List[Hashable]], max_bucket: int = 100) -> Set[Tuple[Hashable, Hashable]]:
+    """
+    Turn blocks (keys sharing a bucket) into candidate pairs.
+    Blocks larger than max_bucket are paired in a chain of sorted keys instead of all-pairs, so a
+    very common key (eg. a shared switchboard number) cannot make blocking quadratic.
+    :returns: Set of (key, key) pairs, each ordered smaller key first.
+    """
+    pairs = set()
+    for keys in groups:
+        keys = sorted(set(keys), key=str)
+        if len(keys) > max_bucket:
+            pairs.update(zip(keys, keys[1:]))
+        else:
+            pairs.update((keys[i], keys[j]) for i in range(len(keys)) for j in range(i + 1, len(keys)))
+    return pairs
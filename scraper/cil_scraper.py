@@ -4,12 +4,14 @@
 #
 # Scrapes https://www.ilru.org/projects/cil-net/cil-center-and-association-directory-results/<state> and outputs results in *.csv or *.json format.
 """
+import io, os, sys
 
 from iste.drse import constants
 from iste.drse.arguments import argparser
 
 from iste.utils import verbose, filenames
 from iste.utils.duplicates import deduplicate
+from iste.utils.fanout import FanOut
 
 ###########################
 # PARSE ARGUMENTS
@@ -56,13 +58,14 @@ cargs.formats = cargs.formats if cargs.formats else []
 cargs.filenames = cargs.filenames if cargs.filenames else []
 cargs.files = cargs.files if cargs.files else []
 cargs.sep = cargs.sep if cargs.sep else ""
+cargs.states = cargs.states if cargs.states else ["NY"]
 log_filename_args()
 
 ###########################
 # DEDUPLICATE INPUT
 ###########################
 
-cargs.states = deduplicate(cargs.states, message="Removing duplicate states...", logger=logvv)
+cargs.states = sorted(deduplicate(cargs.states, message="Removing duplicate states...", logger=logvv))
 cargs.formats = deduplicate(cargs.formats, message="Removing duplicate formats...", logger=logvv)
 cargs.filenames = deduplicate(cargs.filenames, message="Removing duplicate output basenames...", logger=logvv)
 cargs.files = deduplicate(cargs.files, message="Removing duplicate output files...", logger=logvv)
@@ -97,236 +100,102 @@ if not cargs.files:
 log_filename_args()
 
 ###########################
-# FILE WRITERS
-###########################
-""" 
-
-
-def content_writer(writer_func: FunctionType) -> FunctionType:
-    def wrapper(file: IO, content: Any, params: Dict[str, str] = {}, *args: List[Any], **kwargs: Dict[str, Any]) -> None:
-        # If no content, exist.
-        if not content:
-            logvv(f'No content to write...')
-            return
-        
-        # If open file is provided and is writable, write content to it.
-        if file:
-            logvv(f"Explicit file provided...")
-            logvv(f"Writing content to {os.path.basename(file.name)}")
-            result = writer_func(file, content, *args, **kwargs)
-            return
-        
-        # Get explicit filename or make the filename from provided components.
-        filename = params.get('filename', make_qualified_filename(**params))
-        
-        # If no file, fall back to filename.
-        if filename:
-            logvv(f"Opening file: {filename}...")
-            with open(filename, 'w', newline='') as uri:
-                logvv(f"Writing content to {os.path.basename(uri.name)}")
-                result = writer_func(uri, content, *args, **kwargs)
-                return result
-        
-        # No filename and no file.
-        logvv("Unable to write content. No file provided.")
-        return            
-    return wrapper
-
-@content_writer
-def to_json(file: IO, content: List[Any], **kwargs: Dict[str, Any]) -> None:
-    ""Write JSON-formatted content out to provided file.
-
-    :param file: File-like object to write JSON to.
-    :type file: IO
-    :param content: Content to be serialied into JSON.
-    :type content: Any
-    ""    
-    json.dump(content, file, **kwargs)
-        
-def print_json(content: Any, **kwargs: Any) -> None:
-    ""Write JSON-formatted stream to standard output.
-
-    :param content: Object to serialize.
-    :type content: Any
-    :param kwargs: Keyword arguments accepted by json.dump()
-    ""
-    logvv("Exporting results to the standard output.")
-    to_json(sys.stdout, content, **kwargs)
-    print("")
-
-@content_writer
-def to_csv(file: IO, content: List[Dict[Any, Any]], **kwargs: Dict[str, Any]) -> None:
-    ""Write CSV-formatted content out to provided file.
-
-    :param file: File-like object to write CSV to.
-    :type file: IO
-    :param content: Content with a set of fields and rows to serialize into CSV.
-    :type content: Union[Dict[Any, Any], List[Dict[Any, Any]]]
-    ""
-    # If content is a single dictionary, assign to single-element list.
-    if isinstance(content, dict):
-        content = [ content ]
-
-    # Create CSV writer.
-    csv_writer = csv.DictWriter(file, content[0].keys(), **kwargs)
-     
-    # Include headers by default. Set headers=False in order to skip header row.
-
-    if kwargs.get("headers", True):
-        csv_writer.writeheader()
-        logvv(f"Wrote header with {len(csv_writer.fieldnames)} field(s).")
-    
-    # If not verbose, write and exit.
-    if not cargs.verbose:
-        csv_writer.writerows(content)
-        return
-    
-    # If verbose, print messages.
-    if cargs.verbose:    
-        n_rows = 0
-        for row in content:
-            n_rows += 1
-            csv_writer.writerow(row)                
-            logvv(f"Wrote row {n_rows}: {row}")
-                
-def print_csv(content: Dict[Any, Any], **kwargs: Any) -> None:
-    ""Write CSV-formatted stream to standard output.
-
-    :param content: Object to serialize.
-    :type content: Any
-    :param kwargs: Keyword arguments accepted by csvwriter()
-    ""
-    logvv("Exporting results to the standard output.")
-    to_csv(sys.stdout, content, **kwargs)
-    print("")
-                
-@content_writer
-def to_tsv(file: IO, content: List[Dict[Any, Any]], **kwargs: Dict[str, Any]) -> None:
-    ""Write TSV-formatted content out to provided file.
-
-    :param file: File-like object to write TSV to.
-    :type file: IO
-    :param content: Content with a set of fields and rows to serialize into TSV.
-    :type content: Union[Dict[Any, Any], List[Dict[Any, Any]]]
-    ""
-    to_csv(file, content, delimiter='\t', **kwargs)
-    
-def print_tsv(content: Dict[Any, Any], **kwargs: Any) -> None:
-    ""Write TSV-formatted stream to standard output.
-
-    :param content: Object to serialize.
-    :type content: Any
-    :param kwargs: Keyword arguments accepted by csvwriter()
-    ""
-    logvv("Exporting results to the standard output.")
-    to_tsv(sys.stdout, content, **kwargs)
-    print("")
-                
-###########################
-# EARLY EXIT IF --dry
+# OUTPUT DATA TO FILE
 ###########################
 
+# Skip the crawl in dry mode.
 if cargs.dry:
-    logvv("End of execution. No changes made to the filesystem.")
+    logv("End of execution. No requests made and no changes made to the filesystem.")
     sys.exit()
-    
-###########################
-# TESTS
-###########################
 
-if cargs.testing:
-
-    def get_flattened_content(data):
-        return {
-            "first.name": data['name']['first'],
-            "last.name": data['name']['last'],
-            "age": data['age'],
-            "email": data['email'],
-        }
-
-    def get_content():
-        return [
-            get_flattened_content(constants.bob),
-            get_flattened_content(constants.handy)
-        ]
-        
-    ###############
-    # STDOUT TESTS
-
-    def test_print_json():
-        logvv()
-        logvv("Testing JSON to stdout.")
-        print_json(constants.bob)
-        print_json(constants.handy)
-        
-    def test_print_csv():
-        logvv()
-        logvv("Testing CSV to stdout.")
-        print_csv(get_content())
-        
-    def test_print_tsv():
-        logvv()
-        logvv("Testing TSV to stdout.")
-        print_tsv(get_content())
-        
-    ###############
-    # FILE TESTS
-
-    def test_output_json():
-        logvv()
-        logvv("Testing JSON file output.")
-        content = [ constants.bob, constants.handy ]
-        params = [ { k: v for k,v in file.items() } for file in generated_filenames if file['basename']]
-        
-        
-        to_json(None, content, params={ "basename": "output", 
-                                    "state": "ca", 
-                                    "prefix": "test", 
-                                    "suffix": "json" })
-
-    def test_output_csv():    
-        logvv()
-        logvv("Testing CSV file output.")
-        content = get_content()
-        to_csv(None, content, params={ "basename": "output", 
-                                    "state": "ny", 
-                                    "prefix": "test", 
-                                    "suffix": "csv" })
-        
-    def test_output_tsv():  
-        logvv()  
-        logvv("Testing TSV file output.")
-        content = get_content()
-        to_tsv(None, content, params={ "basename": "output", 
-                                    "state": "oh", 
-                                    "prefix": "test", 
-                                    "suffix": "tsv" })
+# The drse Scrapy project lives alongside this script, under iste/drse.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'iste', 'drse'))
+os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'drse.settings')
+
+# The repository root holds the query cache generations that crawled items invalidate.
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPOSITORY)
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.extensions.feedexport import FileFeedStorage
+from scrapy.utils.project import get_project_settings
+
+from connection.generations import Generations
+from drse.feeds import StateFilter
+from drse.spiders.ilru_spider import ILRUSpider
+
+# Feed export options per output format. Items are streamed to the outputs as they are scraped.
+FEED_FORMATS = {
+    'json': { 'format': 'json' },
+    'csv': { 'format': 'csv' },
+    'tsv': { 'format': 'csv', 'item_export_kwargs': { 'delimiter': '\t' } },
+    'jsonl': { 'format': 'jsonlines' },
+}
+
+class FanOutFeedStorage(FileFeedStorage):
+    """File storage that serializes a feed once and writes the bytes to its path and every path in the feed's 'copies' option."""
+
+    def __init__(self, uri, *, feed_options=None):
+        super().__init__(uri, feed_options=feed_options)
+        self.paths = [ self.path, *(feed_options or {}).get('copies', []) ]
+
+    def open(self, spider):
+        return io.BufferedWriter(FanOut(self.paths, mode=self.write_mode), buffer_size=1 << 20)
+
+def get_feeds():
+    """Map the generated filenames (one per label, format and state), --output files and --stdout onto Scrapy FEEDS.
+
+    Generated files that only differ by label hold the same content, so they share one feed per format and state:
+    each item is serialized once per feed and the bytes are fanned out to every copy.
+    """
+    feeds = {}
+    groups = {}
+    for filename in cargs.filenames:
+        format = filename.suffix.lstrip('.')
+        if format in FEED_FORMATS:
+            groups.setdefault((format, filename.tags[0] if filename.tags else None), []).append(filename.get_qualified_filename())
+    for (format, state), paths in groups.items():
+        paths = list(dict.fromkeys(paths))
+        feeds[paths[0]] = { **FEED_FORMATS[format], 'state': state, 'item_filter': StateFilter, 'copies': paths[1:] }
+    for file in cargs.files:
+        options = FEED_FORMATS.get(os.path.splitext(file)[1].lstrip('.'), FEED_FORMATS['json'])
+        feeds.setdefault(file, { **options })
+    if 'stdout' in cargs.formats:
+        feeds['stdout:'] = { 'format': 'jsonlines' }
+    for uri, options in feeds.items():
+        logvv(f'Streaming results to {", ".join([ uri, *options.get("copies", []) ])}.')
+    logv(f'Streaming results to {sum(1 + len(options.get("copies", [])) for options in feeds.values())} output(s) from {len(feeds)} feed(s).')
+    return feeds
 
-    
-    # Setup tests.
-    tests = [
-        test_print_json,
-        test_print_csv,
-        test_print_tsv,
-        test_output_json,
-        test_output_csv,
-        test_output_tsv
-    ]
-    
-    # Print progress.
-    logv()
-    with tqdm(tests, position=0) as tests_pbar:
-        tests_pbar.set_description("Executing tests...")
-        print()
-        for test in tests_pbar:
-            test()
-            
-    sys.exit()
-    
 ###########################
 # EXECUTE SPIDER
 ###########################
 
-###########################
-# OUTPUT DATA TO FILE
-########################### """
\ No newline at end of file
+# One crawl for every state: the requests share the downloader, so the per-domain budget and AutoThrottle apply across states.
+settings = get_project_settings()
+settings.set('FEEDS', get_feeds())
+settings.set('FEED_EXPORTERS', { 'csv': 'drse.feeds.DocumentCsvItemExporter' })
+settings.set('FEED_STORAGES', { '': FanOutFeedStorage, 'file': FanOutFeedStorage })
+# Pages are still revalidated against the cache, but every item is exported so the output files are complete.
+settings.set('CONDITIONAL_CACHE_SKIP_UNCHANGED', False)
+settings.set('CONCURRENT_REQUESTS_PER_DOMAIN', cargs.concurrency)
+settings.set('AUTOTHROTTLE_ENABLED', True)
+settings.set('AUTOTHROTTLE_TARGET_CONCURRENCY', cargs.throttle)
+settings.set('DOWNLOAD_DELAY', cargs.delay)
+settings.set('LOG_LEVEL', 'DEBUG' if cargs.verbose > 1 else 'INFO' if cargs.verbose else 'WARNING')
+# Items written to MongoDB bump the stamp file of the query cache (cache.generations in settings.toml).
+settings.set('MONGO_CACHE_INVALIDATE', Generations(os.path.join(REPOSITORY, '.cache', 'generations.json')).bump)
+
+logv(f'Crawling {len(cargs.states)} state(s): {", ".join(cargs.states)}.')
+process = CrawlerProcess(settings)
+crawler = process.create_crawler(ILRUSpider)
+process.crawl(crawler, states=cargs.states)
+process.start()
+
+# Report throughput and latency per state.
+stats = crawler.stats.get_stats()
+for state in cargs.states:
+    pages = stats.get(f'ilru/{state}/pages', 0)
+    log(f'{state}: {pages} page(s), {stats.get(f"ilru/{state}/pages_per_second", 0.0):.2f} pages/sec, '
+        f'{stats.get(f"ilru/{state}/latency_avg_ms", 0.0):.0f} ms avg latency, {stats.get(f"ilru/{state}/latency_max_ms", 0.0):.0f} ms max latency.')
+log(f'Scraped {stats.get("item_scraped_count", 0)} item(s) in {stats.get("elapsed_time_seconds", 0.0):.1f}s.')
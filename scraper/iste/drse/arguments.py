@@ -8,6 +8,11 @@
 import argparse
 from . import constants
 
+# State (and DC) codes accepted by the ILRU directory.
+STATES = ( 'AK', 'AL', 'AR', 'AZ', 'CA', 'CO', 'CT', 'DC', 'DE', 'FL', 'GA', 'HI', 'IA', 'ID', 'IL', 'IN', 'KS',
+           'KY', 'LA', 'MA', 'MD', 'ME', 'MI', 'MN', 'MO', 'MS', 'MT', 'NC', 'ND', 'NE', 'NH', 'NJ', 'NM', 'NV',
+           'NY', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VA', 'VT', 'WA', 'WI', 'WV', 'WY' )
+
 argparser = argparse.ArgumentParser(prog=constants.program, description="Scrape webpage content from ILRU Directory of Centers for Independent Living (CILs) and Associations.")
 """Argument parser object used to enable command line interactions."""
 
@@ -88,25 +93,45 @@ output_options.add_argument('-n', "--name", "--basename", metavar="FILENAME", de
 # Scraper grouped arguments.
 spider_options = argparser.add_argument_group('Spider Options', 'Arguments used to control the scraper bot.')
 
-# --OH argument.
+# --CA argument.
 spider_options.add_argument('-CA', '--CA', dest="states",
-                            action="store_const", const=["CA"],
+                            action="append_const", const="CA",
                             help="Scrape results for CA state.")
 
 # --NY argument. 
 spider_options.add_argument('-NY', '--NY', dest="states",
-                            action='store_const', const=["NY"],
+                            action='append_const', const="NY",
                             help="Scrape results for NY state.")
 
 # --OH argument.
 spider_options.add_argument('-OH', '--OH', dest="states",
-                            action="store_const", const=["OH"],
+                            action="append_const", const="OH",
                             help="Scrape results for OH state.")
 
 # --state argument. Contains input to parse.
-spider_options.add_argument('--state', metavar='STATE', dest="states", nargs='?',
-                    action='store', choices=['CA', 'OH', 'NY'], default=['NY'],
-                    help="Scrape results for supplied STATE values.")
+spider_options.add_argument('--state', '--states', metavar='STATE', dest="states", nargs='+',
+                    action='extend', choices=STATES, default=None,
+                    help="Scrape results for supplied STATE values, defaults to NY.")
+
+# --all argument. Scrape every state in a single run.
+spider_options.add_argument('-A', '--all', dest="states",
+                    action='store_const', const=list(STATES),
+                    help="Scrape results for every state (and DC) in a single crawl.")
+
+# --concurrency argument. Per-domain concurrency budget.
+spider_options.add_argument('--concurrency', metavar='N', dest="concurrency",
+                    action='store', type=int, default=8,
+                    help="Maximum concurrent requests per domain, defaults to 8.")
+
+# --throttle argument. AutoThrottle target concurrency.
+spider_options.add_argument('--throttle', metavar='TARGET', dest="throttle",
+                    action='store', type=float, default=2.0,
+                    help="AutoThrottle target concurrency per domain, defaults to 2.0.")
+
+# --delay argument. Minimum download delay.
+spider_options.add_argument('--delay', metavar='SECONDS', dest="delay",
+                    action='store', type=float, default=1.0,
+                    help="Minimum delay between requests to the same domain, defaults to 1.0.")
 
 ###########################
 # META ARGUMENTS
@@ -0,0 +1,39 @@
+"""
+# feeds.py
+# @author Ian Effendi
+#
+# Feed export helpers for streaming multi-state crawls into per-state output files.
+"""
+from itemadapter import ItemAdapter
+from scrapy.exporters import CsvItemExporter
+from scrapy.extensions.feedexport import ItemFilter
+
+
+class StateFilter(ItemFilter):
+    """Accept only the items for the feed's 'state' option (eg. FEEDS = { 'ny.csv': { 'format': 'csv', 'state': 'NY', 'item_filter': StateFilter } }).
+
+    Items are matched on the state of the directory page they were scraped from, falling back to
+    their address. Feeds without a 'state' option accept every item.
+    """
+
+    def __init__(self, feed_options):
+        super().__init__(feed_options)
+        state = (feed_options or {}).get('state')
+        self.state = state.upper() if state else None
+
+    def accepts(self, item):
+        if self.state is None:
+            return True
+        adapter = ItemAdapter(item)
+        url = adapter.get('url')
+        state = url.rstrip('/').rsplit('/', 1)[-1] if url else (adapter.get('address') or {}).get('state')
+        return (state or '').upper() == self.state
+
+
+class DocumentCsvItemExporter(CsvItemExporter):
+    """CSV exporter writing items with to_document() as flat rows of providers.services fields (dotted column names)."""
+
+    def export_item(self, item):
+        if hasattr(item, 'to_document'):
+            item = { key: ', '.join(value) if isinstance(value, list) else value for key, value in item.to_document().items() }
+        return super().export_item(item)
@@ -7,6 +7,39 @@ import scrapy
 
 
 class DrseItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+    """A provider listed in the ILRU directory of Centers for Independent Living (CILs)."""
+    # Provider name and ILRU directory id.
+    name = scrapy.Field()
+    ilru_id = scrapy.Field()
+    # Dict of street (line1, line2), city, state and zipcode.
+    address = scrapy.Field()
+    phone = scrapy.Field()
+    fax = scrapy.Field()
+    email = scrapy.Field()
+    website = scrapy.Field()
+    director = scrapy.Field()
+    # Services offered and counties served.
+    services = scrapy.Field()
+    counties = scrapy.Field()
+    # Directory page the item was scraped from.
+    url = scrapy.Field()
+
+    def to_document(self):
+        """Map the item onto the providers.services schema fields (dotted names)."""
+        address = self.get('address') or {}
+        street = address.get('street') or {}
+        counties = self.get('counties') or []
+        return {
+            'facility': self.get('name'),
+            'category.service': self.get('services') or [],
+            'info.phone': self.get('phone'),
+            'info.fax': self.get('fax'),
+            'info.website.url': self.get('website'),
+            'info.addressee': self.get('director'),
+            'address.street.line1': street.get('line1'),
+            'address.street.line2': street.get('line2'),
+            'address.city': address.get('city'),
+            'address.county': counties[0] if len(counties) == 1 else None,
+            'address.state': address.get('state'),
+            'address.zipcode': address.get('zipcode'),
+        }
@@ -3,7 +3,16 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+import json
+import time
+import hashlib
+
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -101,3 +110,144 @@ class DrseDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info('Spider opened: %s' % spider.name)
+
+
+class ConditionalCacheMiddleware:
+    """On-disk response cache revalidated with conditional requests.
+
+    Cached pages are re-requested with If-None-Match / If-Modified-Since (from the stored ETag and
+    Last-Modified headers). A 304 Not Modified is answered from the cache without re-downloading
+    the body. Every response is marked with meta['content_unchanged'] when its body hash matches
+    the cached copy, so UnchangedContentMiddleware can skip re-emitting its items.
+
+    Settings: CONDITIONAL_CACHE_ENABLED, CONDITIONAL_CACHE_DIR.
+    Stats: conditional_cache/{revalidated,hit,miss,changed,unchanged,stored}.
+    """
+
+    def __init__(self, path, stats=None, fingerprinter=None):
+        self.path = path
+        self.stats = stats
+        self.fingerprinter = fingerprinter
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('CONDITIONAL_CACHE_ENABLED'):
+            raise NotConfigured("CONDITIONAL_CACHE_ENABLED is not set.")
+        path = settings.get('CONDITIONAL_CACHE_DIR', 'conditionalcache')
+        try:
+            path = data_path(path, createdir=True)
+        except NotConfigured:
+            # Outside a Scrapy project (eg. a CrawlerProcess script), keep the cache under ./.scrapy.
+            path = os.path.join('.scrapy', path)
+        return cls(path, stats=crawler.stats, fingerprinter=crawler.request_fingerprinter)
+
+    def inc(self, key):
+        if self.stats:
+            self.stats.inc_value(f'conditional_cache/{key}')
+
+    def get_paths(self, request):
+        key = self.fingerprinter.fingerprint(request).hex()
+        return os.path.join(self.path, f'{key}.json'), os.path.join(self.path, f'{key}.body')
+
+    def load(self, request):
+        """Get the cached metadata for a request, or None."""
+        meta_path, body_path = self.get_paths(request)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        with open(meta_path, 'r') as file:
+            return json.load(file)
+
+    def store(self, request, response, digest):
+        meta_path, body_path = self.get_paths(request)
+        entry = {
+            'url': response.url,
+            'status': response.status,
+            'headers': { key.decode('latin-1'): [ value.decode('latin-1') for value in values ] for key, values in response.headers.items() },
+            'etag': response.headers.get('ETag', b'').decode('latin-1') or None,
+            'last_modified': response.headers.get('Last-Modified', b'').decode('latin-1') or None,
+            'digest': digest,
+            'stored': time.time(),
+        }
+        for path, content, mode in ((body_path, response.body, 'wb'), (meta_path, json.dumps(entry), 'w')):
+            temp = path + '.tmp'
+            with open(temp, mode) as file:
+                file.write(content)
+            os.replace(temp, path)
+        self.inc('stored')
+
+    def process_request(self, request, spider):
+        if request.method != 'GET' or request.meta.get('dont_cache'):
+            return None
+        entry = self.load(request)
+        if entry is None:
+            self.inc('miss')
+            return None
+        request.meta['conditional_cache'] = entry
+        if entry.get('etag'):
+            request.headers.setdefault('If-None-Match', entry['etag'])
+        if entry.get('last_modified'):
+            request.headers.setdefault('If-Modified-Since', entry['last_modified'])
+        self.inc('revalidated')
+        return None
+
+    def process_response(self, request, response, spider):
+        if request.method != 'GET' or request.meta.get('dont_cache'):
+            return response
+        entry = request.meta.get('conditional_cache')
+        if response.status == 304 and entry:
+            self.inc('hit')
+            _, body_path = self.get_paths(request)
+            with open(body_path, 'rb') as file:
+                body = file.read()
+            headers = Headers({ key: values for key, values in entry['headers'].items() })
+            cls = responsetypes.from_args(headers=headers, url=entry['url'], body=body)
+            request.meta['content_unchanged'] = True
+            return cls(url=entry['url'], status=entry['status'], headers=headers, body=body, request=request, flags=['cached'])
+        if response.status != 200:
+            return response
+        digest = hashlib.sha1(response.body).hexdigest()
+        unchanged = bool(entry) and entry.get('digest') == digest
+        request.meta['content_unchanged'] = unchanged
+        self.inc('unchanged' if unchanged else 'changed')
+        validators = (response.headers.get('ETag', b'').decode('latin-1') or None,
+                      response.headers.get('Last-Modified', b'').decode('latin-1') or None)
+        if not unchanged or validators != (entry.get('etag'), entry.get('last_modified')):
+            self.store(request, response, digest)
+        return response
+
+
+class UnchangedContentMiddleware:
+    """Spider middleware dropping the items scraped from pages whose content is unchanged since the last crawl.
+
+    Requests are still followed. Enabled with CONDITIONAL_CACHE_SKIP_UNCHANGED (on by default with the cache).
+    Stats: conditional_cache/items_skipped.
+    """
+
+    def __init__(self, stats=None):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not (settings.getbool('CONDITIONAL_CACHE_ENABLED') and settings.getbool('CONDITIONAL_CACHE_SKIP_UNCHANGED', True)):
+            raise NotConfigured("Unchanged content is not skipped.")
+        return cls(stats=crawler.stats)
+
+    def skip(self, response, i):
+        if response.meta.get('content_unchanged', False) and is_item(i):
+            if self.stats:
+                self.stats.inc_value('conditional_cache/items_skipped')
+            return True
+        return False
+
+    def process_spider_output(self, response, result, spider):
+        for i in result:
+            if not self.skip(response, i):
+                yield i
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for i in result:
+            if not self.skip(response, i):
+                yield i
@@ -4,10 +4,175 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import time
+import hashlib
+import json
+
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from pymongo import MongoClient, UpdateOne
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.misc import load_object
+from twisted.internet import defer, task, threads
 
 
 class DrsePipeline:
     def process_item(self, item, spider):
         return item
+
+
+def nest(document):
+    """Expand dotted keys (eg. 'address.city') into nested documents."""
+    result = {}
+    for key, value in document.items():
+        target = result
+        *parents, name = key.split('.')
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return result
+
+
+def lookup(document, field):
+    """Get a (dotted) field from a nested document, or None."""
+    for name in field.split('.'):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(name)
+    return document
+
+
+class MongoPipeline:
+    """Buffers items and writes them to MongoDB as unordered bulk upserts.
+
+    A batch is flushed once MONGO_BATCH_SIZE items are buffered or MONGO_FLUSH_INTERVAL seconds
+    have passed, and once more on spider_closed. Writes run in a worker thread so the crawl is
+    not blocked. Throughput and write latency are reported through the Scrapy stats (mongo/*).
+
+    Settings: MONGO_URI (required), MONGO_DATABASE, MONGO_COLLECTION, MONGO_BATCH_SIZE,
+    MONGO_FLUSH_INTERVAL, MONGO_UPSERT_KEYS (fields matched on upsert; a content hash `_id`
+    is used for items missing any of them) and MONGO_CACHE_INVALIDATE (a callable, or its import
+    path, called with the database and collection after every write, so that cached queries of
+    other processes see the crawled items).
+    """
+
+    def __init__(self, uri, database, collection, batch_size=500, interval=5.0, keys=(), stats=None, invalidate=None):
+        self.uri = uri
+        self.database = database
+        self.collection = collection
+        self.batch_size = batch_size
+        self.interval = interval
+        self.keys = list(keys)
+        self.stats = stats
+        self.invalidate = invalidate
+        self.client = None
+        self.target = None
+        self.buffer = []
+        self.pending = set()
+        self.timer = None
+        self.started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get('MONGO_URI'):
+            raise NotConfigured("MONGO_URI is not set.")
+        pipeline = cls(
+            uri=settings.get('MONGO_URI'),
+            database=settings.get('MONGO_DATABASE', 'providers'),
+            collection=settings.get('MONGO_COLLECTION', 'services'),
+            batch_size=settings.getint('MONGO_BATCH_SIZE', 500),
+            interval=settings.getfloat('MONGO_FLUSH_INTERVAL', 5.0),
+            keys=settings.getlist('MONGO_UPSERT_KEYS', ['facility', 'address.zipcode']),
+            stats=crawler.stats,
+            invalidate=load_object(settings['MONGO_CACHE_INVALIDATE']) if settings.get('MONGO_CACHE_INVALIDATE') else None,
+        )
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.client = MongoClient(self.uri, appname=spider.name)
+        self.target = self.client[self.database][self.collection]
+        self.started = time.perf_counter()
+        if self.invalidate is None:
+            spider.logger.info("MONGO_CACHE_INVALIDATE is not set; cached queries will not see crawled items.")
+        if self.interval > 0:
+            self.timer = task.LoopingCall(self.flush, spider)
+            self.timer.start(self.interval, now=False)
+
+    def process_item(self, item, spider):
+        self.buffer.append(item.to_document() if hasattr(item, 'to_document') else ItemAdapter(item).asdict())
+        if len(self.buffer) >= self.batch_size:
+            self.flush(spider)
+        return item
+
+    def make_upsert(self, document):
+        document = nest(document)
+        if self.keys and all(lookup(document, key) is not None for key in self.keys):
+            selector = { key: lookup(document, key) for key in self.keys }
+        else:
+            content = json.dumps(document, sort_keys=True, default=str)
+            selector = { '_id': hashlib.sha1(content.encode('utf-8')).hexdigest() }
+        return UpdateOne(selector, { '$set': document }, upsert=True)
+
+    def write(self, requests):
+        started = time.perf_counter()
+        try:
+            self.target.bulk_write(requests, ordered=False)
+        finally:
+            # Unordered writes can partially succeed, so invalidate cached queries either way.
+            if self.invalidate is not None:
+                self.invalidate(self.database, self.collection)
+        return (time.perf_counter() - started) * 1000.0
+
+    def flush(self, spider):
+        """Hand the buffered items to a worker thread as one bulk write."""
+        if not self.buffer:
+            return None
+        batch, self.buffer = self.buffer, []
+        requests = [ self.make_upsert(document) for document in batch ]
+        deferred = threads.deferToThread(self.write, requests)
+        deferred.addCallbacks(self.written, self.failed, callbackArgs=(len(requests),), errbackArgs=(len(requests), spider))
+        self.pending.add(deferred)
+        deferred.addBoth(self.settle, deferred)
+        return deferred
+
+    def written(self, latency, count):
+        if self.stats:
+            self.stats.inc_value('mongo/items_written', count)
+            self.stats.inc_value('mongo/batches')
+            self.stats.inc_value('mongo/write_time_ms', latency)
+            self.stats.max_value('mongo/write_latency_max_ms', latency)
+            self.stats.set_value('mongo/write_latency_last_ms', latency)
+        return latency
+
+    def failed(self, failure, count, spider):
+        spider.logger.error(f"Bulk write of {count} item(s) failed: {failure.getErrorMessage()}")
+        if self.stats:
+            self.stats.inc_value('mongo/items_failed', count)
+        return None
+
+    def settle(self, result, deferred):
+        self.pending.discard(deferred)
+        return result
+
+    def spider_closed(self, spider):
+        """Flush the remaining items, wait for every write, and report throughput."""
+        if self.timer and self.timer.running:
+            self.timer.stop()
+        self.flush(spider)
+        deferred = defer.DeferredList(list(self.pending))
+        deferred.addCallback(lambda _: self.close(spider))
+        return deferred
+
+    def close(self, spider):
+        if self.stats and self.started is not None:
+            elapsed = time.perf_counter() - self.started
+            written = self.stats.get_value('mongo/items_written', 0)
+            batches = self.stats.get_value('mongo/batches', 0)
+            self.stats.set_value('mongo/items_per_second', written / elapsed if elapsed else 0.0)
+            if batches:
+                self.stats.set_value('mongo/write_latency_avg_ms', self.stats.get_value('mongo/write_time_ms', 0) / batches)
+        if self.client is not None:
+            self.client.close()
@@ -7,6 +7,8 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+
 BOT_NAME = 'drse'
 
 SPIDER_MODULES = ['drse.spiders']
@@ -25,7 +27,7 @@ ROBOTSTXT_OBEY = True
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
-DOWNLOAD_DELAY = 3
+DOWNLOAD_DELAY = 1
 # The download delay setting will honor only one of:
 CONCURRENT_REQUESTS_PER_DOMAIN = 8
 #CONCURRENT_REQUESTS_PER_IP = 16
@@ -44,15 +46,15 @@ CONCURRENT_REQUESTS_PER_DOMAIN = 8
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    'drse.middlewares.DrseSpiderMiddleware': 543,
-#}
+SPIDER_MIDDLEWARES = {
+    'drse.middlewares.UnchangedContentMiddleware': 543,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    'drse.middlewares.DrseDownloaderMiddleware': 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    'drse.middlewares.ConditionalCacheMiddleware': 900,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -62,27 +64,47 @@ CONCURRENT_REQUESTS_PER_DOMAIN = 8
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    'drse.pipelines.DrsePipeline': 300,
-#}
+# MongoPipeline is disabled unless MONGO_URI is set.
+ITEM_PIPELINES = {
+    'drse.pipelines.MongoPipeline': 300,
+}
+
+# MongoDB destination for crawled items, written as batched bulk upserts.
+MONGO_URI = os.environ.get('MONGO_URI')
+MONGO_DATABASE = 'providers'
+MONGO_COLLECTION = 'services'
+MONGO_BATCH_SIZE = 500
+MONGO_FLUSH_INTERVAL = 5.0
+MONGO_UPSERT_KEYS = ['facility', 'address.zipcode']
+# Called with (database, collection) after every write to invalidate cached queries; a callable or its
+# import path. cil_scraper.py sets it to bump the repository's query cache generations.
+MONGO_CACHE_INVALIDATE = None
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
+# DOWNLOAD_DELAY becomes the minimum delay; CONCURRENT_REQUESTS_PER_DOMAIN caps the per-domain budget.
+AUTOTHROTTLE_ENABLED = True
 # The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
+AUTOTHROTTLE_START_DELAY = 3
 # The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
+AUTOTHROTTLE_MAX_DELAY = 60
 # The average number of requests Scrapy should be sending in parallel to
 # each remote server
-#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
+AUTOTHROTTLE_TARGET_CONCURRENCY = 2.0
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-HTTPCACHE_ENABLED = True
+# Superseded by the conditional cache below, which revalidates pages instead of serving them forever.
+HTTPCACHE_ENABLED = False
 HTTPCACHE_EXPIRATION_SECS = 0
 HTTPCACHE_DIR = 'httpcache'
 HTTPCACHE_IGNORE_HTTP_CODES = []
 HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+
+# On-disk cache revalidated with ETag/Last-Modified; 304 responses are served from disk and
+# items from pages with unchanged content are not emitted again.
+CONDITIONAL_CACHE_ENABLED = True
+CONDITIONAL_CACHE_DIR = 'conditionalcache'
+CONDITIONAL_CACHE_SKIP_UNCHANGED = True
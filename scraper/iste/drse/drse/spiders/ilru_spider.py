@@ -4,31 +4,134 @@
 #
 # Spider for reading ILRU pages.
 """
-from bs4 import BeautifulSoup
+import re
+import time
 
 import scrapy
 
-def get_cils(response):
-    content = BeautifulSoup(response.text, 'lxml')
-    return content.find_all("div", class_="cil-block"), content
+from drse.items import DrseItem
+
+# Last address line, eg. 'Cortland, NY 13045' or 'Cortland, NY 13045-1234'.
+LOCALITY = re.compile(r'^(?P<city>.+?),\s*(?P<state>[A-Z]{2})\s+(?P<zipcode>\d{5})(?:-\d{4})?$')
+
+# Every provider in the ILRU directory is a Center for Independent Living (or association).
+SERVICES = [ 'Independent Living' ]
+
+def get_lines(selector, xpath):
+    """Get the non-empty text nodes selected by xpath, with whitespace collapsed."""
+    return [ line for line in (' '.join(text.split()) for text in selector.xpath(xpath).getall()) if line ]
+
+def get_counties(lines):
+    """Split the 'Counties Served' text into county names, eg. 'Clark, Greene, and Preble'."""
+    counties = []
+    for line in lines:
+        for county in line.split(','):
+            county = re.sub(r'^and\s+', '', county.strip())
+            if county and county.lower() != 'unknown':
+                counties.append(county)
+    return counties
+
+def get_labeled(lines):
+    """Split 'Label: value' lines into a dict keyed by lower-case label."""
+    values = {}
+    for line in lines:
+        label, _, value = line.partition(':')
+        if value.strip():
+            values.setdefault(label.strip().lower(), value.strip())
+    return values
+
+def get_address(lines):
+    """Parse the address lines of a CIL block into street, city, state and zipcode."""
+    address = { 'street': {}, 'city': None, 'state': None, 'zipcode': None }
+    street = lines
+    for i in range(len(lines) - 1, -1, -1):
+        match = LOCALITY.match(lines[i])
+        if match:
+            address.update(match.groupdict())
+            street = lines[:i]
+            break
+    if street:
+        address['street'] = { 'line1': street[0], 'line2': ', '.join(street[1:]) or None }
+    return address
+
+def get_cil(block, url=None):
+    """Extract a DrseItem from a div.cil-block selector."""
+    # Address lines are the text nodes of the first column, up to the 'Email:' label.
+    address = []
+    for line in get_lines(block, './/div[contains(@class, "col1")]/text()'):
+        if line.endswith(':'):
+            break
+        address.append(line)
+    phones = get_labeled(get_lines(block, './/div[contains(@class, "col2")]/text()'))
+    director = get_labeled(get_lines(block, './/div[contains(@class, "col3")]/text()'))
+    return DrseItem(
+        name=' '.join(get_lines(block, './/h2[contains(@class, "cil-name")]/text()')),
+        ilru_id=block.xpath('.//h2[contains(@class, "cil-name")]/span/text()').get(default='').strip() or None,
+        address=get_address(address),
+        phone=phones.get('local') or phones.get('toll free') or phones.get('accessible'),
+        fax=phones.get('fax'),
+        email=block.xpath('.//div[contains(@class, "col1")]/a[starts-with(@href, "mailto:")]/@href').get(default='')[len('mailto:'):] or None,
+        website=block.xpath('.//div[contains(@class, "col1")]/a[starts-with(@href, "http") and not(img)]/@href').get(),
+        director=director.get('name'),
+        services=list(SERVICES),
+        counties=get_counties(get_lines(block, './/div[contains(@class, "cil-counties")]/p//text()')),
+        url=url,
+    )
+
+# ILRU directory results page for a state code.
+URL = 'https://www.ilru.org/projects/cil-net/cil-center-and-association-directory-results/{state}'
+
 class ILRUSpider(scrapy.Spider):
     name = "ilru"
-    help = "scrapy crawl ilru -a [STATE]"
-    
-    def __init__(self, state='NY', **kwargs):
-        self.state = state
-        self.start_urls = [ f'https://www.ilru.org/projects/cil-net/cil-center-and-association-directory-results/{state}' ]
+    help = "scrapy crawl ilru -a state=[STATE] | -a states=[STATE,STATE,...]"
+
+    def __init__(self, state='NY', states=None, **kwargs):
+        if isinstance(states, str):
+            states = states.split(',')
+        self.states = [ code.strip().upper() for code in (states if states else [ state ]) if code.strip() ]
+        self.state = self.states[0]
+        self.start_urls = [ URL.format(state=code) for code in self.states ]
+        self.started = None
+        self.finished = {}
         super().__init__(**kwargs)
-        
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        """Schedule every state up front, so the downloader (and AutoThrottle) can work on them concurrently."""
+        self.started = time.time()
+        for code, url in zip(self.states, self.start_urls):
+            yield scrapy.Request(url, callback=self.parse, meta={ 'state': code })
+
+    def record(self, response):
+        """Record per-state page counts and download latency in the crawl stats (ilru/<STATE>/*)."""
+        stats = self.crawler.stats if getattr(self, 'crawler', None) else None
+        if not stats:
+            return
+        state = response.meta.get('state', self.state)
+        latency = response.meta.get('download_latency', 0.0) * 1000.0
+        stats.inc_value(f'ilru/{state}/pages')
+        stats.inc_value(f'ilru/{state}/latency_total_ms', latency)
+        stats.max_value(f'ilru/{state}/latency_max_ms', latency)
+        self.finished[state] = time.time()
+
     def parse(self, response):
-        # page = response.url.split("/")[-2]
-        filename = f'ilru-{self.state}-results.html'
-        cils, soup = get_cils(response)
-        with open(filename, 'w') as f:
-            for cil in cils:
-                f.write(('=' * 10) + '\n' + cil.prettify())
-        self.log(f'Saved file {filename}')
-        
-        
-        # Selectors:
-        # response.css('#block-system-main').xpath('.//div').
\ No newline at end of file
+        """Yield one DrseItem per CIL block, using the response's own (already parsed) selector tree."""
+        self.record(response)
+        for block in response.css('div.cil-block'):
+            yield get_cil(block, response.url)
+
+    def closed(self, reason):
+        """Report pages/sec and mean latency per state."""
+        stats = self.crawler.stats if getattr(self, 'crawler', None) else None
+        if not stats or self.started is None:
+            return
+        for state in self.states:
+            pages = stats.get_value(f'ilru/{state}/pages', 0)
+            elapsed = self.finished.get(state, self.started) - self.started
+            if pages:
+                stats.set_value(f'ilru/{state}/pages_per_second', pages / elapsed if elapsed else 0.0)
+                stats.set_value(f'ilru/{state}/latency_avg_ms', stats.get_value(f'ilru/{state}/latency_total_ms', 0.0) / pages)
+                stats.set_value(f'ilru/{state}/seconds', elapsed)
@@ -4,7 +4,8 @@
 #
 # Utility function related to serializing and deserializing data.
 """
-from typing import Any, List, Dict, Tuple, Optional, Callable, TextIO, BinaryIO, Union
+from typing import Any, List, Dict, Tuple, Optional, Callable, Iterable, Iterator, TextIO, BinaryIO, Union
+from itertools import chain, islice
 
 import sys, json, csv, attr
 
@@ -39,6 +40,34 @@ class CallableDict(object):
         """
         return self.callbacks.get(key, default)
 
+def chunks(data: Iterable[Any], size: int = 1000) -> Iterator[List[Any]]:
+    """Split an iterable into lists of at most size elements, without materializing it.
+
+    :param data: Iterable (or iterator) to split.
+    :type data: Iterable[Any]
+    :param size: Maximum elements per chunk, defaults to 1000.
+    :type size: int, optional
+    :return: Generator of chunks.
+    :rtype: Iterator[List[Any]]
+    """
+    iterator = iter(data)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def peek(data: Iterable[Any]) -> Tuple[Optional[Any], Iterator[Any]]:
+    """Get the first element of an iterable, and an iterator that still yields every element.
+
+    :return: Tuple of (first element or None, iterator).
+    :rtype: Tuple[Optional[Any], Iterator[Any]]
+    """
+    iterator = iter(data)
+    for first in iterator:
+        return first, chain([ first ], iterator)
+    return None, iter(())
+
 ###########################
 # DATA LOADERS
 ###########################
@@ -62,6 +91,30 @@ def from_tsv(file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = No
     data = [ row for row in reader ]
     return transformer(data) if transformer and callable(transformer) else data
 
+# Streaming loaders yield one record at a time; their transformer is applied to each record.
+
+@loaders.register
+def iter_csv(file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = None, **kwargs: Any) -> Iterator[Any]:
+    for row in csv.DictReader(file, **kwargs):
+        yield transformer(row) if transformer and callable(transformer) else row
+
+@loaders.register
+def iter_tsv(file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = None, **kwargs: Any) -> Iterator[Any]:
+    for row in csv.DictReader(file, **kwargs, dialect=csv.excel_tab):
+        yield transformer(row) if transformer and callable(transformer) else row
+
+@loaders.register
+def iter_jsonl(file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = None, **kwargs: Any) -> Iterator[Any]:
+    for line in file:
+        if line.strip():
+            record = json.loads(line, **kwargs)
+            yield transformer(record) if transformer and callable(transformer) else record
+
+@loaders.register
+def from_jsonl(file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = None, **kwargs: Any) -> Any:
+    data = list(iter_jsonl(file, **kwargs))
+    return transformer(data) if transformer and callable(transformer) else data
+
 ###########################
 # DATA WRITERS
 ###########################
@@ -69,32 +122,50 @@ def from_tsv(file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = No
 writers = CallableDict()
 
 @writers.register
-def to_json(data: Any, file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = lambda data: data, **kwargs: Any) -> None:
-    json.dump(transformer(data), file, **kwargs)
-    
+def to_json(data: Any, file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = lambda data: data, chunk_size: int = 1000, **kwargs: Any) -> None:
+    data = transformer(data)
+    if isinstance(data, (list, tuple, dict, str, int, float, bool)) or data is None:
+        json.dump(data, file, **kwargs)
+        return
+    # Iterators are written as a JSON array, one chunk of elements at a time.
+    file.write('[')
+    separator = ''
+    for chunk in chunks(data, chunk_size):
+        file.write(separator + ', '.join(json.dumps(record, **kwargs) for record in chunk))
+        separator = ', '
+    file.write(']')
+
 @writers.register
-def to_csv(data: Any, file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = lambda data: data, fieldnames: List[str] = None, include_header: bool = True, **kwargs: Any) -> None:
-    writer = csv.DictWriter(file, fieldnames=fieldnames, **kwargs)
-    if include_header:
-        writer.writeheader()
-    writer.writerows(transformer(data))
+def to_jsonl(data: Any, file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = lambda data: data, chunk_size: int = 1000, **kwargs: Any) -> None:
+    for chunk in chunks(transformer(data), chunk_size):
+        file.write(''.join(json.dumps(record, **kwargs) + '\n' for record in chunk))
 
 @writers.register
-def to_tsv(data: Any, file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = lambda data: data, fieldnames: List[str] = None, include_header: bool = True, **kwargs: Any) -> None:
-    writer = csv.DictWriter(file, dialect=csv.excel_tab, fieldnames=fieldnames, **kwargs)
+def to_csv(data: Any, file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = lambda data: data, fieldnames: List[str] = None, include_header: bool = True, chunk_size: int = 1000, **kwargs: Any) -> None:
+    first, rows = peek(transformer(data))
+    if first is None and not fieldnames:
+        return
+    writer = csv.DictWriter(file, fieldnames=fieldnames if fieldnames else list(first.keys()), **kwargs)
     if include_header:
         writer.writeheader()
-    writer.writerows(transformer(data))
+    for chunk in chunks(rows, chunk_size):
+        writer.writerows(chunk)
+
+@writers.register
+def to_tsv(data: Any, file: Union[TextIO, BinaryIO], transformer: Callable[..., Any] = lambda data: data, fieldnames: List[str] = None, include_header: bool = True, chunk_size: int = 1000, **kwargs: Any) -> None:
+    to_csv(data, file, transformer=transformer, fieldnames=fieldnames, include_header=include_header, chunk_size=chunk_size, dialect=csv.excel_tab, **kwargs)
     
 ###########################
 # UTILITY FUNCTIONS
 ###########################
 
 def load(file: Union[TextIO, BinaryIO], format: str, transformer: Callable[..., Any] = lambda data: data, **kwargs: Any) -> Any:
+    """Read data with the named loader (eg. 'from_csv'). The 'iter_*' loaders return generators for streaming."""
     loader = loaders.get(format)
     return loader(file, transformer=transformer, **kwargs)
 
-def dump(data: Any, file: Union[TextIO, BinaryIO], format: str, transformer: Callable[..., Any] = lambda data: data, **kwargs: Any) -> None:
+def dump(data: Any, file: Union[TextIO, BinaryIO], format: str, transformer: Callable[..., Any] = lambda data: data, chunk_size: int = 1000, **kwargs: Any) -> None:
+    """Write data with the named writer (eg. 'to_jsonl'). Iterators (eg. a Mongo cursor or a streaming loader) are written chunk_size records at a time, in constant memory."""
     writer = writers.get(format)
-    return writer(data, file, transformer=transformer, **kwargs)
+    return writer(data, file, transformer=transformer, chunk_size=chunk_size, **kwargs)
 
@@ -0,0 +1,85 @@
+"""
+# fanout.py
+# @author Ian Effendi
+#
+# Serialize-once, fan-out writers for generated output filenames.
+"""
+import io, os, queue, threading
+
+from typing import Any, List
+
+###########################
+# FAN-OUT FILE
+###########################
+
+class FanOut(io.RawIOBase):
+    """Binary file-like object copying every write to several files.
+
+    Each target file has its own buffered handle and writer thread, so the same serialized bytes
+    are written to every file in parallel. Memory is bounded by the per-file queue size.
+
+    :param paths: Files to write.
+    :type paths: List[str]
+    :param buffering: Buffer size of each file, defaults to 1 MiB.
+    :type buffering: int, optional
+    :param mode: File mode, 'wb' or 'ab', defaults to 'wb'.
+    :type mode: str, optional
+    :param depth: Chunks queued per file before write() blocks, defaults to 64.
+    :type depth: int, optional
+    """
+
+    def __init__(self, paths: List[str], buffering: int = 1 << 20, mode: str = 'wb', depth: int = 64):
+        super().__init__()
+        self.paths = list(paths)
+        self.bytes = 0
+        self.writes = 0
+        self.errors: List[BaseException] = []
+        self.queues = [ queue.Queue(maxsize=depth) for _ in self.paths ]
+        self.threads = []
+        for path, pending in zip(self.paths, self.queues):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            thread = threading.Thread(target=self.drain, args=(open(path, mode, buffering=buffering), pending), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def drain(self, file: io.BufferedWriter, pending: queue.Queue) -> None:
+        with file:
+            while True:
+                chunk = pending.get()
+                if chunk is None:
+                    return
+                try:
+                    file.write(chunk)
+                except BaseException as e:
+                    self.errors.append(e)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        if self.closed:
+            raise ValueError("write to closed FanOut.")
+        # Copy once: callers (eg. io.TextIOWrapper) may reuse the buffer behind a memoryview.
+        chunk = bytes(b)
+        for pending in self.queues:
+            pending.put(chunk)
+        self.bytes += len(chunk)
+        self.writes += 1
+        return len(chunk)
+
+    def close(self) -> None:
+        """Flush and close every target file.
+
+        :raises OSError: Raised if a write to any target failed.
+        """
+        if self.closed:
+            return
+        for pending in self.queues:
+            pending.put(None)
+        for thread in self.threads:
+            thread.join()
+        super().close()
+        if self.errors:
+            raise OSError(f"Failed to write {len(self.errors)} chunk(s): {self.errors[0]}")
@@ -0,0 +1,186 @@
+# autocomplete.py
+# Author: Ian Effendi
+#
+# Prefix autocomplete over facility names, disability/service categories and city names.
+#
+# Every phrase is indexed under each of its word-start suffixes ("center for deaf access" under
+# "center for deaf access", "for deaf access", "deaf access" and "access"), so "deaf acc" completes
+# it. Keys live in one sorted array, and a prefix query is two binary searches for the key range.
+# Entries are numbered by descending weight, so the top-k completions are the k smallest distinct
+# entry numbers in the range; short prefixes (whose ranges are the largest) are precomputed.
+import bisect
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from config import settings
+from connection.schema import resolve
+from search.text import TOKEN_PATTERN, flatten
+
+# Entry kinds.
+FACILITY = 'facility'
+DISABILITY = 'disability'
+SERVICE = 'service'
+CITY = 'city'
+
+# Sorts after every character a normalized key can contain.
+END = '\uffff'
+
+def normalize(text: Any) -> str:
+    """
+    Normalize a phrase or query for prefix matching: lowercase alphanumeric words separated by single spaces.
+    A trailing space is kept, so "deaf " only matches whole words.
+    :returns: Normalized string.
+    """
+    text = str(text).lower()
+    words = ' '.join(TOKEN_PATTERN.findall(text))
+    return words + ' ' if words and text[-1:].isspace() else words
+
+def suffixes(key: str) -> List[str]:
+    """Get the word-start suffixes of a normalized phrase."""
+    starts = [ 0 ] + [ i + 1 for i, char in enumerate(key) if char == ' ' ]
+    return [ key[start:] for start in starts if start < len(key) ]
+
+class Autocomplete:
+    """Sorted-array prefix index returning the top-k weighted completions of a partial query."""
+
+    def __init__(self, limit: int = 10, cached: int = 2):
+        self.limit = limit
+        self.cached = cached
+        self.weights: Counter = Counter()
+        self.texts: List[str] = []
+        self.kinds: List[str] = []
+        self.scores: np.ndarray = np.zeros(0)
+        self.keys: List[str] = []
+        self.ids: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.kind_names: List[str] = []
+        self.kind_ids: np.ndarray = np.zeros(0, dtype=np.int8)
+        self.cache: Dict[Tuple[str, int], np.ndarray] = {}
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    ###########################
+    # BUILDING
+    ###########################
+
+    def add(self, text: Any, kind: str = FACILITY, weight: float = 1.0) -> 'Autocomplete':
+        """Add a phrase, or add weight to it if it was already added with the same kind."""
+        for part in flatten(text):
+            part = ' '.join(part.split())
+            if normalize(part):
+                self.weights[(kind, part)] += weight
+                self.built = False
+        return self
+
+    def extend(self, phrases: Iterable[Tuple[Any, str, float]]) -> 'Autocomplete':
+        """Add (text, kind, weight) tuples."""
+        for text, kind, weight in phrases:
+            self.add(text, kind, weight)
+        return self
+
+    def build(self) -> 'Autocomplete':
+        """Number the entries by descending weight, sort the suffix keys and precompute the short prefixes."""
+        entries = sorted(self.weights.items(), key=lambda item: (-item[1], item[0][1].lower(), item[0][0]))
+        self.texts = [ text for (_, text), _ in entries ]
+        self.kinds = [ kind for (kind, _), _ in entries ]
+        self.scores = np.array([ weight for _, weight in entries ], dtype=np.float64)
+        names = sorted(set(self.kinds))
+        codes = { kind: i for i, kind in enumerate(names) }
+        self.kind_names = names
+        self.kind_ids = np.array([ codes[kind] for kind in self.kinds ], dtype=np.int8)
+        pairs = sorted((key, entry) for entry, text in enumerate(self.texts) for key in suffixes(normalize(text)))
+        self.keys = [ key for key, _ in pairs ]
+        self.ids = np.array([ entry for _, entry in pairs ], dtype=np.int32)
+        self.cache = {}
+        self.built = True
+        # Short prefixes, overall (kind -1) and per kind.
+        prefixes = { key[:length] for key in self.keys for length in range(1, self.cached + 1) if len(key) >= length }
+        for prefix in prefixes:
+            candidates = self.candidates(prefix)
+            self.cache[(prefix, -1)] = self.top(candidates, self.limit)
+            for code in range(len(names)):
+                self.cache[(prefix, code)] = self.top(candidates[self.kind_ids[candidates] == code], self.limit)
+        return self
+
+    ###########################
+    # QUERIES
+    ###########################
+
+    def candidates(self, prefix: str) -> np.ndarray:
+        """Get the entry numbers of every key starting with a normalized prefix (with repeats)."""
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + END, lo)
+        return self.ids[lo:hi]
+
+    @staticmethod
+    def top(candidates: np.ndarray, limit: int) -> np.ndarray:
+        """
+        Get the limit smallest distinct entry numbers (the best weighted entries).
+        Large ranges are partitioned first; an entry repeats at most once per word, so 8x the limit is nearly always enough.
+        """
+        if len(candidates) > 8 * limit:
+            best = np.unique(np.partition(candidates, 8 * limit)[:8 * limit])
+            if len(best) >= limit:
+                return best[:limit]
+        return np.unique(candidates)[:limit]
+
+    def complete(self, query: str, limit: int = None, kinds: Iterable[str] = None) -> List[Tuple[str, str, float]]:
+        """
+        Complete a partial query.
+        :param kinds: Entry kinds to return (facility, disability, service, city), defaults to all.
+        :returns: List of (text, kind, weight) tuples, best first.
+        """
+        if not self.built:
+            self.build()
+        limit = limit if limit else self.limit
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        codes = [ self.kind_names.index(kind) for kind in kinds if kind in self.kind_names ] if kinds else [ -1 ]
+        if limit <= self.limit and (prefix, codes[0] if codes else -1) in self.cache:
+            entries = np.unique(np.concatenate([ self.cache[(prefix, code)] for code in codes ] or [ self.ids[:0] ]))[:limit]
+        else:
+            candidates = self.candidates(prefix)
+            if kinds:
+                candidates = candidates[np.isin(self.kind_ids[candidates], codes)]
+            entries = self.top(candidates, limit)
+        return [ (self.texts[entry], self.kinds[entry], float(self.scores[entry])) for entry in entries.tolist() ]
+
+def build_autocomplete(documents: Iterable[Dict[str, Any]] = None, disabilities: Iterable[Dict[str, Any]] = None,
+                       services: Iterable[Dict[str, Any]] = None, zipcodes: Iterable[Dict[str, Any]] = None, **kwargs: Any) -> Autocomplete:
+    """
+    Build the autocomplete index. Sources that are not provided are read from the database:
+    facility names (weighted by how many providers share the name), glossary.disability_category and
+    glossary.service_category `cat` values (weighted by how many providers list them) and the region.zipcodes
+    cities (weighted by population).
+    :returns: Built Autocomplete.
+    """
+    config = settings.get('search', {})
+    options = { 'limit': config.get('limit', 10), **kwargs }
+    if any(source is None for source in (documents, disabilities, services, zipcodes)):
+        from connection.database import Database
+        client = Database.CLIENT
+        if documents is None:
+            documents = client[config.get('database', 'providers')][config.get('collection', 'services')].find({}, { 'facility': 1, 'category': 1 })
+        disabilities = disabilities if disabilities is not None else client['glossary']['disability_category'].find({}, { 'cat': 1 })
+        services = services if services is not None else client['glossary']['service_category'].find({}, { 'cat': 1 })
+        zipcodes = zipcodes if zipcodes is not None else client['region']['zipcodes'].find({}, { 'city': 1, 'pop': 1 })
+
+    index = Autocomplete(**options)
+    usage: Counter = Counter()
+    for document in documents:
+        index.add(resolve(document, 'facility'), FACILITY)
+        for kind, field in ((DISABILITY, 'category.disability'), (SERVICE, 'category.service')):
+            for value in flatten(resolve(document, field)):
+                usage[(kind, value.strip().lower())] += 1
+    for kind, rows in ((DISABILITY, disabilities), (SERVICE, services)):
+        for row in rows:
+            for value in flatten(row.get('cat')):
+                index.add(value, kind, 1.0 + usage[(kind, value.strip().lower())])
+    for row in zipcodes:
+        pop = row.get('pop')
+        index.add(row.get('city'), CITY, float(pop) if pop is not None and pop == pop and pop > 0 else 1.0)
+    return index.build()
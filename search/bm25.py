@@ -0,0 +1,199 @@
+# bm25.py
+# Author: Ian Effendi
+#
+# In-process inverted index over provider documents, ranked with Okapi BM25.
+import math
+import uuid
+import heapq
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from config import settings
+from connection.database import Database
+from connection.schema import get_collection, get_fields, resolve
+from search.text import tokenize
+
+class InvertedIndex:
+    """
+    Inverted index mapping each term to the documents containing it, with term frequencies.
+    Documents are stored by position; `key` names the document field used as its identity.
+    """
+
+    def __init__(self, fields: List[str], k1: float = 1.2, b: float = 0.75, key: str = '_id'):
+        self.fields = list(fields)
+        self.k1 = k1
+        self.b = b
+        self.key = key
+        self.documents: List[Any] = []
+        self.terms: List[Counter] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.positions: Dict[Any, int] = {}
+        self.count = 0
+        self.total_length = 0
+        self._norms = None
+        # Identifies this index in cached search keys (unlike id(), never reused by another index).
+        self.token = uuid.uuid4().hex
+        # Bumped on every change, so cached search results of an older state are never served.
+        self.generation = 0
+        # (database, collection) the documents were read from, used to key cached searches.
+        self.source = ('', '')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.positions
+
+    def analyze(self, document: Dict[str, Any]) -> List[str]:
+        """
+        Tokenize the indexed fields of a document.
+        :returns: List of tokens.
+        """
+        tokens = []
+        for field in self.fields:
+            tokens.extend(tokenize(resolve(document, field)))
+        return tokens
+
+    def add(self, document: Dict[str, Any]) -> int:
+        """
+        Add a document to the index, replacing any document with the same key.
+        :returns: Position of the document in the index.
+        """
+        key = document.get(self.key, len(self.documents))
+        if key in self.positions:
+            self.remove(key)
+        position = len(self.documents)
+        terms = Counter(self.analyze(document))
+        length = sum(terms.values())
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[position] = tf
+        self.documents.append(document)
+        self.terms.append(terms)
+        self.lengths.append(length)
+        self.positions[key] = position
+        self.count += 1
+        self.total_length += length
+        self._norms = None
+        self.generation += 1
+        return position
+
+    def extend(self, documents: Iterable[Dict[str, Any]]) -> 'InvertedIndex':
+        """
+        Add every document in an iterable (eg. a pymongo cursor).
+        :returns: This index.
+        """
+        for document in documents:
+            self.add(document)
+        return self
+
+    def remove(self, key: Any) -> bool:
+        """
+        Remove the document with the given key.
+        :returns: bool, True if a document was removed.
+        """
+        position = self.positions.pop(key, None)
+        if position is None:
+            return False
+        for term in self.terms[position]:
+            postings = self.postings[term]
+            del postings[position]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.lengths[position]
+        self.documents[position] = None
+        self.terms[position] = Counter()
+        self.lengths[position] = 0
+        self.count -= 1
+        self._norms = None
+        self.generation += 1
+        return True
+
+    def idf(self, term: str) -> float:
+        """
+        Inverse document frequency of a term, using the non-negative BM25 variant.
+        :returns: 0.0 if the term is not indexed.
+        """
+        df = len(self.postings.get(term, ()))
+        if not df:
+            return 0.0
+        return math.log(1.0 + (self.count - df + 0.5) / (df + 0.5))
+
+    def norms(self) -> List[float]:
+        """
+        Per-document length normalization, k1 * (1 - b + b * length / avgdl), cached between updates.
+        :returns: List of norms by position.
+        """
+        if self._norms is None:
+            average = (self.total_length / self.count) if self.count else 1.0
+            average = average or 1.0
+            self._norms = [self.k1 * (1.0 - self.b + self.b * length / average) for length in self.lengths]
+        return self._norms
+
+    def score(self, query: str) -> Dict[int, float]:
+        """
+        Accumulate BM25 scores for every document matching at least one query term.
+        :returns: Dict of position to score.
+        """
+        norms = self.norms()
+        k1 = self.k1 + 1.0
+        scores: Dict[int, float] = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            weight = self.idf(term) * qtf
+            for position, tf in postings.items():
+                scores[position] = scores.get(position, 0.0) + weight * tf * k1 / (tf + norms[position])
+        return scores
+
+    def search(self, query: str, limit: int = 10, predicate: Callable[[Any], bool] = None, speller: Any = None, cache: Any = None) -> List[Tuple[Any, float]]:
+        """
+        Rank documents against a free-text query, corrected first by speller (a search.spelling.SymSpell) if given.
+        :param cache: connection.cache.QueryCache to serve repeated queries from, keyed on the sorted query terms,
+                      the index token and generation, and the source collection generation. Not used with a predicate.
+                      Cached results are copies, so callers may modify the documents.
+        :returns: List of (document, score) tuples, best first. Empty if nothing matches.
+        """
+        if speller is not None:
+            query = speller.correct(query)
+        if cache is not None and predicate is None:
+            database, collection = self.source
+            return cache.get(database, collection, 'search', self.token, self.generation, sorted(tokenize(query)), limit,
+                             load=lambda: self.search(query, limit))
+        scores = self.score(query)
+        if predicate:
+            scores = {position: score for position, score in scores.items() if predicate(self.documents[position])}
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1]) if limit else sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.documents[position], score) for position, score in best]
+
+def text_fields(database: str = None, collection: str = None) -> List[str]:
+    """
+    Get the fields flagged `text = true` in the settings.toml schema for a collection.
+    :returns: List of (dotted) field names.
+    """
+    config = settings.get('search', {})
+    database = database if database else config.get('database', 'providers')
+    collection = collection if collection else config.get('collection', 'services')
+    return get_fields(get_collection(database, collection), flag='text')
+
+def build_index(documents: Iterable[Dict[str, Any]] = None, database: str = None, collection: str = None,
+                projection: Dict[str, Any] = None, **kwargs: Any) -> InvertedIndex:
+    """
+    Build a BM25 index over the configured search collection.
+    If documents are not provided, they are read from the database (whole documents, unless a projection is given).
+    :returns: InvertedIndex.
+    """
+    config = settings.get('search', {})
+    database = database if database else config.get('database', 'providers')
+    collection = collection if collection else config.get('collection', 'services')
+    options = {
+        'k1': config.get('k1', 1.2),
+        'b': config.get('b', 0.75),
+        **kwargs
+    }
+    index = InvertedIndex(text_fields(database, collection), **options)
+    index.source = (database, collection)
+    if documents is None:
+        documents = Database.CLIENT[database][collection].find({}, projection)
+    return index.extend(documents)
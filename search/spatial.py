@@ -0,0 +1,208 @@
+# spatial.py
+# Author: Ian Effendi
+#
+# "Providers near me": radius, k-nearest and bounding-box queries over provider coordinates.
+#
+# SpatialIndex answers in-process from a KD-tree over address.coordinates. MongoSpatial pushes the
+# same queries down to MongoDB when the collection has a 2dsphere index on the GeoJSON field
+# (address.geometry). get_spatial() picks whichever is available. Both return (document, km)
+# tuples sorted by distance, and accept field filters such as { 'category.service': ['Advocacy'] }.
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from connection.schema import resolve
+from geocoding.kdtree import KDTree, haversine
+from utils.address import to_geometry
+
+Point = Tuple[float, float]
+Filters = Dict[str, Any]
+
+def get_point(document: Dict[str, Any], field: str = 'address.coordinates') -> Optional[Point]:
+    """
+    Get the (latitude, longitude) of a document.
+    :returns: None if the document has no usable coordinates.
+    """
+    coordinates = resolve(document, field) or {}
+    latitude, longitude = coordinates.get('latitude'), coordinates.get('longitude')
+    if latitude is None or longitude is None or latitude != latitude or longitude != longitude:
+        return None
+    return float(latitude), float(longitude)
+
+def get_origin(origin: Union[Point, str, int], geocoder: Any = None) -> Point:
+    """
+    Resolve a query origin: a (latitude, longitude) point, or a zip code looked up with the (offline) geocoder.
+    :raises ValueError: Raised if a zip code cannot be resolved.
+    :returns: (latitude, longitude).
+    """
+    if isinstance(origin, (tuple, list)):
+        return float(origin[0]), float(origin[1])
+    place = geocoder.geocode(str(origin)) if geocoder else None
+    if place is None:
+        raise ValueError(f"Unable to locate origin '{origin}'.")
+    return place.latitude, place.longitude
+
+def matches(document: Dict[str, Any], filters: Filters = None) -> bool:
+    """
+    Check a document against field filters. A filter value may be a single value or a list of
+    alternatives; list-valued fields match if any element matches. String comparison ignores case.
+    :returns: bool, True if every filter matches.
+    """
+    if not filters:
+        return True
+    for field, expected in filters.items():
+        values = resolve(document, field)
+        values = values if isinstance(values, (list, tuple, set)) else [ values ]
+        expected = expected if isinstance(expected, (list, tuple, set)) else [ expected ]
+        wanted = set(str(value).lower() if isinstance(value, str) else value for value in expected)
+        if not any((str(value).lower() if isinstance(value, str) else value) in wanted for value in values):
+            return False
+    return True
+
+def bounding_radius(south: float, west: float, north: float, east: float) -> Tuple[Point, float]:
+    """
+    Get a circle enclosing a bounding box, for pruning a box query with a radius query.
+    :returns: (center, radius in km).
+    """
+    if east < west:
+        east += 360.0
+    center = ((south + north) / 2.0, ((west + east) / 2.0 + 180.0) % 360.0 - 180.0)
+    corners = [ (south, west), (south, east), (north, west), (north, east), (south, center[1]), (north, center[1]) ]
+    return center, max(haversine(center, corner) for corner in corners)
+
+def in_box(point: Point, south: float, west: float, north: float, east: float) -> bool:
+    """Check if a point lies in a box. A box with west > east crosses the antimeridian."""
+    latitude, longitude = point
+    if not south <= latitude <= north:
+        return False
+    return west <= longitude <= east if west <= east else (longitude >= west or longitude <= east)
+
+class SpatialIndex:
+    """In-process spatial index over provider documents."""
+
+    def __init__(self, documents: Iterable[Dict[str, Any]] = (), field: str = 'address.coordinates'):
+        self.field = field
+        self.documents: List[Dict[str, Any]] = []
+        self.points: List[Point] = []
+        self.tree: KDTree = None
+        self.extend(documents)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def extend(self, documents: Iterable[Dict[str, Any]]) -> 'SpatialIndex':
+        """Add documents; those without coordinates are skipped. The tree is rebuilt on the next query."""
+        for document in documents:
+            point = get_point(document, self.field)
+            if point:
+                self.documents.append(document)
+                self.points.append(point)
+        self.tree = None
+        return self
+
+    def get_tree(self) -> KDTree:
+        if self.tree is None:
+            self.tree = KDTree(self.points)
+        return self.tree
+
+    def radius(self, origin: Point, radius_km: float, filters: Filters = None, limit: int = None) -> List[Tuple[Any, float]]:
+        """
+        Find documents within radius_km of origin.
+        :returns: List of (document, distance in km), closest first.
+        """
+        found = [ (self.documents[i], distance) for i, distance in self.get_tree().within(origin[0], origin[1], radius_km)
+                  if matches(self.documents[i], filters) ]
+        return found[:limit] if limit else found
+
+    def nearest(self, origin: Point, k: int = 10, filters: Filters = None, radius_km: float = None) -> List[Tuple[Any, float]]:
+        """
+        Find the k documents closest to origin that pass the filters. The candidate set is doubled
+        until k matches are found, so selective filters do not force a full scan up front.
+        :returns: List of (document, distance in km), closest first.
+        """
+        tree = self.get_tree()
+        size = k
+        while True:
+            candidates = tree.nearest(origin[0], origin[1], k=min(size, len(tree)))
+            found = [ (self.documents[i], distance) for i, distance in candidates
+                      if (radius_km is None or distance <= radius_km) and matches(self.documents[i], filters) ]
+            exhausted = size >= len(tree) or (radius_km is not None and candidates and candidates[-1][1] > radius_km)
+            if len(found) >= k or exhausted:
+                return found[:k]
+            size *= 2
+
+    def bbox(self, south: float, west: float, north: float, east: float, filters: Filters = None, limit: int = None) -> List[Tuple[Any, float]]:
+        """
+        Find documents inside a bounding box, sorted by distance from its center.
+        :returns: List of (document, distance from center in km).
+        """
+        center, radius = bounding_radius(south, west, north, east)
+        found = [ (document, distance) for document, distance in self.radius(center, radius, filters)
+                  if in_box(get_point(document, self.field), south, west, north, east) ]
+        return found[:limit] if limit else found
+
+class MongoSpatial:
+    """Spatial queries pushed down to a MongoDB collection with a 2dsphere index."""
+
+    def __init__(self, collection: Any, field: str = 'address.geometry'):
+        self.collection = collection
+        self.field = field
+
+    def get_point(self, document: Dict[str, Any]) -> Optional[Point]:
+        geometry = resolve(document, self.field) or {}
+        coordinates = geometry.get('coordinates')
+        return (coordinates[1], coordinates[0]) if coordinates else None
+
+    @staticmethod
+    def to_query(filters: Filters = None) -> Dict[str, Any]:
+        query = {}
+        for field, value in (filters or {}).items():
+            query[field] = { '$in': list(value) } if isinstance(value, (list, tuple, set)) else value
+        return query
+
+    def geo_near(self, origin: Point, filters: Filters = None, radius_km: float = None, limit: int = None) -> List[Tuple[Any, float]]:
+        stage = {
+            'near': { 'type': 'Point', 'coordinates': [ origin[1], origin[0] ] },
+            'key': self.field,
+            'distanceField': '_distance',
+            'spherical': True,
+            'query': self.to_query(filters),
+        }
+        if radius_km is not None:
+            stage['maxDistance'] = radius_km * 1000.0
+        pipeline = [ { '$geoNear': stage } ]
+        if limit:
+            pipeline.append({ '$limit': limit })
+        return [ (document, document.pop('_distance') / 1000.0) for document in self.collection.aggregate(pipeline) ]
+
+    def radius(self, origin: Point, radius_km: float, filters: Filters = None, limit: int = None) -> List[Tuple[Any, float]]:
+        return self.geo_near(origin, filters, radius_km=radius_km, limit=limit)
+
+    def nearest(self, origin: Point, k: int = 10, filters: Filters = None, radius_km: float = None) -> List[Tuple[Any, float]]:
+        return self.geo_near(origin, filters, radius_km=radius_km, limit=k)
+
+    def bbox(self, south: float, west: float, north: float, east: float, filters: Filters = None, limit: int = None) -> List[Tuple[Any, float]]:
+        center, radius = bounding_radius(south, west, north, east)
+        found = [ (document, distance) for document, distance in self.geo_near(center, filters, radius_km=radius)
+                  if in_box(self.get_point(document), south, west, north, east) ]
+        return found[:limit] if limit else found
+
+def has_2dsphere(collection: Any, field: str = 'address.geometry') -> bool:
+    """
+    Check if a pymongo collection has a 2dsphere index on field.
+    :returns: bool, False if the index information cannot be read.
+    """
+    try:
+        return any((field, '2dsphere') in [ tuple(key) for key in info['key'] ] for info in collection.index_information().values())
+    except Exception:
+        return False
+
+def get_spatial(collection: Any = None, documents: Iterable[Dict[str, Any]] = None, field: str = 'address.geometry') -> Union[MongoSpatial, SpatialIndex]:
+    """
+    Get a spatial query engine: pushed down to MongoDB when the collection has a 2dsphere index on field,
+    otherwise an in-process index over the given documents (or every document in the collection).
+    :returns: MongoSpatial or SpatialIndex.
+    """
+    if collection is not None and has_2dsphere(collection, field):
+        return MongoSpatial(collection, field)
+    if documents is None:
+        documents = collection.find({ 'address.coordinates.latitude': { '$ne': None } }) if collection is not None else []
+    return SpatialIndex(documents)
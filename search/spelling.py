@@ -0,0 +1,213 @@
+# spelling.py
+# Author: Ian Effendi
+#
+# Typo-tolerant query correction with a symmetric-delete (SymSpell) dictionary.
+#
+# Every vocabulary word is indexed under each string obtained by deleting up to max_distance characters
+# from its first prefix_length characters. A misspelled term generates its own deletes the same way, and
+# any word sharing a delete is a candidate, so correction is a handful of hash lookups plus an edit
+# distance check on those few candidates, instead of a scan over the whole vocabulary. The dictionary is
+# precomputed and persisted (pickle), so it is built once per vocabulary.
+import os
+import pickle
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from config import settings
+from connection.schema import resolve
+from search.text import STOPWORDS, TOKEN_PATTERN, tokenize
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions), cut off early.
+    :returns: Distance, or limit + 1 if it exceeds limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [ i ] + [ 0 ] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        # A transposition can reach back one row, so stop once two consecutive rows exceed the limit.
+        if min(current) > limit and min(previous) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+def deletes(word: str, distance: int) -> Set[str]:
+    """
+    Get every string made by deleting up to distance characters from word (word included).
+    :returns: Set of strings.
+    """
+    results = { word }
+    frontier = { word }
+    for _ in range(distance):
+        frontier = { item[:i] + item[i + 1:] for item in frontier for i in range(len(item)) }
+        results |= frontier
+    return results
+
+class SymSpell:
+    """Symmetric-delete spelling dictionary over a weighted vocabulary."""
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7, min_length: int = 3):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.min_length = min_length
+        self.words: Counter = Counter()
+        self.vocabulary: List[str] = []
+        # Delete -> word index, or list of word indices if several words share it.
+        self.deletes: Dict[str, Union[int, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.words
+
+    ###########################
+    # BUILDING
+    ###########################
+
+    def add(self, word: str, count: int = 1) -> 'SymSpell':
+        """Add a (normalized) vocabulary word, or add to its count."""
+        if word not in self.words:
+            index = len(self.vocabulary)
+            self.vocabulary.append(word)
+            for delete in deletes(word[:self.prefix_length], self.max_distance):
+                indices = self.deletes.setdefault(delete, index)
+                if isinstance(indices, list):
+                    indices.append(index)
+                elif indices != index:
+                    self.deletes[delete] = [ indices, index ]
+        self.words[word] += count
+        return self
+
+    def extend(self, values: Iterable[Any]) -> 'SymSpell':
+        """Add the tokens of every value (str, list or nested dict), stopwords excluded."""
+        for value in values:
+            for token in tokenize(value):
+                self.add(token)
+        return self
+
+    ###########################
+    # PERSISTENCE
+    ###########################
+
+    def save(self, path: str) -> str:
+        """
+        Write the dictionary atomically.
+        :returns: path.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = path + '.tmp'
+        with open(temp, 'wb') as file:
+            pickle.dump(self.__dict__, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'SymSpell':
+        """
+        Read a dictionary written by save().
+        :raises FileNotFoundError: Raised if path does not exist.
+        """
+        speller = cls()
+        with open(path, 'rb') as file:
+            speller.__dict__.update(pickle.load(file))
+        return speller
+
+    ###########################
+    # CORRECTION
+    ###########################
+
+    def lookup(self, term: str, max_distance: int = None, best: bool = False) -> List[Tuple[str, int, int]]:
+        """
+        Find the vocabulary words within max_distance edits of a term.
+        :param best: Only keep the closest words, tightening the limit as closer candidates are found.
+        :returns: List of (word, distance, count), closest and then most frequent first.
+        """
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        if term in self.words:
+            return [ (term, 0, self.words[term]) ]
+        candidates: Set[int] = set()
+        for delete in deletes(term[:self.prefix_length], limit):
+            indices = self.deletes.get(delete)
+            if isinstance(indices, list):
+                candidates.update(indices)
+            elif indices is not None:
+                candidates.add(indices)
+        suggestions = []
+        for index in candidates:
+            word = self.vocabulary[index]
+            if abs(len(word) - len(term)) > limit:
+                continue
+            distance = edit_distance(term, word, limit)
+            if distance <= limit:
+                suggestions.append((word, distance, self.words[word]))
+                if best:
+                    limit = distance
+        suggestions.sort(key=lambda suggestion: (suggestion[1], -suggestion[2], suggestion[0]))
+        return [ suggestion for suggestion in suggestions if suggestion[1] <= limit ] if best else suggestions
+
+    def correct_word(self, term: str) -> str:
+        """
+        Correct a single (normalized) term. Known words, numbers, stopwords and short terms are kept.
+        Short words allow one edit, others max_distance.
+        :returns: Best suggestion, or term if there is none.
+        """
+        if term in self.words or term in STOPWORDS or len(term) < self.min_length or term.isdigit():
+            return term
+        suggestions = self.lookup(term, 1 if len(term) <= 4 else None, best=True)
+        return suggestions[0][0] if suggestions else term
+
+    def correct(self, query: str) -> str:
+        """
+        Rewrite a free-text query with every word corrected.
+        :returns: Lowercase corrected query.
+        """
+        return ' '.join(self.correct_word(term) for term in TOKEN_PATTERN.findall(str(query).lower()))
+
+def get_spelling_path() -> str:
+    return settings.get('search', {}).get('spelling', '.cache/spelling.pickle')
+
+def build_speller(documents: Iterable[Dict[str, Any]] = None, disabilities: Iterable[Dict[str, Any]] = None,
+                  services: Iterable[Dict[str, Any]] = None, zipcodes: Iterable[Dict[str, Any]] = None,
+                  path: str = None, **kwargs: Any) -> SymSpell:
+    """
+    Build and persist the spelling dictionary. Sources that are not provided are read from the database:
+    facility tokens and keywords of the providers, glossary.disability_category and glossary.service_category
+    `cat` values, and region.zipcodes city and county names. Word counts are how often each token occurs.
+    :returns: Built SymSpell.
+    """
+    config = settings.get('search', {})
+    options = { 'max_distance': config.get('max_distance', 2), **kwargs }
+    if any(source is None for source in (documents, disabilities, services, zipcodes)):
+        from connection.database import Database
+        client = Database.CLIENT
+        if documents is None:
+            documents = client[config.get('database', 'providers')][config.get('collection', 'services')].find({}, { 'facility': 1, 'keywords': 1, 'address.city': 1, 'address.county': 1 })
+        disabilities = disabilities if disabilities is not None else client['glossary']['disability_category'].find({}, { 'cat': 1 })
+        services = services if services is not None else client['glossary']['service_category'].find({}, { 'cat': 1 })
+        zipcodes = zipcodes if zipcodes is not None else client['region']['zipcodes'].find({}, { 'city': 1, 'county': 1 })
+
+    speller = SymSpell(**options)
+    speller.extend(resolve(document, field) for document in documents for field in ('facility', 'keywords', 'address.city', 'address.county'))
+    speller.extend(row.get('cat') for rows in (disabilities, services) for row in rows)
+    speller.extend(row.get(field) for row in zipcodes for field in ('city', 'county'))
+    speller.save(path if path else get_spelling_path())
+    return speller
+
+def load_speller(path: str = None) -> Optional[SymSpell]:
+    """
+    Load the persisted spelling dictionary.
+    :returns: None if it has not been built.
+    """
+    path = path if path else get_spelling_path()
+    return SymSpell.load(path) if os.path.exists(path) else None
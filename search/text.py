@@ -0,0 +1,43 @@
+# text.py
+# Author: Ian Effendi
+#
+# Text normalization and tokenization shared by the search indexes.
+import re
+from typing import Any, Iterable, List
+
+# Tokens are runs of letters and digits.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words too common to be useful for ranking.
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from',
+    'in', 'inc', 'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with',
+])
+
+def flatten(value: Any) -> Iterable[str]:
+    """
+    Flatten a field value (str, number, list or nested dict) into its string parts.
+    :returns: Generator of strings. Empty for None and NaN values.
+    """
+    if value is None:
+        return
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from flatten(item)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            yield from flatten(item)
+    elif value == value:
+        yield str(value)
+
+def tokenize(value: Any, stopwords: Iterable[str] = STOPWORDS) -> List[str]:
+    """
+    Split a field value into lowercase alphanumeric tokens, dropping stopwords.
+    :returns: List of tokens, in order of appearance.
+    """
+    tokens = []
+    for text in flatten(value):
+        tokens.extend(token for token in TOKEN_PATTERN.findall(text.lower()) if token not in stopwords)
+    return tokens
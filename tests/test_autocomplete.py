@@ -0,0 +1,56 @@
+# test_autocomplete.py
+# Author: Ian Effendi
+#
+# Behavioural tests for the prefix autocomplete index.
+from search.autocomplete import CITY, DISABILITY, FACILITY, Autocomplete, build_autocomplete, normalize
+
+def make_index(**kwargs) -> Autocomplete:
+    return Autocomplete(**kwargs).extend([
+        ('Center for Deaf Access', FACILITY, 3.0),
+        ('Deaf Services of Erie', FACILITY, 1.0),
+        ('Deafness', DISABILITY, 5.0),
+        ('Denver', CITY, 700000.0),
+        ('Independent Living Center', FACILITY, 2.0),
+    ]).build()
+
+def test_normalize_keeps_trailing_space():
+    assert normalize('  Deaf,  ACC') == 'deaf acc'
+    assert normalize('deaf ') == 'deaf '
+
+def test_completions_are_ranked_by_weight():
+    texts = [ text for text, _, _ in make_index().complete('de') ]
+    assert texts == [ 'Denver', 'Deafness', 'Center for Deaf Access', 'Deaf Services of Erie' ]
+
+def test_matches_any_word_start():
+    assert [ text for text, _, _ in make_index().complete('deaf acc') ] == [ 'Center for Deaf Access' ]
+    assert [ text for text, _, _ in make_index().complete('cent') ] == [ 'Center for Deaf Access', 'Independent Living Center' ]
+    assert make_index().complete('enter') == []
+
+def test_whole_word_prefix():
+    assert [ text for text, _, _ in make_index().complete('deaf ') ] == [ 'Center for Deaf Access', 'Deaf Services of Erie' ]
+
+def test_kinds_and_limit():
+    index = make_index()
+    assert [ text for text, _, _ in index.complete('de', kinds=[ FACILITY ]) ] == [ 'Center for Deaf Access', 'Deaf Services of Erie' ]
+    assert [ text for text, _, _ in index.complete('de', kinds=[ CITY, DISABILITY ]) ] == [ 'Denver', 'Deafness' ]
+    assert len(index.complete('de', limit=1)) == 1
+    assert index.complete('de', kinds=[ 'unknown' ]) == []
+
+def test_cached_and_uncached_prefixes_agree():
+    cached, uncached = make_index(cached=2), make_index(cached=0)
+    for query in ('d', 'de', 'c', 'i'):
+        for kinds in (None, [ FACILITY ], [ CITY, DISABILITY ]):
+            assert cached.complete(query, kinds=kinds) == uncached.complete(query, kinds=kinds)
+
+def test_build_autocomplete_weights_sources():
+    index = build_autocomplete(
+        documents=[ { 'facility': 'Deaf Access', 'category': { 'disability': [ 'Deafness' ] } } ] * 2,
+        disabilities=[ { 'cat': 'Deafness' }, { 'cat': 'Developmental' } ],
+        services=[],
+        zipcodes=[ { 'city': 'Denver', 'pop': 100.0 }, { 'city': 'Dayton', 'pop': float('nan') } ],
+    )
+    results = { text: (kind, weight) for text, kind, weight in index.complete('d', limit=10) }
+    assert results['Denver'] == (CITY, 100.0)
+    assert results['Deafness'] == (DISABILITY, 3.0)
+    assert results['Deaf Access'] == (FACILITY, 2.0)
+    assert results['Dayton'] == (CITY, 1.0)
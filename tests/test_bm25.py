@@ -0,0 +1,54 @@
+# test_bm25.py
+# Author: Ian Effendi
+#
+# Behavioural tests for the BM25 inverted index.
+from connection.cache import QueryCache
+from search.bm25 import InvertedIndex
+
+DOCUMENTS = [
+    { '_id': 1, 'facility': 'Center for Deaf Access', 'services': 'interpreting for deaf adults' },
+    { '_id': 2, 'facility': 'Blind Services of Erie', 'services': 'braille and mobility training' },
+    { '_id': 3, 'facility': 'Independent Living Center', 'services': 'peer support, deaf and blind outreach' },
+]
+
+def make_index() -> InvertedIndex:
+    return InvertedIndex([ 'facility', 'services' ]).extend(DOCUMENTS)
+
+def test_search_ranks_denser_matches_first():
+    results = make_index().search('deaf')
+    assert [ document['_id'] for document, _ in results ] == [ 1, 3 ]
+    assert results[0][1] > results[1][1] > 0
+
+def test_rare_terms_weigh_more():
+    index = make_index()
+    assert index.idf('braille') > index.idf('deaf') > index.idf('missing')
+    assert index.idf('missing') == 0.0
+
+def test_stopwords_and_unknown_terms_match_nothing():
+    assert make_index().search('the of and') == []
+    assert make_index().search('zzz') == []
+
+def test_limit_and_predicate():
+    index = make_index()
+    assert len(index.search('deaf blind', limit=1)) == 1
+    results = index.search('deaf blind', predicate=lambda document: document['_id'] != 3)
+    assert { document['_id'] for document, _ in results } == { 1, 2 }
+
+def test_add_replaces_and_remove_drops_documents():
+    index = make_index()
+    index.add({ '_id': 2, 'facility': 'Deaf Services of Erie', 'services': '' })
+    assert len(index) == 3
+    assert 2 in { document['_id'] for document, _ in index.search('deaf') }
+    assert index.search('braille') == []
+    assert index.remove(1) and not index.remove(1)
+    assert 1 not in index
+    assert { document['_id'] for document, _ in index.search('deaf') } == { 2, 3 }
+
+def test_cached_search_is_keyed_per_index_and_copied():
+    queries = QueryCache()
+    index, other = make_index(), InvertedIndex([ 'facility' ]).extend([ { '_id': 9, 'facility': 'Deaf Club' } ])
+    results = index.search('deaf', cache=queries)
+    results[0][0]['facility'] = 'changed'
+    assert index.search('deaf', cache=queries)[0][0]['facility'] == 'Center for Deaf Access'
+    assert [ document['_id'] for document, _ in other.search('deaf', cache=queries) ] == [ 9 ]
+    assert queries.stats()['hits'] == 1
@@ -0,0 +1,110 @@
+# test_cache.py
+# Author: Ian Effendi
+#
+# Behavioural tests for the query result cache, its keys and its invalidation.
+import asyncio
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from connection import cache
+from connection.cache import QueryCache, normalize
+from connection.generations import Generations
+
+def test_keys_distinguish_bson_types():
+    oid = ObjectId('5f1d7c2e9b1e8a3f4c6d2b10')
+    when = datetime.datetime(2021, 7, 1, 12, 30)
+    assert normalize({ '_id': oid }) != normalize({ '_id': str(oid) })
+    assert normalize({ 'updated': when }) != normalize({ 'updated': str(when) })
+    assert normalize({ 'a': 1, 'b': 2 }) == normalize({ 'b': 2, 'a': 1 })
+    assert normalize({ 'address': { 'city': 'x', 'zip': 'y' } }) != normalize({ 'address': { 'zip': 'y', 'city': 'x' } })
+    with pytest.raises(TypeError):
+        normalize({ 'value': object() })
+
+def test_hits_misses_and_eviction():
+    queries = QueryCache(size=2)
+    calls = []
+    def load(value):
+        calls.append(value)
+        return [ { 'value': value } ]
+    for value in (1, 2, 1, 3, 2):
+        assert queries.get('db', 'coll', 'find', { 'value': value }, load=lambda: load(value)) == [ { 'value': value } ]
+    assert calls == [ 1, 2, 3, 2 ]
+    stats = queries.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (1, 4, 2, 2)
+
+def test_results_are_copied():
+    queries = QueryCache()
+    queries.get('db', 'coll', 'find', {}, load=lambda: [ { 'value': 1 } ])[0]['value'] = 2
+    assert queries.get('db', 'coll', 'find', {}, load=lambda: []) == [ { 'value': 1 } ]
+
+def test_large_and_unencodable_results_are_not_cached():
+    queries = QueryCache(max_results=2)
+    assert len(queries.get('db', 'coll', 'find', {}, load=lambda: [ {} ] * 3)) == 3
+    assert queries.get('db', 'coll', 'find', { 'value': object() }, load=lambda: [ {} ]) == [ {} ]
+    assert queries.stats()['uncacheable'] == 2 and len(queries) == 0
+
+def test_invalidate_drops_only_the_collection():
+    queries = QueryCache()
+    queries.get('db', 'coll', 'find', {}, load=lambda: [ 1 ])
+    queries.get('db', 'other', 'find', {}, load=lambda: [ 2 ])
+    assert queries.invalidate('db', 'coll') == 1
+    assert queries.get('db', 'coll', 'find', {}, load=lambda: [ 3 ]) == [ 3 ]
+    assert queries.get('db', 'other', 'find', {}, load=lambda: [ 4 ]) == [ 2 ]
+
+def test_writes_from_another_process_are_seen(tmp_path):
+    path = str(tmp_path / 'generations.json')
+    reader, writer = QueryCache(generations=Generations(path)), Generations(path)
+    assert reader.get('db', 'coll', 'find', {}, load=lambda: [ 1 ]) == [ 1 ]
+    # Two writers that have never read the stamp file must not overwrite each other's bumps.
+    assert writer.bump('db', 'coll') == 1 and Generations(path).bump('db', 'coll') == 2
+    assert reader.get('db', 'coll', 'find', {}, load=lambda: [ 2 ]) == [ 2 ]
+    assert len(reader) == 1
+    writer.bump('db', 'coll')
+    assert reader.get('db', 'coll', 'find', {}, load=lambda: [ 3 ]) == [ 3 ]
+    assert reader.generations.get('db', 'coll') == 3
+
+def test_cached_client_queries(tmp_path, monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    from connection.client import Client
+    from connection.database import Database
+    monkeypatch.setattr(cache, '_cache', QueryCache(generations=Generations(str(tmp_path / 'generations.json'))))
+    client = Client(client=mongomock.MongoClient(), database='providers')
+    client.insert_one('services', { '_id': 1, 'facility': 'Deaf Access' })
+    assert client.find('services', {}, cached=True) == [ { '_id': 1, 'facility': 'Deaf Access' } ]
+    client.insert_one('services', { '_id': 2, 'facility': 'Blind Services' })
+    assert len(client.find('services', {}, cached=True)) == 2
+    monkeypatch.setattr(Database, 'DATABASE', client.db())
+    Database.insert_one('services', { '_id': 3, 'facility': 'Independent Living' })
+    assert len(Database.find('services', {}, cached=True)) == 3
+    assert Database.find_one('services', { '_id': 3 }, cached=True)['facility'] == 'Independent Living'
+    assert cache.get_query_cache().stats()['invalidations'] == 3
+
+def test_async_reads_share_the_cache(monkeypatch):
+    from connection.aio import AsyncClient
+    class Cursor:
+        def __init__(self, documents):
+            self.documents = documents
+        async def to_list(self, length):
+            return list(self.documents)
+    class Collection:
+        name, database, loads = 'services', type('Database', (), { 'name': 'providers' }), 0
+        def __init__(self):
+            self.documents = [ { '_id': 1 } ]
+        def find(self, query, projection=None, **kwargs):
+            Collection.loads += 1
+            return Cursor(self.documents)
+        async def insert_one(self, record, **kwargs):
+            self.documents.append(record)
+    collection = Collection()
+    monkeypatch.setattr(cache, '_cache', QueryCache())
+    client = AsyncClient(client={ 'providers': { 'services': collection } }, database='providers')
+    async def run():
+        first = await client.find('services', {}, cached=True)
+        second = await client.find('services', {}, cached=True)
+        await client.insert_one('services', { '_id': 2 })
+        return first, second, await client.find('services', {}, cached=True)
+    first, second, third = asyncio.run(run())
+    assert first == second == [ { '_id': 1 } ] and len(third) == 2
+    assert Collection.loads == 2
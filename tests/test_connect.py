@@ -0,0 +1,48 @@
+# test_connect.py
+# Author: Ian Effendi
+#
+# Behavioural tests for the streaming cursor-to-DataFrame loaders.
+import pytest
+
+from connection.connect import iter_frames, load_frame, nullable_dtype, to_frame
+
+mongomock = pytest.importorskip('mongomock')
+
+PROJECTION = { '_id': 0, 'zip': 1, 'city': 1, 'pop': 1, 'address.state': 1 }
+
+def make_collection(documents):
+    collection = mongomock.MongoClient()['region']['zipcodes']
+    collection.insert_many(documents)
+    return collection
+
+def make_documents(count, missing=()):
+    return [ { 'zip': 10000 + i, 'city': 'Rochester' if i % 2 else 'Albany', 'address': { 'state': 'NY' }, **({} if i in missing else { 'pop': 100 * i }) } for i in range(count) ]
+
+def test_nullable_dtype():
+    assert nullable_dtype('int32') == 'Int32' and nullable_dtype('uint8') == 'UInt8' and nullable_dtype(bool) == 'boolean'
+    assert nullable_dtype('float64') == 'float64' and nullable_dtype('category') == 'category'
+
+def test_chunks_and_dotted_columns():
+    chunks = list(iter_frames(make_collection(make_documents(5)), projection=PROJECTION, batch_size=2, dtypes={ 'pop': 'int32' }))
+    assert [ len(chunk) for chunk in chunks ] == [ 2, 2, 1 ]
+    assert list(chunks[0].columns) == [ 'zip', 'city', 'pop', 'address.state' ]
+    assert str(chunks[0]['pop'].dtype) == 'int32' and chunks[2]['address.state'].tolist() == [ 'NY' ]
+
+def test_load_frame_applies_dtypes():
+    frame = load_frame(make_collection(make_documents(5)), projection=PROJECTION, batch_size=2, dtypes={ 'zip': 'int32', 'city': 'category', 'pop': 'int64' })
+    assert [ str(frame[column].dtype) for column in ('zip', 'city', 'pop') ] == [ 'int32', 'category', 'int64' ]
+    assert frame['pop'].tolist() == [ 0, 100, 200, 300, 400 ]
+
+def test_missing_fields_use_nullable_integers():
+    collection = make_collection(make_documents(5, missing={ 3 }))
+    dtypes = { 'zip': 'int32', 'pop': 'int32' }
+    for frame in (load_frame(collection, projection=PROJECTION, batch_size=2, dtypes=dtypes),
+                  load_frame(collection, batch_size=2, dtypes=dtypes),
+                  next(iter_frames(collection, projection=PROJECTION, batch_size=5, dtypes=dtypes))):
+        assert str(frame['pop'].dtype) == 'Int32' and str(frame['zip'].dtype) == 'int32'
+        assert frame['pop'].isna().tolist() == [ False, False, False, True, False ]
+        assert frame['pop'].sum() == 700
+
+def test_unconvertible_columns_are_named():
+    with pytest.raises(ValueError, match="'pop'"):
+        to_frame([ { 'pop': 'many' } ], dtypes={ 'pop': 'int32' })
@@ -0,0 +1,92 @@
+# test_geocoding.py
+# Author: Ian Effendi
+#
+# Behavioural tests for the KD-tree and the offline geocoder.
+import random
+
+import pandas as pd
+import pytest
+
+from geocoding.kdtree import KDTree, haversine
+from geocoding.offline import OfflineGeocoder, clean_place, validate_observations, write_centroid_file
+
+def test_nearest_matches_brute_force():
+    generator = random.Random(7)
+    points = [ (generator.uniform(-80, 80), generator.uniform(-180, 180)) for _ in range(500) ]
+    tree = KDTree(points)
+    for _ in range(50):
+        target = (generator.uniform(-80, 80), generator.uniform(-180, 180))
+        expected = sorted(range(len(points)), key=lambda i: haversine(target, points[i]))[:5]
+        found = tree.nearest(*target, k=5)
+        assert [ label for label, _ in found ] == expected
+        assert [ distance for _, distance in found ] == pytest.approx([ haversine(target, points[i]) for i in expected ], rel=1e-6)
+
+def test_nearest_across_the_antimeridian():
+    tree = KDTree([ (0.0, 179.9), (0.0, 170.0) ], labels=[ 'east', 'west' ])
+    assert tree.nearest(0.0, -179.9)[0][0] == 'east'
+
+def test_within_radius():
+    tree = KDTree([ (42.10, -75.91), (42.44, -76.50), (40.75, -73.99) ], labels=[ 'binghamton', 'ithaca', 'manhattan' ])
+    assert sorted(label for label, _ in tree.within(42.10, -75.91, 100)) == [ 'binghamton', 'ithaca' ]
+    assert tree.nearest(0.0, 0.0, k=0) == [] and KDTree([]).nearest(0.0, 0.0) == []
+
+def test_centroid_file_round_trip(tmp_path):
+    path = str(tmp_path / 'centroids.csv')
+    observations = [
+        { 'zip': 13901, 'latitude': 42.10, 'longitude': -75.91, 'city': 'BINGHAMTON', 'county': 'Broome', 'state': 'NY' },
+        { 'zip': '13901', 'latitude': 42.12, 'longitude': -75.89, 'city': 'Binghamton', 'county': 'Broome', 'state': 'NY' },
+        { 'zip': '94612', 'latitude': 37.81, 'longitude': -122.27, 'city': 'Oakland', 'county': 'Alameda', 'state': 'CA' },
+    ]
+    assert write_centroid_file(observations, path) == 2
+    geocoder = OfflineGeocoder.from_frames(pd.DataFrame({ 'Zipcode': [ 94612 ], 'City': [ 'Oakland' ], 'County': [ 'Alameda' ], 'Population': [ 100 ] }), centroids=path)
+    place = geocoder.geocode('13901')
+    assert place.latitude == pytest.approx(42.11, abs=1e-3) and place.raw['city'] == 'Binghamton'
+    assert geocoder.geocode({ 'city': 'binghamton', 'state': 'NY' }) is not None
+    assert geocoder.geocode({ 'street': '1 Main St', 'city': 'Oakland' }) is None
+    assert geocoder.reverse((37.8, -122.3)).raw['zip'] == '94612'
+
+def test_missing_centroids_fail_loudly(tmp_path):
+    frame = pd.DataFrame({ 'zip': [ '13901' ], 'city': [ 'Binghamton' ], 'county': [ 'Broome' ], 'pop': [ 1 ] })
+    with pytest.raises(FileNotFoundError):
+        OfflineGeocoder.from_frames(frame, centroids=str(tmp_path / 'missing.csv'))
+    empty = tmp_path / 'empty.csv'
+    empty.write_text('zip,latitude,longitude\n')
+    with pytest.raises(ValueError):
+        OfflineGeocoder.from_frames(frame, centroids=str(empty))
+
+def test_place_names_are_cleaned():
+    assert clean_place('Chula\u00c2 Vista') == 'Chula Vista'
+    assert clean_place('Lake George, ') == 'Lake George' and clean_place('ST. REGIS') == 'St. Regis'
+    assert clean_place('Warren - Hamilton') is None and clean_place(float('nan')) is None
+    assert clean_place('McAllen') == 'McAllen'
+
+def test_observations_outside_their_state_are_rejected():
+    def row(zipcode, latitude, longitude, city, county='Monroe', facility='a', state='NY'):
+        return { 'zip': zipcode, 'latitude': latitude, 'longitude': longitude, 'city': city, 'county': county, 'state': state, 'source': 'sheet', 'facility': facility }
+    rows, rejected = validate_observations([
+        row('13655', 30.69, -86.12, 'Hogansburg', 'St. Regis'),
+        row('14411', 36.12, -96.15, 'Albion', 'Orleans'), row('14411', 36.12, -96.15, 'Albion', 'Orleans'), row('14411', 43.12, -77.60, 'Rochester', 'Orleans'),
+        row('14623', 43.08, -77.61, 'Rochester'), row('14620', 43.13, -77.60, 'Rochester'), row('14604', 43.16, -77.61, 'Rochester'),
+        row('14618', 43.11, -75.20, 'Rochester'),
+        row('94612', 37.81, -122.27, 'Oakland', 'Alameda', state='NY'),
+    ])
+    assert { row['zip'] for row in rows } == { '14623', '14620', '14604' }
+    assert rejected == { 'state': 1, 'city': 1, 'bounds': 3, 'outlier': 1 }
+
+def test_service_area_counties_are_dropped():
+    rows, _ = validate_observations([
+        { 'zip': '95501', 'latitude': 40.80, 'longitude': -124.16, 'city': 'Eureka', 'county': county, 'state': 'CA', 'source': 'dss', 'facility': facility }
+        for facility, county in [ ('council', 'Alameda'), ('council', 'Del Norte'), ('agency', 'Humboldt'), ('center', 'Del Norte'), ('project', 'Placer') ]
+    ])
+    assert { row['county'] for row in rows } == { None }
+
+def test_gazetteer_coordinates_are_preferred(tmp_path):
+    gazetteer = tmp_path / 'gazetteer.txt'
+    gazetteer.write_text('GEOID\tALAND\tINTPTLAT\tINTPTLONG\n13901\t1\t42.1307\t-75.9054\n14850\t1\t42.4440\t-76.5021\n')
+    path = str(tmp_path / 'centroids.csv')
+    observations = [ { 'zip': '13901', 'latitude': 42.10, 'longitude': -75.91, 'city': 'Binghamton', 'county': 'Broome', 'state': 'NY' } ]
+    assert write_centroid_file(observations, path, gazetteer=str(gazetteer)) == 2
+    geocoder = OfflineGeocoder.from_frames(pd.DataFrame({ 'zip': [], 'city': [], 'county': [], 'pop': [] }), centroids=path)
+    assert geocoder.geocode('13901').latitude == pytest.approx(42.1307, abs=1e-4)
+    assert geocoder.geocode({ 'city': 'Binghamton', 'state': 'NY' }) is not None
+    assert geocoder.geocode('14850').raw['state'] == 'NY'
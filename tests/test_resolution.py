@@ -0,0 +1,50 @@
+# test_resolution.py
+# Author: Ian Effendi
+#
+# Behavioural tests for MinHash/LSH blocking and provider entity resolution.
+import pytest
+
+from resolution.entities import EntityResolver, Record, canonical_id, normalize_name, normalize_phone, normalize_zip
+from resolution.minhash import LSH, MinHasher, block_pairs, jaccard, shingles
+
+def test_signature_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    a = shingles('center for independent living of the finger lakes')
+    b = shingles('center for independent living finger lakes')
+    estimate = MinHasher.estimate(hasher.signature(a), hasher.signature(b))
+    assert estimate == pytest.approx(jaccard(a, b), abs=0.1)
+    assert MinHasher.estimate(hasher.signature(a), hasher.signature(a)) == 1.0
+
+def test_signatures_are_deterministic():
+    assert (MinHasher(64).signature({ 'abc', 'bcd' }) == MinHasher(64).signature({ 'bcd', 'abc' })).all()
+
+def test_lsh_groups_similar_names_only():
+    hasher, lsh = MinHasher(128), LSH(bands=32, rows=4)
+    for key, name in [ (1, 'arc of monroe county'), (2, 'the arc of monroe county'), (3, 'brooklyn blind services') ]:
+        lsh.add(key, hasher.signature(shingles(normalize_name(name))))
+    pairs = block_pairs(lsh.groups())
+    assert (1, 2) in pairs
+    assert not any(3 in pair for pair in pairs)
+    with pytest.raises(ValueError):
+        lsh.add(4, hasher.signature(shingles('short'))[:8])
+
+def test_large_blocks_are_chained():
+    assert block_pairs([ list(range(10)) ], max_bucket=5) == { (i, i + 1) for i in range(9) }
+
+def test_normalizers():
+    assert normalize_name('The ARC of Monroe, Inc.') == 'arc monroe'
+    assert normalize_phone('+1 (585) 555-0100 ') == '5855550100' and normalize_phone('555-0100') is None
+    assert normalize_zip(1234.0) == '01234' and normalize_zip('14623-1234') == '14623'
+
+def test_resolver_clusters_duplicates_across_sources():
+    resolver = EntityResolver(threshold=0.55, num_perm=128, bands=16)
+    resolver.extend([
+        Record('a', 'The Arc of Monroe', '585-271-0660', 'arcmonroe.org', '14623', 'NY'),
+        Record('b', 'ARC OF MONROE COUNTY INC', '(585) 271-0660', None, '14623', 'NY'),
+        Record('c', 'Arc of Monroe', '585-271-0660', 'arcmonroe.org', '94612', 'CA'),
+        Record('d', 'Brooklyn Blind Services', '718-555-0100', None, '11201', 'NY'),
+    ])
+    entities = resolver.resolve()
+    assert entities['a'] == entities['b'] == canonical_id([ 'a', 'b' ])
+    assert len({ entities['a'], entities['c'], entities['d'] }) == 3
+    assert resolver.stats['clusters'] == 3
@@ -0,0 +1,43 @@
+# test_spelling.py
+# Author: Ian Effendi
+#
+# Behavioural tests for the symmetric-delete spelling corrector.
+from search.spelling import SymSpell, deletes, edit_distance
+
+def make_speller() -> SymSpell:
+    speller = SymSpell(max_distance=2)
+    for word, count in [ ('deaf', 5), ('dear', 1), ('blind', 4), ('rochester', 3), ('independent', 2), ('living', 2) ]:
+        speller.add(word, count)
+    return speller
+
+def test_edit_distance():
+    assert edit_distance('deaf', 'deaf', 2) == 0
+    assert edit_distance('deaf', 'daef', 2) == 1
+    assert edit_distance('rochester', 'rochestr', 2) == 1
+    assert edit_distance('kitten', 'sitting', 3) == 3
+    assert edit_distance('kitten', 'sitting', 2) == 3
+    assert edit_distance('a', 'abcdef', 2) == 3
+
+def test_deletes():
+    assert deletes('abc', 1) == { 'abc', 'ab', 'ac', 'bc' }
+    assert '' in deletes('ab', 2)
+
+def test_lookup_orders_by_distance_then_count():
+    speller = make_speller()
+    assert [ word for word, _, _ in speller.lookup('deax') ] == [ 'deaf', 'dear' ]
+    assert speller.lookup('deaf') == [ ('deaf', 0, 5) ]
+    assert speller.lookup('zzzzzz') == []
+
+def test_correct_rewrites_queries():
+    speller = make_speller()
+    assert speller.correct('Deaf servces in Rochestr') == 'deaf servces in rochester'
+    assert speller.correct('indepnedent livng') == 'independent living'
+    assert speller.correct_word('dea') == 'deaf'
+    assert speller.correct_word('of') == 'of' and speller.correct_word('14623') == '14623'
+
+def test_save_and_load(tmp_path):
+    speller = make_speller().extend([ 'Blind Services of Buffalo' ])
+    path = speller.save(str(tmp_path / 'spelling.pickle'))
+    loaded = SymSpell.load(path)
+    assert len(loaded) == len(speller) and 'buffalo' in loaded
+    assert loaded.correct('bufalo blnd') == 'buffalo blind'
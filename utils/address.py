@@ -0,0 +1,24 @@
+# address.py
+# Author: Ian Effendi
+# 
+# Address field helpers shared by ingestion, geocoding and search.
+from typing import Any, Dict, Optional
+
+def format_zip(value: Any) -> Optional[str]:
+    """
+    Format a zip code as five digits (sheets store them as numbers, dropping leading zeros).
+    :returns: None if the value is not a zip code.
+    """
+    if value is None or value != value:
+        return None
+    digits = str(value).strip().split('-')[0].split('.')[0]
+    return digits.zfill(5) if digits.isdigit() and len(digits) <= 5 else None
+
+def to_geometry(latitude: Any, longitude: Any) -> Optional[Dict[str, Any]]:
+    """
+    Make a GeoJSON point for a 2dsphere index (note GeoJSON orders coordinates longitude first).
+    :returns: None if either coordinate is missing or NaN.
+    """
+    if latitude is None or longitude is None or latitude != latitude or longitude != longitude:
+        return None
+    return { 'type': 'Point', 'coordinates': [ float(longitude), float(latitude) ] }
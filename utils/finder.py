@@ -2,7 +2,8 @@
 # Author: Ian Effendi
 # 
 # Assortment of utility functions for finding elements in a list-like structure.
-from typing import Any, List, Union, Tuple, Callable
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Union, Tuple, Callable
 
 def has_key(x: Any, key: Any) -> bool:
     """
@@ -105,3 +106,164 @@ def match_all(li: List[Any], value: Any, key: Any = None) -> bool:
     if results and len(results) == len(li):
         return True
     return False
+
+# Indexed collections.
+
+def _get(x: Any, key: Any) -> Tuple[bool, Any]:
+    """
+    Get attribute 'key' of x (or x itself if key is None).
+    :returns: Tuple of (found, value).
+    """
+    if key is None:
+        return True, x
+    try:
+        return True, x[key]
+    except (KeyError, IndexError, TypeError):
+        return False, None
+
+class IndexedCollection:
+    """
+    List-like collection with hash indexes (equality) and sorted indexes (ranges) on element keys.
+    Offers the find_one/find_many/match_* API of this module in O(1) (hash) or O(log n) (sorted) time.
+    A key of None indexes the elements themselves. Callable predicates fall back to a linear scan.
+    """
+
+    def __init__(self, items: Iterable[Any] = (), keys: Iterable[Any] = (), sorted_keys: Iterable[Any] = ()):
+        self.items: List[Any] = list(items)
+        self.hashes: Dict[Any, Dict[Any, List[int]]] = {}
+        self.sorted: Dict[Any, Tuple[List[Any], List[int]]] = {}
+        for key in keys:
+            self.add_index(key)
+        for key in sorted_keys:
+            self.add_sorted_index(key)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, i: int) -> Any:
+        return self.items[i]
+
+    def add_index(self, key: Any) -> 'IndexedCollection':
+        """
+        Build a hash index mapping each value of 'key' to the positions holding it.
+        Elements missing the key, or with unhashable or NaN values, are left out.
+        """
+        index: Dict[Any, List[int]] = {}
+        for i, x in enumerate(self.items):
+            found, value = _get(x, key)
+            if found and value == value:
+                try:
+                    index.setdefault(value, []).append(i)
+                except TypeError:
+                    continue
+        self.hashes[key] = index
+        return self
+
+    def add_sorted_index(self, key: Any) -> 'IndexedCollection':
+        """Build a sorted index over the values of 'key', for range queries. Values must be mutually comparable."""
+        pairs = []
+        for i, x in enumerate(self.items):
+            found, value = _get(x, key)
+            if found and value is not None and value == value:
+                pairs.append((value, i))
+        pairs.sort(key=lambda pair: pair[0])
+        self.sorted[key] = ([value for value, _ in pairs], [i for _, i in pairs])
+        return self
+
+    def append(self, x: Any) -> None:
+        """Add an element, updating the hash indexes and inserting it into the sorted indexes (after equal values)."""
+        i = len(self.items)
+        self.items.append(x)
+        for key, index in self.hashes.items():
+            found, value = _get(x, key)
+            if found and value == value:
+                try:
+                    index.setdefault(value, []).append(i)
+                except TypeError:
+                    continue
+        for key, (values, positions) in self.sorted.items():
+            found, value = _get(x, key)
+            if found and value is not None and value == value:
+                at = bisect_right(values, value)
+                values.insert(at, value)
+                positions.insert(at, i)
+
+    def positions(self, value: Any, key: Any = None) -> List[int]:
+        """
+        Get the positions of elements whose 'key' equals value. Unindexed keys are indexed on first use.
+        :returns: List of positions, in insertion order. Empty if no match is found.
+        """
+        if key not in self.hashes:
+            self.add_index(key)
+        try:
+            return self.hashes[key].get(value, [])
+        except TypeError:
+            return []
+
+    # _one functions.
+
+    def index_of(self, predicate: Union[Any, Callable[[Any], bool]], key: Any = None) -> Tuple[int, Any]:
+        """
+        Find the index of first match.
+        :returns: -1 if match is not found.
+        """
+        if callable(predicate):
+            return index_of(self.items, predicate)
+        found = self.positions(predicate, key)
+        return (found[0], self.items[found[0]]) if found else (-1, None)
+
+    def find_one(self, predicate: Union[Any, Callable[[Any], bool]], key: Any = None) -> Union[Any, None]:
+        """
+        Find first element whose 'key' equals value (or that makes the predicate resolve to True).
+        :returns: None if match is not found.
+        """
+        return self.index_of(predicate, key)[1]
+
+    def match_any(self, value: Any, key: Any = None) -> bool:
+        """
+        Check for any element whose 'key' equals value.
+        :returns: bool, True if any in the collection meet the conditions.
+        """
+        return bool(self.positions(value, key))
+
+    # _many() functions.
+
+    def index_all(self, predicate: Union[Any, Callable[[Any], bool]], key: Any = None) -> List[int]:
+        """
+        Find the indices of all matches.
+        :returns: Empty list if no matches are found.
+        """
+        if callable(predicate):
+            return index_all(self.items, predicate)
+        return list(self.positions(predicate, key))
+
+    def find_many(self, predicate: Union[Any, Callable[[Any], bool]], key: Any = None) -> List[Any]:
+        """
+        Find all elements whose 'key' equals value (or that make the predicate resolve to True).
+        :returns: List. List will be empty if match is not found.
+        """
+        return [self.items[i] for i in self.index_all(predicate, key)]
+
+    def match_all(self, value: Any, key: Any = None) -> bool:
+        """
+        Check that every element's 'key' equals value.
+        :returns: bool, True if all in the collection meet the conditions.
+        """
+        return bool(self.items) and len(self.positions(value, key)) == len(self.items)
+
+    # Range functions.
+
+    def find_range(self, key: Any, low: Any = None, high: Any = None, inclusive: Tuple[bool, bool] = (True, True)) -> List[Any]:
+        """
+        Find all elements whose 'key' lies between low and high (either bound may be None). Unindexed keys are indexed on first use.
+        :returns: List, ordered by 'key'. Empty if no match is found.
+        """
+        if key not in self.sorted:
+            self.add_sorted_index(key)
+        values, positions = self.sorted[key]
+        start = 0 if low is None else (bisect_left(values, low) if inclusive[0] else bisect_right(values, low))
+        stop = len(values) if high is None else (bisect_right(values, high) if inclusive[1] else bisect_left(values, high))
+        return [self.items[i] for i in positions[start:stop]]